@@ -0,0 +1,65 @@
+# Motor (asyncio MongoDB) connection setup for the request paths.
+# Scheduler jobs and worker threads keep using the PyMongo client in config/database.py.
+from motor.motor_asyncio import AsyncIOMotorClient
+import os
+from dotenv import load_dotenv
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+ATLAS_URI = os.getenv("MONGO_DB_URL")
+DATABASE_NAME = "sales_agent_db"
+
+# Connection pool of the async client; one event loop can have this many queries in flight
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+# Connections kept open while idle, so a burst of tool calls does not start with handshakes
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "10"))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000"))
+# Fail a request instead of queueing forever when the pool is exhausted or the server is gone
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "5000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+
+_client = None
+
+
+def get_async_client() -> AsyncIOMotorClient:
+    """Create the Motor client on first use, inside the running event loop"""
+    global _client
+    if _client is None:
+        _client = AsyncIOMotorClient(
+            ATLAS_URI,
+            maxPoolSize=MONGO_MAX_POOL_SIZE,
+            minPoolSize=MONGO_MIN_POOL_SIZE,
+            maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+            waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+            serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        )
+        logger.info(f"Created async MongoDB client (pool {MONGO_MIN_POOL_SIZE}-{MONGO_MAX_POOL_SIZE})")
+    return _client
+
+
+def close_async_client():
+    global _client
+    if _client is not None:
+        _client.close()
+        _client = None
+
+def get_async_database():
+    return get_async_client()[DATABASE_NAME]
+
+def get_async_prospects_collection():
+    return get_async_database()["prospects"]
+
+def get_async_users_collection():
+    return get_async_database()["users"]
+
+def get_async_campaigns_collection():
+    return get_async_database()["campaigns"]
+
+def get_async_campaign_users_collection():
+    return get_async_database()["campaign_users"]
+
+def get_async_audit_logs_collection():
+    return get_async_database()["audit_logs"]
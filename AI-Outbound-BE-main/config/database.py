@@ -3,6 +3,7 @@ from pymongo import MongoClient
 import os
 from dotenv import load_dotenv
 import logging
+from config.indexes import ensure_indexes
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -22,11 +23,19 @@ try:
     users_collection = db["users"]
     campaign_collection = db["campaigns"]
     campaign_users_collection = db["campaign_users"]
+    ingest_jobs_collection = db["ingest_jobs"]
+    ingest_job_chunks_collection = db["ingest_job_chunks"]
+    dial_queue_collection = db["dial_queue"]
+    webhook_inbox_collection = db["webhook_inbox"]
+    call_transcripts_collection = db["call_transcripts"]
+    audit_logs_collection = db["audit_logs"]
+    scheduler_leases_collection = db["scheduler_leases"]
+    call_slots_collection = db["call_slots"]
+    upload_progress_collection = db["upload_progress"]
 
-    # # Create unique index on phoneNumber
-    # prospects_collection.create_index("phoneNumber", unique=True)
-    users_collection.create_index("email", unique=True)
-    campaign_collection.create_index("campaignName", unique=True)
+    # Create the indexes declared in config/indexes.py (no-op when they already exist)
+    if os.getenv("ENSURE_INDEXES_ON_STARTUP", "true").lower() != "false":
+        ensure_indexes(db)
 except Exception as e:
     logger.error(f"Error connecting to MongoDB: {str(e)}")
     raise
@@ -44,4 +53,31 @@ def get_campaigns_collection():
     return campaign_collection
 
 def get_campaign_users_collection():
-    return campaign_users_collection
\ No newline at end of file
+    return campaign_users_collection
+
+def get_ingest_jobs_collection():
+    return ingest_jobs_collection
+
+def get_ingest_job_chunks_collection():
+    return ingest_job_chunks_collection
+
+def get_dial_queue_collection():
+    return dial_queue_collection
+
+def get_webhook_inbox_collection():
+    return webhook_inbox_collection
+
+def get_call_transcripts_collection():
+    return call_transcripts_collection
+
+def get_audit_logs_collection():
+    return audit_logs_collection
+
+def get_scheduler_leases_collection():
+    return scheduler_leases_collection
+
+def get_call_slots_collection():
+    return call_slots_collection
+
+def get_upload_progress_collection():
+    return upload_progress_collection
@@ -0,0 +1,188 @@
+"""
+Declarative index registry for every query shape the app relies on.
+
+Indexes are applied idempotently at startup (see config/database.py) or from the CLI:
+
+    python -m config.indexes apply     # create missing indexes
+    python -m config.indexes report    # list missing, unmanaged and unused indexes
+"""
+from pymongo import IndexModel
+from pymongo.errors import OperationFailure
+from typing import Dict, List, Any
+import json
+import logging
+import sys
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# collection name -> list of index specs (keys, name and any create_index options)
+INDEX_REGISTRY: Dict[str, List[Dict[str, Any]]] = {
+    "prospects": [
+        # Upload upserts, webhook lookups and campaign prospect lists
+        {"name": "campaignId_phoneNumber", "keys": [("campaignId", 1), ("phoneNumber", 1)]},
+        # Webhook lookups of individual calls
+        {"name": "calls_callId", "keys": [("calls.callId", 1)]},
+        # Batch call bookkeeping
+        {"name": "calls_batchId", "keys": [("calls.batchId", 1)]},
+        # Stats endpoints and prospect summaries for non admin users
+        {"name": "ownerName", "keys": [("ownerName", 1)]},
+        # Scheduled calls job (prospects whose local call window is open)
+        {"name": "status_callWindowEnd_callWindowStart", "keys": [("status", 1), ("callWindowEnd", 1), ("callWindowStart", 1)]},
+        # Retry sweep; only prospects with a pending retry or callback have the field
+        {"name": "nextAttemptAt", "keys": [("nextAttemptAt", 1)], "sparse": True},
+        # Callback job and callback stats
+        {"name": "callBackDate", "keys": [("callBackDate", 1)]},
+        # Reconciliation of batch entries whose webhook never arrived
+        {"name": "status_calls_timestamp", "keys": [("status", 1), ("calls.timestamp", 1)]},
+    ],
+    "users": [
+        {"name": "email_unique", "keys": [("email", 1)], "unique": True},
+        # Role lookups by user name in the stats service
+        {"name": "name", "keys": [("name", 1)]},
+    ],
+    "campaigns": [
+        {"name": "campaignName_unique", "keys": [("campaignName", 1)], "unique": True},
+    ],
+    "campaign_users": [
+        # Campaigns of a user
+        {"name": "users", "keys": [("users", 1)]},
+    ],
+    "ingest_jobs": [
+        {"name": "status_leaseExpiresAt", "keys": [("status", 1), ("leaseExpiresAt", 1)]},
+    ],
+    "ingest_job_chunks": [
+        {"name": "jobId_chunkIndex", "keys": [("jobId", 1), ("chunkIndex", 1)], "unique": True},
+    ],
+    "dial_queue": [
+        # A prospect can only be queued once while it is pending or leased
+        {
+            "name": "active_phoneNumber_campaignId",
+            "keys": [("phoneNumber", 1), ("campaignId", 1)],
+            "unique": True,
+            "partialFilterExpression": {"active": True},
+        },
+        # Claiming due items and expired leases
+        {"name": "state_availableAt", "keys": [("state", 1), ("availableAt", 1)]},
+        {"name": "state_leaseExpiresAt", "keys": [("state", 1), ("leaseExpiresAt", 1)]},
+        # Dialed items are kept for a week
+        {"name": "completedAt_ttl", "keys": [("completedAt", 1)], "expireAfterSeconds": 7 * 24 * 3600},
+    ],
+    "webhook_inbox": [
+        # Sweep of events that were never picked up or whose worker died
+        {"name": "status_receivedAt", "keys": [("status", 1), ("receivedAt", 1)]},
+        # Processed events are kept for three days
+        {"name": "processedAt_ttl", "keys": [("processedAt", 1)], "expireAfterSeconds": 3 * 24 * 3600},
+    ],
+    "call_slots": [
+        # Live calls and reserved slots counted by the dial pacer
+        {"name": "kind_expiresAt", "keys": [("kind", 1), ("expiresAt", 1)]},
+        # Ended calls, expired reservations and pauses are removed once they expire
+        {"name": "expiresAt_ttl", "keys": [("expiresAt", 1)], "expireAfterSeconds": 0},
+    ],
+    "upload_progress": [
+        # Progress of streaming uploads is dropped once it expires
+        {"name": "expiresAt_ttl", "keys": [("expiresAt", 1)], "expireAfterSeconds": 0},
+    ],
+    "audit_logs": [
+        # History of a prospect, newest first
+        {"name": "prospect_timestamp", "keys": [("campaignId", 1), ("phoneNumber", 1), ("timestamp", -1), ("_id", -1)]},
+        # History of a call
+        {"name": "details_callId_timestamp", "keys": [("details.callId", 1), ("timestamp", -1)]},
+        # Time range queries across prospects
+        {"name": "timestamp", "keys": [("timestamp", -1)]},
+    ],
+}
+
+
+def _key_signature(keys) -> tuple:
+    """Normalize index keys from the registry or from index_information()"""
+    if isinstance(keys, dict):
+        keys = keys.items()
+    return tuple((field, direction) for field, direction in keys)
+
+
+def _index_model(spec: Dict[str, Any]) -> IndexModel:
+    options = {key: value for key, value in spec.items() if key != "keys"}
+    return IndexModel(spec["keys"], **options)
+
+
+def ensure_indexes(db) -> Dict[str, List[str]]:
+    """
+    Create every registry index that does not exist yet.
+
+    An existing index with the same keys counts as present even if it has another
+    name, so indexes created by hand are not duplicated. Nothing is ever dropped.
+
+    Returns:
+        dict: Names of the indexes created per collection
+    """
+    created = {}
+    for collection_name, specs in INDEX_REGISTRY.items():
+        collection = db[collection_name]
+        try:
+            existing = collection.index_information()
+        except OperationFailure as e:
+            logger.error(f"Could not list indexes on {collection_name}: {str(e)}")
+            continue
+        existing_keys = {_key_signature(info["key"]) for info in existing.values()}
+
+        missing = [spec for spec in specs if _key_signature(spec["keys"]) not in existing_keys]
+        if not missing:
+            continue
+        try:
+            created[collection_name] = collection.create_indexes([_index_model(spec) for spec in missing])
+            logger.info(f"Created indexes on {collection_name}: {created[collection_name]}")
+        except OperationFailure as e:
+            # e.g. a unique index over data that already has duplicates
+            logger.error(f"Error creating indexes on {collection_name}: {str(e)}")
+    return created
+
+
+def report_indexes(db) -> Dict[str, Dict[str, Any]]:
+    """
+    Compare the registry with the database.
+
+    Returns:
+        dict: Per collection, the registry indexes that are missing, the indexes that
+              exist but are not in the registry, and the indexes with no recorded use
+              since the server started (from $indexStats)
+    """
+    report = {}
+    for collection_name, specs in INDEX_REGISTRY.items():
+        collection = db[collection_name]
+        existing = collection.index_information()
+        existing_by_keys = {_key_signature(info["key"]): name for name, info in existing.items()}
+        registry_keys = {_key_signature(spec["keys"]) for spec in specs}
+
+        try:
+            usage = {
+                stats["name"]: stats["accesses"]["ops"]
+                for stats in collection.aggregate([{"$indexStats": {}}])
+            }
+        except OperationFailure as e:
+            logger.warning(f"$indexStats not available on {collection_name}: {str(e)}")
+            usage = {}
+
+        report[collection_name] = {
+            "missing": [spec["name"] for spec in specs if _key_signature(spec["keys"]) not in existing_by_keys],
+            "unmanaged": [name for keys, name in existing_by_keys.items() if name != "_id_" and keys not in registry_keys],
+            "unused": [name for name, ops in usage.items() if name != "_id_" and ops == 0],
+        }
+    return report
+
+
+if __name__ == "__main__":
+    import os
+    # The CLI applies indexes itself, so skip the implicit run on import
+    os.environ["ENSURE_INDEXES_ON_STARTUP"] = "false"
+    from config.database import get_database
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "report"
+    if command == "apply":
+        print(json.dumps(ensure_indexes(get_database()), indent=2))
+    elif command == "report":
+        print(json.dumps(report_indexes(get_database()), indent=2))
+    else:
+        print("Usage: python -m config.indexes [apply|report]")
+        sys.exit(1)
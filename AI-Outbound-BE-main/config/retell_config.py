@@ -0,0 +1,27 @@
+import os
+from retell import Retell
+from dotenv import load_dotenv
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+def get_retell_client():
+    """
+    Create a Retell client from environment variables.
+
+    RETELL_BASE_URL points the client at another server, e.g. the fake Retell
+    server in loadtest/ for load tests.
+    """
+    api_key = os.getenv("RETELL_API_KEY")
+    if not api_key:
+        raise ValueError("RETELL_API_KEY environment variable not set")
+
+    base_url = os.getenv("RETELL_BASE_URL")
+    if base_url:
+        logger.info(f"Using Retell API at {base_url}")
+        return Retell(api_key=api_key, base_url=base_url)
+    return Retell(api_key=api_key)
@@ -0,0 +1,92 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from config.database import get_prospects_collection
+from services.call_initiation_service import list_batch_calls, update_batch_call_status
+from typing import List, Dict, Any
+import logging
+import os
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# A batch entry is stale once its webhook should have arrived
+RECONCILE_AFTER_MINUTES = int(os.getenv("RECONCILE_AFTER_MINUTES", "30"))
+# Batch entries older than this are not polled any more
+RECONCILE_MAX_AGE_HOURS = int(os.getenv("RECONCILE_MAX_AGE_HOURS", "72"))
+# Batches fetched from Retell per run and concurrently
+RECONCILE_BATCH_LIMIT = int(os.getenv("RECONCILE_BATCH_LIMIT", "200"))
+RECONCILE_MAX_IN_FLIGHT = int(os.getenv("RECONCILE_MAX_IN_FLIGHT", "5"))
+
+# Retell call statuses that are still in progress
+IN_PROGRESS_STATUSES = {"registered", "ongoing"}
+
+
+def get_stale_batch_ids(limit: int = None) -> List[str]:
+    """
+    Find batches with prospects still waiting for their call_analyzed webhook
+
+    Uses the status_calls_timestamp index: contacted prospects with a batch-only calls
+    entry (no callId) older than RECONCILE_AFTER_MINUTES.
+
+    Returns:
+        list: Batch IDs, oldest first
+    """
+    now = datetime.utcnow()
+    stale_entry = {
+        "batchId": {"$exists": True},
+        "callId": {"$exists": False},
+        # Call timestamps are ISO strings, so they compare in time order
+        "timestamp": {
+            "$lt": (now - timedelta(minutes=RECONCILE_AFTER_MINUTES)).isoformat() + "Z",
+            "$gt": (now - timedelta(hours=RECONCILE_MAX_AGE_HOURS)).isoformat() + "Z",
+        },
+    }
+    pipeline = [
+        {"$match": {"status": "contacted", "calls": {"$elemMatch": stale_entry}}},
+        {"$project": {"calls.batchId": 1, "calls.callId": 1, "calls.timestamp": 1}},
+        {"$unwind": "$calls"},
+        {"$match": {f"calls.{field}": condition for field, condition in stale_entry.items()}},
+        {"$group": {"_id": "$calls.batchId", "oldest": {"$min": "$calls.timestamp"}}},
+        {"$sort": {"oldest": 1}},
+        {"$limit": limit or RECONCILE_BATCH_LIMIT},
+    ]
+    return [batch["_id"] for batch in get_prospects_collection().aggregate(pipeline)]
+
+
+def _call_results(batch_calls: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Calls of a batch that have finished"""
+    return [call for call in batch_calls if call.get("call_status") not in IN_PROGRESS_STATUSES]
+
+
+def _fetch_batch(batch_id: str):
+    try:
+        return batch_id, _call_results(list_batch_calls(batch_id))
+    except Exception as e:
+        logger.error(f"Could not fetch batch {batch_id} from Retell: {str(e)}")
+        return batch_id, None
+
+
+def reconcile_stale_batches(limit: int = None) -> Dict[str, int]:
+    """Apply Retell batch results to prospects whose webhooks never arrived"""
+    summary = {"batches": 0, "fetched": 0, "applied": 0, "added": 0, "unmatched": 0}
+    try:
+        batch_ids = get_stale_batch_ids(limit)
+        summary["batches"] = len(batch_ids)
+        if not batch_ids:
+            return summary
+        logger.info(f"Reconciling {len(batch_ids)} stale batches")
+
+        with ThreadPoolExecutor(max_workers=min(RECONCILE_MAX_IN_FLIGHT, len(batch_ids))) as executor:
+            for batch_id, call_results in executor.map(_fetch_batch, batch_ids):
+                if not call_results:
+                    continue
+                summary["fetched"] += 1
+                result = update_batch_call_status(batch_id, call_results)
+                for key in ("applied", "added", "unmatched"):
+                    summary[key] += result[key]
+
+        logger.info(f"Batch reconciliation: {summary}")
+    except Exception as e:
+        logger.error(f"Error in reconcile_stale_batches: {str(e)}")
+    return summary
@@ -0,0 +1,64 @@
+from services.dial_queue_service import claim_items, complete_items, fail_items, dead_letter_expired
+from services.call_initiation_service import create_phone_call
+from services.call_pacing import pacer, PACING_ENABLED
+from models.prospect import ProspectIn
+import logging
+import os
+import socket
+import uuid
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Maximum prospects claimed per run
+DIAL_QUEUE_CLAIM_LIMIT = int(os.getenv("DIAL_QUEUE_CLAIM_LIMIT", "500"))
+
+# Lease owner for items claimed by this process
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def process_dial_queue(limit: int = None):
+    """Claim due dial queue items, dial them and acknowledge each batch"""
+    try:
+        dead_letter_expired()
+
+        limit = limit or DIAL_QUEUE_CLAIM_LIMIT
+        if PACING_ENABLED:
+            # Only lease what can be dialed now, the rest stays claimable by other instances
+            limit = min(limit, pacer.available_slots())
+            if limit <= 0:
+                return
+        items = claim_items(WORKER_ID, limit)
+        if not items:
+            return
+        logger.info(f"Dial queue: claimed {len(items)} prospects")
+
+        item_ids = {(item["phoneNumber"], item["campaignId"]): item["_id"] for item in items}
+        prospects = [
+            ProspectIn(
+                name=item.get("name"),
+                phoneNumber=item["phoneNumber"],
+                businessName=item.get("businessName") or "",
+                ownerName=item.get("ownerName", ""),
+                campaignId=item.get("campaignId", ""),
+                campaignName=item.get("campaignName", ""),
+            ) for item in items
+        ]
+
+        def acknowledge(batch_prospects, batch_id, error):
+            ids = [item_ids[(prospect.phoneNumber, prospect.campaignId)] for prospect in batch_prospects]
+            if error:
+                fail_items(ids, WORKER_ID, error)
+            else:
+                complete_items(ids, WORKER_ID, batch_id)
+
+        try:
+            create_phone_call(prospects, on_batch_result=acknowledge)
+        except Exception as e:
+            # Nothing was dialed (e.g. missing Retell settings), retry later
+            fail_items(list(item_ids.values()), WORKER_ID, str(e))
+            raise
+
+    except Exception as e:
+        logger.error(f"Error in process_dial_queue: {str(e)}")
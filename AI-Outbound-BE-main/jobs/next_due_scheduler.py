@@ -0,0 +1,244 @@
+"""
+Event-driven scheduled calls.
+
+Instead of running process_scheduled_calls every minute, NextDueScheduler keeps
+a min-heap of the upcoming callWindowStart times of "new" prospects (when their
+scheduled time has passed and it is call hours where they are) and sleeps until
+the earliest one. The heap is loaded from the (status, callWindowEnd,
+callWindowStart) index and kept current by a change stream on prospects and
+campaign_users (campaign settings). Without change streams (standalone MongoDB) it is reloaded every
+SCHEDULER_POLL_SECONDS instead.
+
+A wake-up runs the range query of process_scheduled_calls, which picks up every
+prospect whose call window is open, so a late wake-up or a stale heap entry
+never drops a prospect. The same query runs at startup to catch up on the
+window the scheduler was not running.
+"""
+from config.database import get_database, get_prospects_collection
+from jobs.scheduled_calls_scheduler import process_scheduled_calls
+from pymongo.errors import OperationFailure, PyMongoError
+from datetime import datetime
+from typing import Callable, List, Optional, Set
+import heapq
+import logging
+import os
+import threading
+import time
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Upcoming due times loaded from the index at once; the rest are loaded when these run out
+SCHEDULER_LOAD_LIMIT = int(os.getenv("SCHEDULER_LOAD_LIMIT", "1000"))
+# Reload interval when change streams are not available
+SCHEDULER_POLL_SECONDS = int(os.getenv("SCHEDULER_POLL_SECONDS", "60"))
+# Reload interval with change streams, in case an event was missed
+SCHEDULER_RESYNC_SECONDS = int(os.getenv("SCHEDULER_RESYNC_SECONDS", "900"))
+# Pause before a failed change stream is reopened
+SCHEDULER_WATCH_RETRY_SECONDS = int(os.getenv("SCHEDULER_WATCH_RETRY_SECONDS", "5"))
+
+# MongoDB error code for change streams on a standalone server
+CHANGE_STREAM_NOT_SUPPORTED = 40573
+
+# Only the fields the scheduler needs; _id is the resume token and is always kept
+CHANGE_STREAM_PIPELINE = [
+    {"$match": {
+        "ns.coll": {"$in": ["prospects", "campaign_users"]},
+        "operationType": {"$in": ["insert", "update", "replace"]},
+    }},
+    {"$project": {
+        "ns": 1,
+        "operationType": 1,
+        "fullDocument.status": 1,
+        "fullDocument.callWindowStart": 1,
+        "updateDescription.updatedFields.status": 1,
+        "updateDescription.updatedFields.callWindowStart": 1,
+    }},
+]
+
+
+class NextDueScheduler:
+    """Sleeps until the next callWindowStart and then runs on_due"""
+
+    def __init__(self, on_due: Callable[[], None], load_limit: int, poll_seconds: int, resync_seconds: int):
+        self.on_due = on_due
+        self.load_limit = load_limit
+        self.poll_seconds = poll_seconds
+        self.resync_seconds = resync_seconds
+        self._heap: List[datetime] = []
+        self._queued: Set[datetime] = set()
+        # Due times pushed while a load was running, merged into the loaded heap
+        self._loading = False
+        self._pushed_during_load: List[datetime] = []
+        # Last loaded due time when the load hit load_limit; the heap is reloaded once it has passed
+        self._horizon: Optional[datetime] = None
+        self._loaded_at = 0.0
+        self._reload_requested = True
+        self._watching = False
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+
+    def notify(self, due_at):
+        """Add a due time, waking the scheduler if it is earlier than the one it sleeps until"""
+        if not isinstance(due_at, datetime):
+            return
+        with self._lock:
+            if self._loading:
+                self._pushed_during_load.append(due_at)
+            if due_at in self._queued:
+                return
+            earliest = self._heap[0] if self._heap else None
+            heapq.heappush(self._heap, due_at)
+            self._queued.add(due_at)
+        if earliest is None or due_at < earliest:
+            self._wake.set()
+
+    def request_reload(self):
+        self._reload_requested = True
+        self._wake.set()
+
+    def load(self):
+        """
+        Rebuild the heap from the next load_limit call window openings
+
+        A prospect whose window is already open (inserted or put back to new inside
+        it) has no opening left to wait for, so it makes the heap due right away.
+        """
+        with self._lock:
+            self._reload_requested = False
+            self._loading = True
+            self._pushed_during_load = []
+        now = datetime.utcnow()
+        try:
+            cursor = get_prospects_collection().find(
+                {"status": "new", "callWindowEnd": {"$gt": now}, "callWindowStart": {"$gt": now}},
+                {"_id": 0, "callWindowStart": 1}
+            ).sort("callWindowStart", 1).limit(self.load_limit)
+            loaded = [prospect["callWindowStart"] for prospect in cursor]
+            due_now = get_prospects_collection().find_one(
+                {
+                    "status": "new",
+                    "callWindowEnd": {"$gt": now},
+                    "callWindowStart": {"$lte": now},
+                    "$or": [{"scheduledClaim": None}, {"scheduledClaim.expiresAt": {"$lt": now}}],
+                },
+                {"_id": 1}
+            )
+        finally:
+            with self._lock:
+                self._loading = False
+        with self._lock:
+            due_times = set(loaded).union(self._pushed_during_load)
+            if due_now:
+                due_times.add(now)
+            self._heap = sorted(due_times)
+            self._queued = due_times
+            self._horizon = loaded[-1] if len(loaded) >= self.load_limit else None
+        self._loaded_at = time.monotonic()
+        logger.info(f"Scheduler loaded {len(loaded)} upcoming due times, next at {self._heap[0] if self._heap else None}")
+
+    def _reload_interval(self) -> int:
+        return self.resync_seconds if self._watching else self.poll_seconds
+
+    def _reload_due(self) -> bool:
+        if self._reload_requested or time.monotonic() - self._loaded_at >= self._reload_interval():
+            return True
+        return self._horizon is not None and datetime.utcnow() >= self._horizon
+
+    def _seconds_until_next(self) -> float:
+        until_reload = self._reload_interval() - (time.monotonic() - self._loaded_at)
+        with self._lock:
+            if not self._heap:
+                return max(until_reload, 0)
+            until_due = (self._heap[0] - datetime.utcnow()).total_seconds()
+        return max(min(until_due, until_reload), 0)
+
+    def _pop_due(self) -> bool:
+        """Drop every due time that has passed, returns True if there was one"""
+        now = datetime.utcnow()
+        popped = False
+        with self._lock:
+            while self._heap and self._heap[0] <= now:
+                self._queued.discard(heapq.heappop(self._heap))
+                popped = True
+        return popped
+
+    def _run_due(self):
+        try:
+            self.on_due()
+        except Exception as e:
+            logger.error(f"Error running due scheduled calls: {str(e)}")
+
+    def _handle_change(self, change):
+        if change["ns"]["coll"] == "campaign_users":
+            # Campaign schedule changes rewrite the prospects, reload to be safe
+            self.request_reload()
+            return
+        fields = change.get("fullDocument") or change.get("updateDescription", {}).get("updatedFields", {})
+        if change["operationType"] == "update" and fields.get("status") == "new" and "callWindowStart" not in fields:
+            # A prospect put back to new keeps its call window, which is not in the heap
+            self.request_reload()
+            return
+        if fields.get("status", "new") == "new":
+            self.notify(fields.get("callWindowStart"))
+
+    def watch(self):
+        """Feed prospect and campaign changes into the heap until stopped"""
+        resume_token = None
+        while not self._stop.is_set():
+            try:
+                with get_database().watch(CHANGE_STREAM_PIPELINE, resume_after=resume_token, max_await_time_ms=1000) as stream:
+                    self._watching = True
+                    logger.info("Scheduler is watching prospect and campaign changes")
+                    while not self._stop.is_set():
+                        change = stream.try_next()
+                        resume_token = stream.resume_token
+                        if change is not None:
+                            self._handle_change(change)
+            except OperationFailure as e:
+                if e.code == CHANGE_STREAM_NOT_SUPPORTED:
+                    self._watching = False
+                    logger.warning(f"Change streams not available, polling every {self.poll_seconds}s instead")
+                    return
+                logger.error(f"Scheduler change stream failed: {str(e)}")
+            except PyMongoError as e:
+                logger.error(f"Scheduler change stream failed: {str(e)}")
+            # Changes may have been missed while the stream was down
+            self._watching = False
+            self.request_reload()
+            self._stop.wait(SCHEDULER_WATCH_RETRY_SECONDS)
+
+    def run(self):
+        """Run until stop() is called"""
+        threading.Thread(target=self.watch, daemon=True, name="scheduler-change-stream").start()
+        logger.info("Scheduler catching up on prospects that became due while it was not running")
+        self._run_due()
+        while not self._stop.is_set():
+            if self._reload_due():
+                try:
+                    self.load()
+                except Exception as e:
+                    logger.error(f"Error loading due times: {str(e)}")
+                    self._loaded_at = time.monotonic()
+            self._wake.wait(self._seconds_until_next())
+            self._wake.clear()
+            if self._pop_due():
+                self._run_due()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+
+def start_next_due_scheduler() -> NextDueScheduler:
+    """Start a scheduler on its own thread; stop() it when this process stops leading"""
+    scheduler = NextDueScheduler(
+        process_scheduled_calls,
+        load_limit=SCHEDULER_LOAD_LIMIT,
+        poll_seconds=SCHEDULER_POLL_SECONDS,
+        resync_seconds=SCHEDULER_RESYNC_SECONDS,
+    )
+    threading.Thread(target=scheduler.run, daemon=True, name="next-due-scheduler").start()
+    return scheduler
@@ -1,38 +1,50 @@
-from datetime import datetime, timedelta
+from datetime import datetime
 from services.prospect_service import get_prospects_collection
-from services.call_initiation_service import create_phone_call
-from models.prospect import ProspectIn
+from services.dial_queue_service import enqueue_prospects
+from utils.phone import PHONE_PREFIX_TIMEZONES
+from utils.timezone import is_call_window_open
 import logging
+import os
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def get_prospects_for_callback():
-    """Fetch prospects that need callback based on criteria"""
+# Most prospects queued for a retry or callback per run
+RETRY_SWEEP_LIMIT = int(os.getenv("RETRY_SWEEP_LIMIT", "1000"))
+
+# Every timezone a prospect can have; None is a prospect whose location is unknown
+PROSPECT_TIMEZONES = sorted(set(PHONE_PREFIX_TIMEZONES.values())) + [None]
+
+
+def get_open_timezones(now: datetime = None):
+    """Prospect timezones where it is call hours now"""
+    return [timezone for timezone in PROSPECT_TIMEZONES if is_call_window_open(timezone, now)]
+
+def get_prospects_for_callback(now: datetime = None, limit: int = None):
+    """
+    Fetch prospects whose retry or callback is due
+
+    nextAttemptAt is set by the retry policy when a call result lands (see
+    services.retry_policy), so this is a range scan on its sparse index. Only
+    prospects for which it is call hours in their own timezone, and that have not been
+    put back to "new" by an upload, are returned.
+    """
     try:
         collection = get_prospects_collection()
-        
-        # Get current date in YYYY/MM/DD format
-        current_date = datetime.utcnow().strftime("%Y-%m-%d")
-        
-        # Query to find prospects that need callback
-        query = {
-            "$and": [
-                {"retryCount": {"$gt": 0, "$lt": 4}},
-                {"status": {"$ne": "new"}},
-                {"callBackCount": {"$lt" : 3}},
-                {
-                    "$or": [
-                        {"callBackDate": {"$eq": current_date}}
-                    ]
-                }
-            ]
-        }
+        now = now or datetime.utcnow()
+        open_timezones = get_open_timezones(now)
+        if not open_timezones:
+            return []
 
-        prospects = list(collection.find(query))
+        prospects = list(
+            # A "new" prospect was (re-)uploaded after its last call; its schedule decides when it is called
+            collection.find({"nextAttemptAt": {"$lte": now}, "timezone": {"$in": open_timezones}, "status": {"$ne": "new"}})
+            .sort("nextAttemptAt", 1)
+            .limit(limit or RETRY_SWEEP_LIMIT)
+        )
 
-        logger.info(f"Found {len(prospects)} prospects for callback  245")
+        logger.info(f"Found {len(prospects)} prospects due for a retry or callback")
         return prospects
 
     except Exception as e:
@@ -40,30 +52,24 @@ def get_prospects_for_callback():
         raise
 
 def schedule_callbacks():
-    """Main function to schedule callbacks for prospects"""
+    """Queue the prospects whose retry or callback is due"""
     try:
-        # Get prospects that need callback
-        prospects = get_prospects_for_callback()
-        
+        # Due prospects outside their call hours keep their nextAttemptAt until the hours open
+        now = datetime.utcnow()
+        prospects = get_prospects_for_callback(now)
         if not prospects:
-            logger.info("No prospects found for callback")
             return
 
-        # Convert MongoDB documents to ProspectIn objects
-        prospect_objects = [
-            ProspectIn(
-                name=prospect.get("name"),
-                phoneNumber=prospect["phoneNumber"],
-                businessName=prospect["businessName"],
-                ownerName=prospect.get("ownerName", ""),
-                # scheduledCallDate=datetime.fromisoformat(prospect["scheduledCallDate"].replace("Z", "+00:00"))
-            ) for prospect in prospects
-        ]
+        # The dial queue worker places the calls; the next result sets a new nextAttemptAt
+        logger.info(f"@@@@ -- call Scheduler------  Queueing retries and callbacks for {len(prospects)} prospects")
+        enqueue_prospects(prospects, "retry")
 
-        # Initiate calls
-        logger.info(f"@@@@ -- call Scheduler------  Initiating calls for {len(prospect_objects)} prospects")
-        create_phone_call(prospect_objects)
+        # Clear the due time that was queued; a result that landed in the meantime keeps its own
+        get_prospects_collection().update_many(
+            {"_id": {"$in": [prospect["_id"] for prospect in prospects]}, "nextAttemptAt": {"$lte": now}},
+            {"$unset": {"nextAttemptAt": ""}}
+        )
 
     except Exception as e:
         logger.error(f"Error in schedule_callbacks: {str(e)}")
-        raise 
\ No newline at end of file
+        raise
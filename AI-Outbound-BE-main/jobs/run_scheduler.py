@@ -1,41 +1,133 @@
+"""
+Standalone scheduler process.
+
+    python -m jobs.run_scheduler
+
+Runs the background jobs (scheduled calls, retries, dial queue, reconciliation, webhook
+sweep, ingest resumption) outside the web workers. Any number of these processes
+can run; they elect a leader through a lease in MongoDB and only the leader runs
+jobs. The others are hot standbys that take over once the leader's lease has
+expired, or right away when the leader shuts down cleanly.
+"""
 import schedule
+import signal
+import socket
+import threading
 import time
-from jobs.scheduled_calls_scheduler import process_scheduled_calls
+import uuid
+from jobs.next_due_scheduler import start_next_due_scheduler
 from jobs.retry_and_call_back_scheduler import schedule_callbacks
+from services.ingest_job_service import resume_ingest_jobs
+from services.scheduler_lease_service import acquire_lease, release_lease
+from jobs.dial_queue_worker import process_dial_queue
+from jobs.batch_reconciler import reconcile_stale_batches
+from services.webhook_inbox_service import process_pending_events
 import logging
+import os
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# How often queued calls are claimed and dialed
+DIAL_QUEUE_POLL_SECONDS = int(os.getenv("DIAL_QUEUE_POLL_SECONDS", "10"))
+# How often batches with missing webhooks are fetched from Retell
+RECONCILE_INTERVAL_MINUTES = int(os.getenv("RECONCILE_INTERVAL_MINUTES", "5"))
+# How often due retries and callbacks are queued
+RETRY_SWEEP_INTERVAL_SECONDS = int(os.getenv("RETRY_SWEEP_INTERVAL_SECONDS", "60"))
+# A standby takes over this long after the leader stopped renewing its lease
+SCHEDULER_LEASE_SECONDS = int(os.getenv("SCHEDULER_LEASE_SECONDS", "30"))
+# How often the leader renews its lease and standbys try to take it
+SCHEDULER_LEASE_RENEW_SECONDS = int(os.getenv("SCHEDULER_LEASE_RENEW_SECONDS", "10"))
+
+SCHEDULER_LEASE_NAME = "scheduler"
+SCHEDULER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def register_jobs():
+    """Register the periodic jobs run by the leader"""
+    # Resume prospect uploads abandoned by a process that stopped renewing its lease
+    schedule.every(1).minutes.do(resume_ingest_jobs)
+
+    # Dial queued prospects and retry failed batches once their backoff has elapsed
+    schedule.every(DIAL_QUEUE_POLL_SECONDS).seconds.do(process_dial_queue)
+
+    # Fill in calls whose call_analyzed webhook was lost
+    schedule.every(RECONCILE_INTERVAL_MINUTES).minutes.do(reconcile_stale_batches)
+
+    # Apply webhook events that never reached a worker or whose worker died
+    schedule.every(1).minutes.do(process_pending_events)
+
+    # Queue retries and callbacks whose nextAttemptAt has passed
+    schedule.every(RETRY_SWEEP_INTERVAL_SECONDS).seconds.do(schedule_callbacks)
+
+    # Schedule newsletter to run on the first day of every month at 10
+    # schedule.every(1).minutes.do(send_monthly_newsletter)   # later change to every month
+    # schedule.every().month.at("10:00").do(send_monthly_newsletter)
+
+    logger.info("Scheduler jobs registered. Will run:")
+    logger.info("- Scheduled calls when the next prospect is due")
+    logger.info(f"- Dial queue every {DIAL_QUEUE_POLL_SECONDS}s, batch reconciliation every {RECONCILE_INTERVAL_MINUTES} min")
+    logger.info(f"- Retries and callbacks every {RETRY_SWEEP_INTERVAL_SECONDS}s")
+    logger.info("- Webhook inbox sweep and ingest job resumption every minute")
+
+
+def _keep_lease(leading: threading.Event, stopping: threading.Event):
+    """Renew the lease on its own thread, so a long job cannot let it expire"""
+    while not stopping.is_set():
+        try:
+            holds_lease = acquire_lease(SCHEDULER_LEASE_NAME, SCHEDULER_ID, SCHEDULER_LEASE_SECONDS)
+        except Exception as e:
+            # Step down: another process may take the lease once it expires
+            logger.error(f"Error renewing scheduler lease: {str(e)}")
+            holds_lease = False
+        if holds_lease and not leading.is_set():
+            logger.info(f"Scheduler {SCHEDULER_ID} is now the leader")
+            leading.set()
+        elif not holds_lease and leading.is_set():
+            logger.warning(f"Scheduler {SCHEDULER_ID} lost the lease, standing by")
+            leading.clear()
+        stopping.wait(SCHEDULER_LEASE_RENEW_SECONDS)
+
+
 def run_scheduler():
-    """Run the unified scheduler to process scheduled calls, callbacks, and newsletters"""
+    """Run the jobs while this process holds the scheduler lease, stand by otherwise"""
+    leading = threading.Event()
+    stopping = threading.Event()
+    threading.Thread(target=_keep_lease, args=(leading, stopping), daemon=True, name="scheduler-lease").start()
+    logger.info(f"Scheduler {SCHEDULER_ID} started, waiting for the lease")
+
+    next_due = None
     try:
-        # Schedule the job to run every day at 9 AM for scheduled calls
-        schedule.every(1).minutes.do(process_scheduled_calls)
-        # schedule.every().day.at("09:00").do(process_scheduled_calls)
-        
-        # Schedule callbacks to run every hour
-        # schedule.every(1).minutes.do(schedule_callbacks)
-        # schedule.every().hour.do(schedule_callbacks)
-        
-        # Schedule newsletter to run on the first day of every month at 10 
-        # schedule.every(1).minutes.do(send_monthly_newsletter)   # later change to every month
-        # schedule.every().month.at("10:00").do(send_monthly_newsletter)
-        
-        logger.info("Scheduler started. Will run:")
-        logger.info("- Scheduled calls every day at 9 AM")
-        logger.info("- Callbacks every hour")
-        logger.info("- Newsletter on the first day of every month at 10 AM")
-        
-        # Keep the script running
         while True:
-            schedule.run_pending()
-            time.sleep(1)  
-            
+            if leading.is_set():
+                if next_due is None:
+                    register_jobs()
+                    next_due = start_next_due_scheduler()
+                schedule.run_pending()
+            elif next_due is not None:
+                schedule.clear()
+                next_due.stop()
+                next_due = None
+            time.sleep(1)
+
     except Exception as e:
         logger.error(f"Error in scheduler: {str(e)}")
         raise
+    finally:
+        stopping.set()
+        if next_due is not None:
+            next_due.stop()
+        if leading.is_set():
+            # Let a standby take over without waiting for the lease to expire
+            release_lease(SCHEDULER_LEASE_NAME, SCHEDULER_ID)
+            logger.info("Scheduler lease released")
+
+
+def _exit_on_signal(signum, frame):
+    raise SystemExit(0)
+
 
 if __name__ == "__main__":
-    run_scheduler() 
\ No newline at end of file
+    signal.signal(signal.SIGTERM, _exit_on_signal)
+    run_scheduler()
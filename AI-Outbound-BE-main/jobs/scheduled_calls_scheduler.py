@@ -1,39 +1,85 @@
 from datetime import datetime, timedelta
 from services.prospect_service import get_prospects_collection
-from services.call_initiation_service import create_phone_call
-from models.prospect import ProspectIn
+from services.dial_queue_service import enqueue_prospects
+from jobs.dial_queue_worker import process_dial_queue, WORKER_ID
 import logging
-from utils.timezone import get_brisbane_now, get_brisbane_date, get_brisbane_time, is_within_call_hours, get_brisbane_timezone_info
+import os
+import uuid
+from utils.timezone import get_brisbane_timezone_info
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# How long a claimed prospect is reserved for the instance that claimed it. While the claim
+# holds, no other instance queues the prospect again, even if it is still "new". The dial
+# queue clears the claim once the prospect is dialed or dead-lettered, so the lease only
+# runs out when the queue item itself was lost.
+SCHEDULED_CLAIM_LEASE_SECONDS = int(os.getenv("SCHEDULED_CLAIM_LEASE_SECONDS", "3600"))
 
-def get_scheduled_prospects():
-    """Fetch prospects that are scheduled for calls today"""
+
+def claim_scheduled_prospects(owner: str = WORKER_ID):
+    """
+    Claim the prospects whose scheduled call is due
+
+    A prospect is due while its call window is open: from its scheduledAt, or the start of
+    the call hours in its own timezone if that is later, until the end of those call hours
+    on its scheduled day. Only prospects that have not been called yet are due. A tick that
+    was skipped no longer drops the prospects of that minute, they are picked up by the next one.
+
+    The due prospects are stamped with a fresh claim token in one update_many and then read
+    back by that token, so when several instances run this job at once each prospect is
+    returned to exactly one of them.
+
+    Args:
+        owner (str): Instance claiming the prospects
+
+    Returns:
+        list: The prospects claimed by this call
+    """
     try:
         collection = get_prospects_collection()
-        
-        # Get current date in YYYY-MM-DD format using Brisbane timezone
-        current_date = get_brisbane_date()
-        logger.info(f"Current Brisbane date for schedule_calls cron job: {current_date}")
-        
-        # Query to find prospects scheduled for today
-        query = {
-            "scheduledCallDate": {"$regex": f"^{current_date}"},
-            "status": "new"  # Only get prospects that haven't been called yet
+        now = datetime.utcnow()
+        token = uuid.uuid4().hex
+
+        # Index range scan on (status, callWindowEnd, callWindowStart)
+        due = {
+            "status": "new",  # Only get prospects that haven't been called yet
+            "callWindowEnd": {"$gt": now},
+            "callWindowStart": {"$lte": now},
         }
+        result = collection.update_many(
+            {**due, "$or": [
+                {"scheduledClaim": None},
+                {"scheduledClaim.expiresAt": {"$lt": now}},
+            ]},
+            {"$set": {"scheduledClaim": {
+                "token": token,
+                "owner": owner,
+                "expiresAt": now + timedelta(seconds=SCHEDULED_CLAIM_LEASE_SECONDS),
+            }}}
+        )
+        if not result.modified_count:
+            logger.info("No unclaimed prospects due for their scheduled call")
+            return []
 
-        prospects = list(collection.find(query))
-        logger.info(f"Found {len(prospects)} prospects scheduled for calls today (Brisbane time)")
+        prospects = list(collection.find({**due, "scheduledClaim.token": token}))
+        logger.info(f"Claimed {len(prospects)} prospects due for their scheduled call")
         return prospects
 
     except Exception as e:
-        logger.error(f"Error fetching scheduled prospects: {str(e)}")
+        logger.error(f"Error claiming scheduled prospects: {str(e)}")
         raise
 
-# Note: is_within_call_hours() is now imported from utils.timezone
+
+def release_scheduled_claims(prospects):
+    """Give claimed prospects back so the next run can claim them again"""
+    tokens = {prospect["scheduledClaim"]["token"] for prospect in prospects if prospect.get("scheduledClaim")}
+    if tokens:
+        get_prospects_collection().update_many(
+            {"_id": {"$in": [prospect["_id"] for prospect in prospects]}, "scheduledClaim.token": {"$in": list(tokens)}},
+            {"$unset": {"scheduledClaim": ""}}
+        )
 
 def process_scheduled_calls():
     """Main function to process scheduled calls"""
@@ -42,55 +88,19 @@ def process_scheduled_calls():
         tz_info = get_brisbane_timezone_info()
         logger.info(f"Brisbane timezone info: {tz_info}")
         
-        # Check if current time is within allowed call hours in Brisbane timezone
-        if not is_within_call_hours():
-            logger.info("Current time in Brisbane is outside of allowed call hours (10 AM to 7 PM). Skipping calls.")
-            return
-
-        # Get prospects scheduled for today
-        prospects = get_scheduled_prospects()
-
-        logger.info(f"Prospects found: {len(prospects) if prospects else 0}")
-        
-        if not prospects:
-            logger.info("No prospects found scheduled for calls today (Brisbane time)")
-            return
-
-        # Get current time in HH:MM format using Brisbane timezone
-        current_time = get_brisbane_time()
-        logger.info(f"Current time in Brisbane: {current_time}")
-        
-        # Filter prospects by scheduled call time
-        prospects_to_call = []
-        for prospect in prospects:
-            scheduled_time = prospect.get("scheduledCallTime", "")
-            logger.info(f"Prospect scheduled time: {scheduled_time}, Current time: {current_time}")
-            # If scheduledCallTime matches current time or is empty (backward compatibility)
-            if not scheduled_time or scheduled_time == current_time:
-                prospects_to_call.append(prospect)
-        
+        # Prospects whose local call window is open, claimed by this instance only
+        prospects_to_call = claim_scheduled_prospects()
         if not prospects_to_call:
-            logger.info(f"No prospects found with scheduled call time matching current Brisbane time ({current_time})")
             return
-            
-        logger.info(f"Found {len(prospects_to_call)} prospects with matching scheduled call time")
-
-        # Convert MongoDB documents to ProspectIn objects
-        prospect_objects = [
-            ProspectIn(
-                name=prospect.get("name"),
-                phoneNumber=prospect["phoneNumber"],
-                businessName=prospect["businessName"],
-                scheduledCallDate=datetime.fromisoformat(prospect["scheduledCallDate"].replace("Z", "+00:00")),
-                ownerName=prospect.get("ownerName", ""),  # Include the owner name
-                campaignId=prospect.get("campaignId", ""),
-                scheduledCallTime=prospect.get("scheduledCallTime", "")
-            ) for prospect in prospects_to_call
-        ]
-
-        # Initiate calls
-        logger.info(f"@@@@ --Scheduled Calls------  Initiating scheduled calls for {len(prospect_objects)} prospects")
-        create_phone_call(prospect_objects)
+
+        # Queue the prospects; the dial queue worker places the calls and retries failed batches
+        logger.info(f"@@@@ --Scheduled Calls------  Queueing scheduled calls for {len(prospects_to_call)} prospects")
+        try:
+            enqueue_prospects(prospects_to_call, "scheduled")
+        except Exception:
+            release_scheduled_claims(prospects_to_call)
+            raise
+        process_dial_queue()
 
     except Exception as e:
         logger.error(f"Error in process_scheduled_calls: {str(e)}")
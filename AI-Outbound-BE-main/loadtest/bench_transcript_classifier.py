@@ -0,0 +1,73 @@
+"""
+Benchmark for utils.transcript_classifier.
+
+Times the single pass classifier and the phrase scan it replaced over a corpus
+of call-length transcripts and reports the time per transcript of both. The
+decisions themselves are pinned in tests/test_transcript_classifier.py; the
+number of transcripts the two disagree on is only reported here.
+
+    python -m loadtest.bench_transcript_classifier [--transcripts 2000] [--turns 120]
+    # time the transcripts stored in call_transcripts instead (read only)
+    python -m loadtest.bench_transcript_classifier --from-db --limit 5000
+"""
+import argparse
+import json
+import time
+from tests.legacy_classifier import generate_corpus, legacy_detect_appointment_type
+from utils.transcript_classifier import classify_appointment_type
+
+def load_stored_transcripts(limit: int):
+    """Transcripts from call_transcripts, each checked with and without appointment interest"""
+    from config.database import get_call_transcripts_collection
+    from services.transcript_service import decompress_transcript
+    corpus = []
+    for document in get_call_transcripts_collection().find({}, {"transcript": 1}).limit(limit):
+        transcript = decompress_transcript(document["transcript"])
+        corpus.extend([(transcript, True), (transcript, None)])
+    return corpus
+
+
+def time_per_call(classify, corpus, repeat: int) -> float:
+    """Best of repeat runs, in microseconds per transcript"""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for transcript, interest in corpus:
+            classify(transcript, interest)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best / len(corpus) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transcripts", type=int, default=2000)
+    parser.add_argument("--turns", type=int, default=120, help="Upper bound of turns per generated transcript")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--from-db", action="store_true", help="Use transcripts stored in call_transcripts")
+    parser.add_argument("--limit", type=int, default=5000)
+    args = parser.parse_args()
+
+    corpus = load_stored_transcripts(args.limit) if args.from_db else generate_corpus(args.transcripts, args.turns, args.seed)
+    mismatches = sum(
+        1 for transcript, interest in corpus
+        if classify_appointment_type(transcript, interest) != legacy_detect_appointment_type(transcript, interest)
+    )
+
+    lengths = sorted(len(transcript or "") for transcript, _ in corpus)
+    legacy_us = time_per_call(legacy_detect_appointment_type, corpus, args.repeat)
+    compiled_us = time_per_call(classify_appointment_type, corpus, args.repeat)
+    print(json.dumps({
+        "transcripts": len(corpus),
+        "medianChars": lengths[len(lengths) // 2] if lengths else 0,
+        "maxChars": lengths[-1] if lengths else 0,
+        "legacyMicrosPerTranscript": round(legacy_us, 1),
+        "compiledMicrosPerTranscript": round(compiled_us, 1),
+        "speedup": round(legacy_us / compiled_us, 2) if compiled_us else None,
+        "mismatches": mismatches,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+"""
+Local stand-in for the Retell API, for load tests only.
+
+Implements the endpoints the backend uses (create-batch-call, get-batch-call
+and list-calls, with Retell's response shapes) and plays every task out as a call: call_started,
+call_ended and call_analyzed webhooks are posted back to the backend with
+randomized ring/talk/analysis delays and outcomes.
+
+Run it next to the backend and point the backend at it:
+
+    uvicorn loadtest.fake_retell_server:app --port 8090
+    RETELL_BASE_URL=http://127.0.0.1:8090 RETELL_API_KEY=fake uvicorn main:app --port 8080
+
+Settings (environment variables):
+    FAKE_RETELL_WEBHOOK_URL      where webhooks are posted (http://127.0.0.1:8080/webhook)
+    FAKE_RETELL_TIME_SCALE       multiplier for every delay, e.g. 0.05 to compress a
+                                 two minute call into six seconds (1.0)
+    FAKE_RETELL_CONCURRENCY      live calls allowed before create-batch-call answers
+                                 429, 0 disables the check (15)
+    FAKE_RETELL_WEBHOOK_DROP_RATE  share of call_analyzed webhooks never sent (0.0)
+    FAKE_RETELL_SEED             random seed for reproducible runs
+"""
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+import asyncio
+import httpx
+import logging
+import os
+import random
+import time
+import uuid
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+WEBHOOK_URL = os.getenv("FAKE_RETELL_WEBHOOK_URL", "http://127.0.0.1:8080/webhook")
+TIME_SCALE = float(os.getenv("FAKE_RETELL_TIME_SCALE", "1.0"))
+CONCURRENCY = int(os.getenv("FAKE_RETELL_CONCURRENCY", "15"))
+WEBHOOK_DROP_RATE = float(os.getenv("FAKE_RETELL_WEBHOOK_DROP_RATE", "0.0"))
+
+# (weight, call_status, disconnection_reason, talk seconds range, appointment interest rate)
+OUTCOMES = [
+    (0.35, "ended", "user_hangup", (40, 240), 0.25),
+    (0.10, "ended", "agent_hangup", (60, 300), 0.40),
+    (0.15, "ended", "voicemail_reached", (15, 40), 0.0),
+    (0.25, "not_connected", "dial_no_answer", (0, 0), 0.0),
+    (0.10, "not_connected", "dial_busy", (0, 0), 0.0),
+    (0.05, "error", "error_unknown", (0, 0), 0.0),
+]
+RING_SECONDS = (3, 25)
+ANALYSIS_SECONDS = (2, 15)
+
+TRANSCRIPT_LINES = [
+    "Agent: Hi, this is Sarah calling about growing the value of your business.",
+    "User: Sure, I have a couple of minutes.",
+    "Agent: Would you prefer a selling or advisory appointment?",
+    "User: Advisory sounds good, maybe next week.",
+    "Agent: Great, I will send you the details by email.",
+]
+
+rng = random.Random(os.getenv("FAKE_RETELL_SEED"))
+app = FastAPI(title="Fake Retell API")
+
+batches = {}
+calls = {}
+live_calls = set()
+stats = {}
+
+
+def reset_stats():
+    stats.clear()
+    stats.update({
+        "startedAt": time.time(),
+        "batchesAccepted": 0,
+        "batchesRejected": 0,
+        "tasksAccepted": 0,
+        "firstBatchAt": None,
+        "lastBatchAt": None,
+        "webhooksSent": 0,
+        "webhooksFailed": 0,
+        "webhooksDropped": 0,
+        "webhookLatenciesMs": {"call_started": [], "call_ended": [], "call_analyzed": []},
+        "outcomes": {},
+        "maxLiveCalls": 0,
+    })
+
+
+reset_stats()
+
+
+def _delay(bounds) -> float:
+    low, high = bounds
+    return rng.uniform(low, high) * TIME_SCALE
+
+
+def _pick_outcome():
+    roll = rng.random() * sum(outcome[0] for outcome in OUTCOMES)
+    for outcome in OUTCOMES:
+        roll -= outcome[0]
+        if roll <= 0:
+            return outcome
+    return OUTCOMES[-1]
+
+
+def _percentiles(values):
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+    pick = lambda q: round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 1)
+    return {"count": len(ordered), "p50": pick(0.5), "p95": pick(0.95), "p99": pick(0.99), "max": round(ordered[-1], 1)}
+
+
+async def _post_webhook(client: httpx.AsyncClient, event: str, call: dict):
+    started = time.perf_counter()
+    try:
+        response = await client.post(WEBHOOK_URL, json={"event": event, "call": call})
+        response.raise_for_status()
+        stats["webhooksSent"] += 1
+        stats["webhookLatenciesMs"][event].append((time.perf_counter() - started) * 1000)
+    except Exception as e:
+        stats["webhooksFailed"] += 1
+        logger.warning(f"Webhook {event} for {call['call_id']} failed: {str(e)}")
+
+
+async def _play_call(client: httpx.AsyncClient, call: dict):
+    """Walk one call through its lifecycle, posting webhooks as it goes"""
+    weight, call_status, reason, talk_seconds, interest_rate = _pick_outcome()
+    stats["outcomes"][reason] = stats["outcomes"].get(reason, 0) + 1
+    await asyncio.sleep(_delay(RING_SECONDS))
+
+    call["start_timestamp"] = int(time.time() * 1000)
+    connected = call_status == "ended"
+    if connected:
+        call["call_status"] = "ongoing"
+        live_calls.add(call["call_id"])
+        stats["maxLiveCalls"] = max(stats["maxLiveCalls"], len(live_calls))
+        await _post_webhook(client, "call_started", dict(call))
+        await asyncio.sleep(_delay(talk_seconds))
+
+    live_calls.discard(call["call_id"])
+    call.update({
+        "call_status": call_status,
+        "disconnection_reason": reason,
+        "end_timestamp": int(time.time() * 1000),
+        "duration_ms": int(time.time() * 1000) - call["start_timestamp"] if connected else 0,
+        "recording_url": f"https://example.invalid/recordings/{call['call_id']}.wav" if connected else None,
+        "transcript": "\n".join(TRANSCRIPT_LINES) if connected else "",
+    })
+    await _post_webhook(client, "call_ended", dict(call))
+
+    await asyncio.sleep(_delay(ANALYSIS_SECONDS))
+    interested = rng.random() < interest_rate
+    call["call_analysis"] = {
+        "call_summary": "Synthetic load test call",
+        "custom_analysis_data": {
+            "call_summary_info": "Synthetic load test call",
+            "appointment_interest": interested if connected else None,
+            "appointment_date_time": "2030-01-01T10:00:00" if interested else None,
+            "call_back_request": (rng.random() < 0.2) if connected else None,
+            "call_back_date": "",
+            "ebook": rng.random() < 0.1 if connected else None,
+            "is_subscribe_to_news_letter": rng.random() < 0.1 if connected else None,
+            "email": None,
+        },
+    }
+    if rng.random() < WEBHOOK_DROP_RATE:
+        # Left for the reconciler, which reads the result from list-calls
+        stats["webhooksDropped"] += 1
+        return
+    await _post_webhook(client, "call_analyzed", dict(call))
+
+
+async def _play_batch(tasks: list, batch_call_id: str, from_number: str):
+    async with httpx.AsyncClient(timeout=30) as client:
+        coroutines = []
+        for task in tasks:
+            call = {
+                "call_id": f"call_{uuid.uuid4().hex}",
+                "batch_call_id": batch_call_id,
+                "call_type": "phone_call",
+                "from_number": from_number,
+                "to_number": task.get("to_number"),
+                "direction": "outbound",
+                "call_status": "registered",
+                "retell_llm_dynamic_variables": task.get("retell_llm_dynamic_variables", {}),
+            }
+            calls[call["call_id"]] = call
+            batches[batch_call_id]["callIds"].append(call["call_id"])
+            coroutines.append(_play_call(client, call))
+        await asyncio.gather(*coroutines)
+
+
+@app.post("/create-batch-call")
+async def create_batch_call(request: Request):
+    body = await request.json()
+    tasks = body.get("tasks", [])
+    if CONCURRENCY and len(live_calls) + len(tasks) > CONCURRENCY:
+        stats["batchesRejected"] += 1
+        return JSONResponse(status_code=429, content={"message": "Concurrency limit reached"})
+
+    now = time.time()
+    batch_call_id = f"batch_{uuid.uuid4().hex}"
+    batches[batch_call_id] = {"from_number": body.get("from_number"), "callIds": [], "createdAt": now}
+    stats["batchesAccepted"] += 1
+    stats["tasksAccepted"] += len(tasks)
+    stats["firstBatchAt"] = stats["firstBatchAt"] or now
+    stats["lastBatchAt"] = now
+
+    asyncio.create_task(_play_batch(tasks, batch_call_id, body.get("from_number")))
+    return {
+        "batch_call_id": batch_call_id,
+        "name": body.get("name") or batch_call_id,
+        "from_number": body.get("from_number"),
+        "scheduled_timestamp": int(now * 1000),
+        "total_task_count": len(tasks),
+    }
+
+
+@app.get("/get-batch-call/{batch_call_id}")
+async def get_batch_call(batch_call_id: str):
+    batch = batches.get(batch_call_id)
+    if not batch:
+        return JSONResponse(status_code=404, content={"message": "Batch call not found"})
+    return {
+        "batch_call_id": batch_call_id,
+        "name": batch_call_id,
+        "from_number": batch["from_number"],
+        "scheduled_timestamp": int(batch["createdAt"] * 1000),
+        "total_task_count": len(batch["callIds"]),
+    }
+
+
+@app.post("/v2/list-calls")
+async def list_calls(request: Request):
+    body = await request.json()
+    filter_criteria = body.get("filter_criteria") or {}
+    matching = list(calls.values())
+    for field in ("batch_call_id", "to_number", "call_status"):
+        if filter_criteria.get(field):
+            matching = [call for call in matching if call.get(field) in filter_criteria[field]]
+    # Pages continue after the last call_id of the previous page
+    if body.get("pagination_key"):
+        call_ids = [call["call_id"] for call in matching]
+        if body["pagination_key"] in call_ids:
+            matching = matching[call_ids.index(body["pagination_key"]) + 1:]
+    return matching[:body.get("limit") or 50]
+
+
+@app.get("/stats")
+async def get_stats():
+    elapsed = (stats["lastBatchAt"] or 0) - (stats["firstBatchAt"] or 0)
+    return {
+        **{key: value for key, value in stats.items() if key != "webhookLatenciesMs"},
+        "liveCalls": len(live_calls),
+        "dispatchSeconds": round(elapsed, 2),
+        "tasksPerSecond": round(stats["tasksAccepted"] / elapsed, 2) if elapsed > 0 else None,
+        "webhookLatencyMs": {event: _percentiles(values) for event, values in stats["webhookLatenciesMs"].items()},
+    }
+
+
+@app.post("/reset")
+async def reset():
+    batches.clear()
+    calls.clear()
+    live_calls.clear()
+    reset_stats()
+    return {"message": "Reset"}
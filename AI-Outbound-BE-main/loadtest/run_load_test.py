@@ -0,0 +1,136 @@
+"""
+Dispatch and webhook load test against the fake Retell server.
+
+Seeds N prospects into a throwaway campaign, triggers /api/campaign_call on a
+running backend and waits until every prospect has its call result. Reports
+dispatch throughput, webhook latency (from the fake server) and MongoDB write
+volume (serverStatus opcounters, so use a dedicated database server).
+
+    # 1. fake Retell server
+    FAKE_RETELL_TIME_SCALE=0.05 uvicorn loadtest.fake_retell_server:app --port 8090
+    # 2. backend pointed at it
+    RETELL_BASE_URL=http://127.0.0.1:8090 RETELL_API_KEY=fake FROM_NUMBER=+61700000000 \
+        uvicorn main:app --port 8080
+    # 3. harness (same MONGO_DB_URL as the backend)
+    RETELL_BASE_URL=http://127.0.0.1:8090 python -m loadtest.run_load_test --prospects 1000
+"""
+from datetime import datetime
+import argparse
+import json
+import os
+import sys
+import time
+import httpx
+
+APP_URL = os.getenv("LOADTEST_APP_URL", "http://127.0.0.1:8080")
+FAKE_RETELL_URL = os.getenv("RETELL_BASE_URL", "")
+
+
+def opcounters(db):
+    counters = db.client.admin.command("serverStatus")["opcounters"]
+    return {key: counters[key] for key in ("insert", "query", "update", "delete", "getmore", "command")}
+
+
+def seed_prospects(count: int, campaign_id: str, campaign_name: str):
+    """Replace the load test campaign with count fresh prospects"""
+    from config.database import get_prospects_collection, get_dial_queue_collection
+    from services.prospect_ingest_service import ingest_prospects
+    from models.prospect import ProspectIn
+
+    get_prospects_collection().delete_many({"campaignId": campaign_id})
+    get_dial_queue_collection().delete_many({"campaignId": campaign_id})
+    prospects = [
+        ProspectIn(
+            name=f"Load Test {index}",
+            phoneNumber=f"+6170{index:07d}",
+            businessName=f"Load Test Business {index}",
+            ownerName="loadtest",
+            campaignId=campaign_id,
+            campaignName=campaign_name,
+        )
+        for index in range(count)
+    ]
+    ingest_prospects(prospects, datetime.utcnow().strftime("%Y-%m-%d"), campaign_name, campaign_id)
+    return [prospect.phoneNumber for prospect in prospects]
+
+
+def completed_count(campaign_id: str) -> int:
+    """Prospects whose call result has been written (no batch-only calls entry left)"""
+    from config.database import get_prospects_collection
+    return get_prospects_collection().count_documents({
+        "campaignId": campaign_id,
+        "calls.callId": {"$exists": True},
+        "calls": {"$not": {"$elemMatch": {"batchId": {"$exists": True}, "callId": {"$exists": False}}}},
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--prospects", type=int, default=500)
+    parser.add_argument("--campaign-id", default="loadtest")
+    parser.add_argument("--timeout", type=int, default=1800, help="Seconds to wait for every call result")
+    args = parser.parse_args()
+
+    if not FAKE_RETELL_URL or "retellai.com" in FAKE_RETELL_URL:
+        # Never place real calls from a load test
+        print("RETELL_BASE_URL must point at the fake Retell server")
+        sys.exit(1)
+
+    from config.database import get_database
+    db = get_database()
+    http = httpx.Client(timeout=60)
+    http.post(f"{FAKE_RETELL_URL}/reset").raise_for_status()
+
+    phone_numbers = seed_prospects(args.prospects, args.campaign_id, "Load Test")
+    counters_before = opcounters(db)
+
+    started = time.perf_counter()
+    response = http.post(f"{APP_URL}/api/campaign_call", json={
+        "campaign_name": "Load Test",
+        "campaign_id": args.campaign_id,
+        "phone_numbers": phone_numbers,
+    })
+    response.raise_for_status()
+    queued_seconds = time.perf_counter() - started
+
+    completed = 0
+    while time.perf_counter() - started < args.timeout:
+        completed = completed_count(args.campaign_id)
+        if completed >= args.prospects:
+            break
+        time.sleep(2)
+    total_seconds = time.perf_counter() - started
+
+    counters_after = opcounters(db)
+    fake_stats = http.get(f"{FAKE_RETELL_URL}/stats").json()
+    report = {
+        "prospects": args.prospects,
+        "completed": completed,
+        "campaignCallSeconds": round(queued_seconds, 2),
+        "endToEndSeconds": round(total_seconds, 2),
+        "prospectsPerSecond": round(completed / total_seconds, 2) if total_seconds else None,
+        "dispatch": {
+            "batchesAccepted": fake_stats["batchesAccepted"],
+            "batchesRejected": fake_stats["batchesRejected"],
+            "tasksAccepted": fake_stats["tasksAccepted"],
+            "dispatchSeconds": fake_stats["dispatchSeconds"],
+            "tasksPerSecond": fake_stats["tasksPerSecond"],
+            "maxLiveCalls": fake_stats["maxLiveCalls"],
+        },
+        "webhooks": {
+            "sent": fake_stats["webhooksSent"],
+            "failed": fake_stats["webhooksFailed"],
+            "dropped": fake_stats["webhooksDropped"],
+            "latencyMs": fake_stats["webhookLatencyMs"],
+        },
+        "mongoOps": {key: counters_after[key] - counters_before[key] for key in counters_before},
+        "outcomes": fake_stats["outcomes"],
+    }
+    report["mongoOpsPerProspect"] = {
+        key: round(value / args.prospects, 2) for key, value in report["mongoOps"].items()
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
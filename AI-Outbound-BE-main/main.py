@@ -1,5 +1,6 @@
 import os
-from fastapi import FastAPI, Request
+import asyncio
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.staticfiles import StaticFiles
 from routes.calender_route import router as calender_router
 from routes.prospects_route import router as prospects_router
@@ -12,21 +13,22 @@ from routes.upload_route import router as upload_router
 from routes.user_route import router as user_router
 from routes.appointment_email_route import appointment_email_router
 from routes.benchmark_route import benchmark_router
-from services.prospect_service import update_prospect_call_info
+from services.ingest_job_service import resume_ingest_jobs
+from services.call_pacing import record_call_event, pacer
+from services.webhook_inbox_service import enqueue_webhook_event, start_webhook_workers, stop_webhook_workers, get_webhook_queue_stats
 from fastapi.middleware.cors import CORSMiddleware
-import threading
-from jobs.run_scheduler import run_scheduler
 import uvicorn
 from pathlib import Path
 from config.cloudinary_config import configure_cloudinary
 import logging
-from retell import Retell
+from config.retell_config import get_retell_client
+from config.async_database import get_async_database, close_async_client
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-retell = Retell(api_key=os.getenv("RETELL_API_KEY"))
+retell = get_retell_client()
 
 app = FastAPI(title="Sales Agent Backend")
 
@@ -47,12 +49,7 @@ if cloudinary_configured:
 else:
     logger.warning("Cloudinary configuration failed or not provided - falling back to local storage")
 
-# Start the scheduler only if not running on Vercel
-is_vercel = os.environ.get('VERCEL') == '1'
-if not is_vercel:
-    # Start the unified scheduler in a separate thread for cron
-    scheduler_thread = threading.Thread(target=run_scheduler, daemon=True)
-    scheduler_thread.start()
+# Background jobs run in their own process: python -m jobs.run_scheduler
 
 app.add_middleware(
     CORSMiddleware,
@@ -75,6 +72,29 @@ app.include_router(user_router, prefix="/users")
 app.include_router(appointment_email_router)
 app.include_router(benchmark_router)
 
+@app.on_event("startup")
+def resume_background_jobs():
+    # Pick up prospect uploads that were interrupted by a restart
+    resume_ingest_jobs()
+
+@app.on_event("startup")
+async def start_webhook_processing():
+    # Webhook events are applied by a worker pool after the response is sent
+    await start_webhook_workers()
+
+@app.on_event("shutdown")
+async def stop_webhook_processing():
+    await stop_webhook_workers()
+
+@app.on_event("startup")
+async def connect_async_database():
+    # Open the Motor connection pool used by the request handlers before the first request
+    await get_async_database().command("ping")
+
+@app.on_event("shutdown")
+def close_async_database():
+    close_async_client()
+
 @app.get("/")
 def read_root():
     return {"message": "Welcome to the Sales Agent Backend"}
@@ -82,11 +102,26 @@ def read_root():
 @app.post("/webhook")
 async def webhook(request: Request):
     data = await request.json()
-    logger.info(f"Webhook received: {data}")
-    if data["event"] == "call_analyzed":
-        result = await update_prospect_call_info(data)
+    call_id = (data.get("call") or {}).get("call_id")
+    if not data.get("event") or not call_id:
+        raise HTTPException(status_code=400, detail="event and call.call_id are required")
+    logger.info(f"Webhook received: {data['event']} for call {call_id}")
+    # Keep the live-call count used for dial pacing up to date
+    await asyncio.to_thread(record_call_event, data)
+    # Database updates happen on the webhook workers
+    await enqueue_webhook_event(data)
     return {"message": "Webhook received"}
 
+@app.get("/webhook/queue")
+def webhook_queue():
+    """Webhook queue depth, inbox backlog and processing counters"""
+    return get_webhook_queue_stats()
+
+@app.get("/webhook/live-calls")
+def live_calls():
+    """Live calls, reserved slots and dialing headroom across every process"""
+    return pacer.stats()
+
 if __name__ == "__main__":
     # Get port from environment variable or use default 8000
     port = int(os.getenv("PORT", 8080))
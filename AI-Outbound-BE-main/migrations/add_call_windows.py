@@ -0,0 +1,60 @@
+"""
+One-time migration: add timezone, callWindowStart and callWindowEnd to prospects.
+
+The timezone comes from the phone number's area code and the call window from
+scheduledAt (run migrations.add_scheduled_at first). A prospect is only updated
+if its phone number and scheduledAt did not change since it was read, so the
+migration can run next to the app and be rerun at any time.
+
+    python -m migrations.add_call_windows [--dry-run] [--batch-size 500]
+"""
+import argparse
+import json
+from pymongo import UpdateOne
+from config.database import get_prospects_collection
+from utils.phone import phone_timezone
+from utils.timezone import call_window_utc
+
+
+def migrate(batch_size: int = 500, dry_run: bool = False):
+    collection = get_prospects_collection()
+    summary = {"prospects": 0, "updated": 0, "skipped": 0}
+    cursor = collection.find(
+        {"callWindowEnd": {"$exists": False}},
+        {"phoneNumber": 1, "scheduledAt": 1}
+    ).batch_size(batch_size)
+
+    updates = []
+
+    def flush():
+        if not dry_run and updates:
+            result = collection.bulk_write(updates, ordered=False)
+            summary["updated"] += result.modified_count
+            summary["skipped"] += len(updates) - result.matched_count
+        updates.clear()
+
+    for prospect in cursor:
+        summary["prospects"] += 1
+        prospect_timezone = phone_timezone(prospect.get("phoneNumber"))
+        call_window_start, call_window_end = call_window_utc(prospect.get("scheduledAt"), prospect_timezone)
+        updates.append(UpdateOne(
+            # Skip the prospect if it was rescheduled in the meantime
+            {"_id": prospect["_id"], "phoneNumber": prospect.get("phoneNumber"), "scheduledAt": prospect.get("scheduledAt")},
+            {"$set": {
+                "timezone": prospect_timezone,
+                "callWindowStart": call_window_start,
+                "callWindowEnd": call_window_end,
+            }}
+        ))
+        if len(updates) >= batch_size:
+            flush()
+    flush()
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Add the phone number timezone and call window to existing prospects")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--dry-run", action="store_true", help="Only count the prospects to update")
+    args = parser.parse_args()
+    print(json.dumps(migrate(args.batch_size, args.dry_run), indent=2))
@@ -0,0 +1,64 @@
+"""
+One-time migration: carry pending callbacks over to nextAttemptAt.
+
+Before the retry policy, the callback job dialed prospects whose callBackDate
+was today. Prospects with a callBackDate from today on, fewer than MAX_CALLBACKS
+callbacks and no nextAttemptAt yet get one at CALLBACK_CALL_TIME on that date.
+Only prospects that were not updated since they were read are changed, so the
+migration can be rerun at any time.
+
+    python -m migrations.add_next_attempt_at [--dry-run] [--batch-size 500]
+"""
+import argparse
+import json
+from pymongo import UpdateOne
+from config.database import get_prospects_collection
+from services.retry_policy import CALLBACK_CALL_TIME, MAX_CALLBACKS
+from utils.timezone import get_brisbane_date, scheduled_at_utc
+
+
+def migrate(batch_size: int = 500, dry_run: bool = False):
+    collection = get_prospects_collection()
+    summary = {"prospects": 0, "invalid": 0, "updated": 0, "skipped": 0}
+    cursor = collection.find(
+        {
+            "nextAttemptAt": {"$exists": False},
+            "status": {"$ne": "new"},
+            "callBackDate": {"$gte": get_brisbane_date()},
+            "callBackCount": {"$not": {"$gte": MAX_CALLBACKS}},
+        },
+        {"callBackDate": 1}
+    ).batch_size(batch_size)
+
+    updates = []
+
+    def flush():
+        if not dry_run and updates:
+            result = collection.bulk_write(updates, ordered=False)
+            summary["updated"] += result.modified_count
+            summary["skipped"] += len(updates) - result.matched_count
+        updates.clear()
+
+    for prospect in cursor:
+        summary["prospects"] += 1
+        next_attempt_at = scheduled_at_utc(prospect.get("callBackDate"), CALLBACK_CALL_TIME)
+        if next_attempt_at is None:
+            summary["invalid"] += 1
+            continue
+        updates.append(UpdateOne(
+            # Skip the prospect if a call result landed in the meantime
+            {"_id": prospect["_id"], "callBackDate": prospect["callBackDate"], "nextAttemptAt": {"$exists": False}},
+            {"$set": {"nextAttemptAt": next_attempt_at}}
+        ))
+        if len(updates) >= batch_size:
+            flush()
+    flush()
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Set nextAttemptAt for callbacks pending before the retry policy")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--dry-run", action="store_true", help="Only count the prospects to update")
+    args = parser.parse_args()
+    print(json.dumps(migrate(args.batch_size, args.dry_run), indent=2))
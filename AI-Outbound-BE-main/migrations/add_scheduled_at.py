@@ -0,0 +1,61 @@
+"""
+One-time migration: add the UTC scheduledAt to prospects written before it existed.
+
+scheduledAt is derived from the Brisbane scheduledCallDate and scheduledCallTime
+strings (midnight when there is no time). A prospect is only updated if neither
+field changed since it was read, so the migration can run next to the app and
+be rerun at any time.
+
+    python -m migrations.add_scheduled_at [--dry-run] [--batch-size 500]
+"""
+import argparse
+import json
+from pymongo import UpdateOne
+from config.database import get_prospects_collection
+from utils.timezone import scheduled_at_utc
+
+
+def migrate(batch_size: int = 500, dry_run: bool = False):
+    collection = get_prospects_collection()
+    summary = {"prospects": 0, "invalid": 0, "updated": 0, "skipped": 0}
+    cursor = collection.find(
+        {"scheduledAt": {"$exists": False}, "scheduledCallDate": {"$exists": True}},
+        {"scheduledCallDate": 1, "scheduledCallTime": 1}
+    ).batch_size(batch_size)
+
+    updates = []
+
+    def flush():
+        if not dry_run and updates:
+            result = collection.bulk_write(updates, ordered=False)
+            summary["updated"] += result.modified_count
+            summary["skipped"] += len(updates) - result.matched_count
+        updates.clear()
+
+    for prospect in cursor:
+        summary["prospects"] += 1
+        scheduled_at = scheduled_at_utc(prospect.get("scheduledCallDate"), prospect.get("scheduledCallTime"))
+        if scheduled_at is None:
+            # Stored as null so the prospect is not read again on a rerun
+            summary["invalid"] += 1
+        updates.append(UpdateOne(
+            # Skip the prospect if it was rescheduled in the meantime
+            {
+                "_id": prospect["_id"],
+                "scheduledCallDate": prospect.get("scheduledCallDate"),
+                "scheduledCallTime": prospect.get("scheduledCallTime"),
+            },
+            {"$set": {"scheduledAt": scheduled_at}}
+        ))
+        if len(updates) >= batch_size:
+            flush()
+    flush()
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Add the UTC scheduledAt to existing prospects")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--dry-run", action="store_true", help="Only count the prospects to update")
+    args = parser.parse_args()
+    print(json.dumps(migrate(args.batch_size, args.dry_run), indent=2))
@@ -0,0 +1,72 @@
+"""
+One-time migration: move embedded prospect auditLogs arrays into audit_logs.
+
+Each entry is copied with the id "<prospect _id>:<array index>", so a rerun
+after an interruption does not duplicate entries. The array is only removed
+from a prospect if it did not change since it was read; rerun the migration
+until it reports nothing left to move.
+
+    python -m migrations.move_audit_logs_out [--dry-run] [--batch-size 500]
+"""
+import argparse
+import json
+from pymongo import UpdateOne
+from config.database import get_prospects_collection
+from services.audit_log_service import audit_log_entry, record_audit_logs
+
+
+def migrate(batch_size: int = 500, dry_run: bool = False):
+    collection = get_prospects_collection()
+    summary = {"prospects": 0, "entries": 0, "inserted": 0, "updated": 0, "skipped": 0}
+    cursor = collection.find(
+        {"auditLogs": {"$exists": True}},
+        {"auditLogs": 1, "phoneNumber": 1, "campaignId": 1}
+    ).batch_size(batch_size)
+
+    entries = []
+    updates = []
+
+    def flush():
+        if not dry_run:
+            # Entries are stored before the prospects drop them
+            summary["inserted"] += record_audit_logs(entries)
+            if updates:
+                result = collection.bulk_write(updates, ordered=False)
+                summary["updated"] += result.modified_count
+                summary["skipped"] += len(updates) - result.matched_count
+        entries.clear()
+        updates.clear()
+
+    for prospect in cursor:
+        summary["prospects"] += 1
+        audit_logs = prospect.get("auditLogs") or []
+        for index, log in enumerate(audit_logs):
+            if not isinstance(log, dict):
+                continue
+            entries.append(audit_log_entry(
+                log.get("actionType"),
+                log.get("performedBy"),
+                log.get("details") or {},
+                prospect.get("phoneNumber"),
+                prospect.get("campaignId"),
+                log.get("timestamp"),
+                entry_id=f"{prospect['_id']}:{index}"
+            ))
+        summary["entries"] += len(audit_logs)
+        updates.append(UpdateOne(
+            # Skip the prospect if something appended to its array in the meantime
+            {"_id": prospect["_id"], "auditLogs": prospect.get("auditLogs")},
+            {"$unset": {"auditLogs": ""}}
+        ))
+        if len(updates) >= batch_size:
+            flush()
+    flush()
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move embedded prospect auditLogs into audit_logs")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--dry-run", action="store_true", help="Only count the prospects and entries to move")
+    args = parser.parse_args()
+    print(json.dumps(migrate(args.batch_size, args.dry_run), indent=2))
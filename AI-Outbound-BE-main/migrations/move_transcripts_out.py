@@ -0,0 +1,70 @@
+"""
+One-time migration: move inline call transcripts into call_transcripts.
+
+For every prospect whose calls entries still carry a transcript, the text is
+stored compressed in call_transcripts (keyed by callId) and removed from the
+entry, which gets hasTranscript instead. Entries without a callId keep their
+transcript since there is no key to store it under.
+
+A prospect is only rewritten if its calls array did not change since it was
+read, so the migration can run while webhooks are being processed; rerun it
+until it reports nothing left to move.
+
+    python -m migrations.move_transcripts_out [--dry-run] [--batch-size 500]
+"""
+import argparse
+import json
+from pymongo import UpdateOne
+from config.database import get_prospects_collection
+from services.transcript_service import transcript_operation, save_transcripts
+
+
+def migrate(batch_size: int = 500, dry_run: bool = False):
+    collection = get_prospects_collection()
+    summary = {"prospects": 0, "transcripts": 0, "updated": 0, "skipped": 0}
+    query = {"calls": {"$elemMatch": {"callId": {"$nin": [None, ""]}, "transcript": {"$exists": True}}}}
+    cursor = collection.find(query, {"calls": 1, "phoneNumber": 1, "campaignId": 1}).batch_size(batch_size)
+
+    transcripts = []
+    updates = []
+
+    def flush():
+        if dry_run:
+            transcripts.clear()
+            updates.clear()
+            return
+        # Transcripts are stored before the prospects drop them
+        summary["transcripts"] += save_transcripts(transcripts)
+        if updates:
+            result = collection.bulk_write(updates, ordered=False)
+            summary["updated"] += result.modified_count
+            summary["skipped"] += len(updates) - result.matched_count
+        transcripts.clear()
+        updates.clear()
+
+    for prospect in cursor:
+        summary["prospects"] += 1
+        calls = []
+        for call in prospect["calls"]:
+            if isinstance(call, dict) and call.get("callId") and "transcript" in call:
+                transcripts.append(transcript_operation(call["callId"], call["transcript"], prospect.get("phoneNumber"), prospect.get("campaignId")))
+                call = {key: value for key, value in call.items() if key != "transcript"}
+                call["hasTranscript"] = bool(transcripts[-1])
+            calls.append(call)
+        updates.append(UpdateOne(
+            # Skip the prospect if a webhook changed its calls in the meantime
+            {"_id": prospect["_id"], "calls": prospect["calls"]},
+            {"$set": {"calls": calls}}
+        ))
+        if len(updates) >= batch_size:
+            flush()
+    flush()
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move inline call transcripts into call_transcripts")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--dry-run", action="store_true", help="Only count the prospects to migrate")
+    args = parser.parse_args()
+    print(json.dumps(migrate(args.batch_size, args.dry_run), indent=2))
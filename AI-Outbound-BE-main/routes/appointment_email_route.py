@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Body, HTTPException
 from pydantic import BaseModel
 from typing import Optional
+import asyncio
 import logging
 from services.appointment_email_service import send_appointment_confirmation_email, send_appointment_email_by_phone
 
@@ -29,14 +30,16 @@ async def send_appointment_email(request: AppointmentEmailRequest = Body(...)):
         
         # If web_link is provided, use the standalone function
         if request.web_link:
-            result = send_appointment_email_by_phone(
+            result = await asyncio.to_thread(
+                send_appointment_email_by_phone,
                 phone_number=request.phone_number,
                 web_link=request.web_link,
                 campaign_id=request.campaign_id
             )
         else:
             # Otherwise use the standard function that gets the link from the prospect record
-            result = send_appointment_confirmation_email(
+            result = await asyncio.to_thread(
+                send_appointment_confirmation_email,
                 phone_number=request.phone_number,
                 campaign_id=request.campaign_id
             )
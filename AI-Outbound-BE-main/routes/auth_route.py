@@ -74,5 +74,5 @@ async def logout():
     return {"message": "Successfully logged out"}
 
 @router.get("/brokers")
-def get_brokers_route():
-    return get_brokers() 
\ No newline at end of file
+async def get_brokers_route():
+    return await get_brokers() 
\ No newline at end of file
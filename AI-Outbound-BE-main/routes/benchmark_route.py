@@ -44,7 +44,7 @@ async def get_appointments(request: AppointmentListRequest = Body(...)):
         logger.info(f"Received request to get appointments for user_id: {request.user_id}")
         
         # Get user details
-        user = get_user_by_id(request.user_id)
+        user = await get_user_by_id(request.user_id)
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
         
@@ -83,7 +83,7 @@ async def check_availability_endpoint(request: AvailabilityCheckRequest = Body(.
         logger.info(f"Received request to check availability for user_id: {request.user_id}")
         
         # Get user details
-        user = get_user_by_id(request.user_id)
+        user = await get_user_by_id(request.user_id)
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
         
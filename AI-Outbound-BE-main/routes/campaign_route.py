@@ -23,7 +23,7 @@ async def create_campaign(campaign: CampaignCreate):
     Create a new campaign (now 1:1 with user)
     """
     try:
-        result = create_new_campaign(
+        result = await create_new_campaign(
             campaign_name=campaign.campaignName,
             users=campaign.users,
             campaignDate=campaign.campaignDate,
@@ -41,7 +41,7 @@ async def get_campaigns():
     Get all campaigns (each campaign is a user)
     """
     try:
-        result = getCampaigns()
+        result = await getCampaigns()
         return result   
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
@@ -52,7 +52,7 @@ async def get_campaign_users():
     Get all campaign users
     """
     try:
-        result = getCampaignUsers()
+        result = await getCampaignUsers()
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
@@ -64,7 +64,7 @@ async def get_user_campaigns(user_id: str):
     """
     try:
         print(f"Fetching campaigns for user ID: {user_id}")
-        result = get_campaigns_by_user_id(user_id)
+        result = await get_campaigns_by_user_id(user_id)
         print(f"Fetched campaigns: {result}")
         return result
     except Exception as e:
@@ -76,7 +76,7 @@ async def get_campaign_prospects(campaign_id: str):
     Get all prospects for a specific campaign
     """
     try:
-        result = get_prospects_for_campaign(campaign_id)
+        result = await get_prospects_for_campaign(campaign_id)
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
@@ -87,7 +87,7 @@ async def update_campaign(campaign_id: str, campaign_update: CampaignUpdate):
     Update campaign settings
     """
     try:
-        result = update_campaign_settings(campaign_id, campaign_update)
+        result = await update_campaign_settings(campaign_id, campaign_update)
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
@@ -99,7 +99,7 @@ async def get_archived_campaigns():
     Get all archived campaigns
     """
     try:
-        result = get_archived_campaigns_list()
+        result = await get_archived_campaigns_list()
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
@@ -111,7 +111,7 @@ async def get_campaign_analytics(campaign_id: str):
     Get campaign analytics
     """
     try:
-        result = get_campaign_analytics_list(campaign_id)
+        result = await get_campaign_analytics_list(campaign_id)
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
@@ -122,7 +122,7 @@ async def unarchive_campaign(campaign_id: str):
     Unarchive a campaign
     """
     try:
-        result = unarchive_campaign_by_id(campaign_id)
+        result = await unarchive_campaign_by_id(campaign_id)
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
@@ -134,7 +134,7 @@ async def delete_campaign(campaign_id: str):
     Delete a campaign
     """
     try:
-        result = delete_campaign_by_id(campaign_id)
+        result = await delete_campaign_by_id(campaign_id)
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
\ No newline at end of file
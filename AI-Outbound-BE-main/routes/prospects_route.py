@@ -1,94 +1,64 @@
 # API routes
 
 from datetime import datetime
-from bson import ObjectId
-from fastapi import APIRouter, HTTPException, Request
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Request
 from typing import List
 from models.prospect import ProspectIn
-from services.call_initiation_service import create_phone_call
+from services.dial_queue_service import enqueue_prospects
+from jobs.dial_queue_worker import process_dial_queue
 from services.prospect_service import (
     upload_prospects_service,
     get_prospects_by_campaign,
     get_prospect_by_phone_number
 )
-from config.database import get_campaign_users_collection
+from services.prospect_ingest_service import (
+    MultipartFileStream,
+    get_campaign_upload_context,
+    normalize_prospect_row,
+    iter_upload_rows,
+    ingest_prospect_stream,
+    get_upload_progress
+)
+from services.ingest_job_service import create_ingest_job, start_ingest_job, get_ingest_job_status
+from services.transcript_service import get_transcript
+from services.audit_log_service import get_audit_logs
+from utils.phone import format_phone_number
+import asyncio
 import logging
-import re
+import uuid
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
-def format_phone_number(phone_number: str) -> str:
-    """
-    Format phone number by adding '+' prefix if not present.
-    Removes any spaces, dashes, or parentheses before adding '+'.
-    
-    Args:
-        phone_number (str): Raw phone number from CSV
-        
-    Returns:
-        str: Formatted phone number with '+' prefix
-    """
-    if not phone_number:
-        return phone_number
-    
-    # Remove any spaces, dashes, parentheses, and other non-digit characters except +
-    cleaned = re.sub(r'[^\d+]', '', phone_number.strip())
-    
-    # If it doesn't start with +, add it
-    if not cleaned.startswith('+'):
-        cleaned = '+' + cleaned
-    
-    return cleaned
-
 @router.get("/demo")
 async def demo():
     return {"message": "Hello World"}
 
 @router.post("/create-prospects-and-call-initiation")
 async def upload_prospects(request: Request):
+    """
+    Create or reset prospects for a campaign.
+
+    Pass "async": true in the body (or ?async=true) to queue the upload as a
+    background ingest job; the response then only contains the job id, poll
+    /api/ingest-jobs/{jobId} for progress.
+    """
     try:
         data = await request.json()
-        print("Received data:", data)
+        print(f"Received upload with {len(data.get('users', []) or [])} rows")
         
-        # Get the scheduled call date from the request
-        scheduled_call_date = data.get('scheduledCallDate', '')  # Use get with default value
-        campaign_name = data.get('campaignName', '')  # Use get with default value
-        campaign_id = data.get('campaignId', '')  # Get campaign ID from request
-        owner_name = data.get('ownerName', 'Unknown User')  # Get owner name from request
-
-        print("campaign_id:", campaign_id)
-
-        # Fetch campaign details from campaigns collection if campaign_id is provided
-        if campaign_id:
-            try:
-                campaign_users_collection = get_campaign_users_collection()
-                # Find the campaign by ID
-                campaign = campaign_users_collection.find_one({"_id": ObjectId(campaign_id)})
-                print("campaign:", campaign)
-                # Find campaign by ID
-                if campaign:
-                    # Use campaign name from database if available
-                    campaign_name = campaign.get('name', campaign_name)
-                    print("campaign_name:", campaign_name)
-                    
-                    # If scheduled_call_date is not provided in the request, use campaign date
-                    # if not scheduled_call_date:
-                    scheduled_call_date = campaign.get('campaignDate', '')
-                    scheduled_call_time = campaign.get('campaignTime', '')
-                    
-                    print(f"Retrieved campaign details - Name: {campaign_name}, Date: {scheduled_call_date}")
-            except Exception as ce:
-                print(f"Error fetching campaign details: {str(ce)}")
-                # Continue with request data if campaign fetch fails
-        
-        print("scheduled_call_date:", scheduled_call_date)
-        print("scheduled_call_time:", scheduled_call_time)
-        print("campaign_name:", campaign_name)
-        print("campaign_id:", campaign_id)
-        print("owner_name:", owner_name)
+        # Resolve campaign name and schedule (campaign values take precedence)
+        context = await asyncio.to_thread(
+            get_campaign_upload_context,
+            campaign_id=data.get('campaignId', ''),
+            campaign_name=data.get('campaignName', ''),
+            scheduled_call_date=data.get('scheduledCallDate', ''),
+            scheduled_call_time=data.get('scheduledCallTime', ''),
+            owner_name=data.get('ownerName', 'Unknown User')
+        )
+        print("upload context:", context)
         
         # Ensure users is a list
         users = data.get('users', [])
@@ -100,53 +70,36 @@ async def upload_prospects(request: Request):
         skipped_prospects = []
         
         for user in users:
-            try:
-                # Check if phone number exists and is not empty
-                raw_phone = user.get('phoneNumber', '').strip()
-                if not raw_phone:
-                    skipped_prospects.append({
-                        'name': user.get('name', 'Unknown'),
-                        'reason': 'No phone number provided'
-                    })
-                    continue
-                
-                # Format phone number to ensure it has + prefix
-                formatted_phone = format_phone_number(raw_phone)
-                
-                # Validate formatted phone number
-                if not formatted_phone or formatted_phone == '+':
-                    skipped_prospects.append({
-                        'name': user.get('name', 'Unknown'),
-                        'reason': 'Invalid phone number format'
-                    })
-                    continue
-                
-                prospect = ProspectIn(
-                    name=user.get('name', '').strip() if user.get('name') else None,
-                    phoneNumber=formatted_phone,
-                    businessName=user.get('businessName', '').strip(),
-                    email=user.get('email', '').strip(),
-                    ownerName=owner_name,  # Add owner name to each prospect
-                    campaignName=campaign_name,  # Add campaign name to each prospect
-                    campaignId=campaign_id, # Add campaign ID (from user or request)
-                    scheduledCallDate=scheduled_call_date,
-                    scheduledCallTime=scheduled_call_time
-                )
+            prospect, skipped = normalize_prospect_row(user, context)
+            if skipped:
+                skipped_prospects.append(skipped)
+            else:
                 prospects_list.append(prospect)
-            except Exception as e:
-                print(f"Error creating prospect: {str(e)}")
-                skipped_prospects.append({
-                    'name': user.get('name', 'Unknown'),
-                    'reason': f'Error: {str(e)}'
-                })
         
-        print('prospects_list:', prospects_list)
+        print(f"prospects_list: {len(prospects_list)} valid prospects")
         
         if not prospects_list:
             raise HTTPException(status_code=400, detail="No valid prospects provided")
+
+        run_async = data.get('async') is True or request.query_params.get('async', '').lower() == 'true'
+        if run_async:
+            job_id = await asyncio.to_thread(create_ingest_job, prospects_list, context, skipped_prospects)
+            start_ingest_job(job_id)
+            return {
+                "message": "Prospect upload queued",
+                "jobId": job_id,
+                "status": "queued"
+            }
             
-        # Upload prospects to database
-        result = upload_prospects_service(prospects_list, scheduled_call_date, campaign_name, campaign_id, scheduled_call_time)
+        # Upload prospects to database, off the event loop
+        result = await asyncio.to_thread(
+            upload_prospects_service,
+            prospects_list,
+            context["scheduled_call_date"],
+            context["campaign_name"],
+            context["campaign_id"],
+            context["scheduled_call_time"]
+        )
 
         # Only initiate calls immediately if no scheduled date is provided
         # if result and not scheduled_call_date:
@@ -154,10 +107,12 @@ async def upload_prospects(request: Request):
         
         # Add information about skipped prospects to the response
         if skipped_prospects:
+            ingest_skipped = result.get('skipped_prospects', {}).get('details', [])
             result['skipped_prospects'] = {
-                'count': len(skipped_prospects),
-                'details': skipped_prospects
+                'count': len(skipped_prospects) + len(ingest_skipped),
+                'details': skipped_prospects + ingest_skipped
             }
+            result['skipped'] = result['skipped_prospects']['count']
         
         return result
     except HTTPException:
@@ -168,6 +123,114 @@ async def upload_prospects(request: Request):
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
 
+@router.get("/ingest-jobs/{job_id}")
+async def ingest_job_status(job_id: str):
+    """Progress of a background prospect upload: rows processed, skipped rows, throughput and ETA"""
+    try:
+        status = await asyncio.to_thread(get_ingest_job_status, job_id)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid job id: {str(e)}")
+    if not status:
+        raise HTTPException(status_code=404, detail=f"Ingest job {job_id} not found")
+    return status
+
+
+@router.get("/transcripts/{call_id}")
+async def call_transcript(call_id: str):
+    """Transcript of a single call, loaded on demand by the call history views"""
+    transcript = await asyncio.to_thread(get_transcript, call_id)
+    if not transcript:
+        raise HTTPException(status_code=404, detail=f"No transcript found for call {call_id}")
+    return transcript
+
+
+@router.get("/audit-logs")
+async def audit_logs(
+    phoneNumber: str = None,
+    campaignId: str = None,
+    callId: str = None,
+    page: int = 1,
+    limit: int = 50,
+):
+    """
+    Audit history of a prospect (phoneNumber and campaignId) or of a call (callId), newest first
+
+    Query parameters:
+        page: int - 1-based page number
+        limit: int - Entries per page
+    """
+    if not callId and not (phoneNumber and campaignId):
+        raise HTTPException(status_code=400, detail="phoneNumber and campaignId, or callId, are required")
+    # A "+" in the query string arrives as a space
+    phone_number = format_phone_number(phoneNumber) if phoneNumber else None
+    return await get_audit_logs(phone_number, campaignId, callId, page, limit)
+
+
+@router.post("/upload-prospects-stream")
+async def upload_prospects_stream(request: Request):
+    """
+    Upload prospects without buffering the whole file in memory.
+
+    Accepts a multipart/form-data file field named "file" (CSV or .ndjson/.jsonl),
+    a raw text/csv body, or a raw application/x-ndjson body. Rows are validated and
+    written in fixed-size chunks while the body is being read.
+
+    Query parameters:
+        campaignId, campaignName, ownerName, scheduledCallDate, scheduledCallTime
+        uploadId: optional id used to poll /upload-prospects-stream/{uploadId}/progress
+    """
+    try:
+        params = request.query_params
+        upload_id = params.get('uploadId') or uuid.uuid4().hex
+        context = await asyncio.to_thread(
+            get_campaign_upload_context,
+            campaign_id=params.get('campaignId', ''),
+            campaign_name=params.get('campaignName', ''),
+            scheduled_call_date=params.get('scheduledCallDate', ''),
+            scheduled_call_time=params.get('scheduledCallTime', ''),
+            owner_name=params.get('ownerName', 'Unknown User')
+        )
+
+        content_type = request.headers.get('content-type', '')
+        if content_type.startswith('multipart/form-data'):
+            # Parse the body as it arrives instead of letting request.form() spool it first
+            try:
+                upload = MultipartFileStream(request.stream(), content_type)
+                has_file = await upload.open()
+            except ValueError as e:
+                # Missing boundary or a malformed body (python-multipart parse errors are ValueErrors)
+                raise HTTPException(status_code=400, detail=f"Invalid multipart body: {str(e)}")
+            if not has_file:
+                raise HTTPException(status_code=400, detail="A file field named 'file' is required")
+            filename = upload.filename.lower()
+            upload_format = "ndjson" if filename.endswith(('.ndjson', '.jsonl')) or 'ndjson' in upload.content_type else "csv"
+            byte_chunks = upload.chunks()
+        elif 'ndjson' in content_type or 'jsonl' in content_type:
+            upload_format = "ndjson"
+            byte_chunks = request.stream()
+        elif content_type.startswith('text/csv') or content_type.startswith('text/plain'):
+            upload_format = "csv"
+            byte_chunks = request.stream()
+        else:
+            raise HTTPException(status_code=415, detail="Send multipart/form-data, text/csv or application/x-ndjson")
+
+        return await ingest_prospect_stream(iter_upload_rows(byte_chunks, upload_format), context, upload_id)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in streaming prospect upload: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
+
+
+@router.get("/upload-prospects-stream/{upload_id}/progress")
+async def upload_prospects_stream_progress(upload_id: str):
+    """Per-chunk progress of a streaming upload"""
+    progress = await asyncio.to_thread(get_upload_progress, upload_id)
+    if not progress:
+        raise HTTPException(status_code=404, detail=f"Upload {upload_id} not found")
+    return progress
+
+
 @router.post("/get_prospects_by_campaign")
 async def get_prospects_by_campaign_route(request: Request):
     """
@@ -192,7 +255,7 @@ async def get_prospects_by_campaign_route(request: Request):
                 detail="Either campaign name or campaign ID is required"
             )
             
-        result = get_prospects_by_campaign(campaign_name=campaign_name, campaign_id=campaign_id)
+        result = await get_prospects_by_campaign(campaign_name=campaign_name, campaign_id=campaign_id)
         return result
         
     except HTTPException as e:
@@ -204,7 +267,7 @@ async def get_prospects_by_campaign_route(request: Request):
         )
 
 @router.get("/initiate_call")
-async def initiate_call(request: Request):
+async def initiate_call(request: Request, background_tasks: BackgroundTasks):
     """
     Initiate a phone call to a specific prospect
     
@@ -233,10 +296,10 @@ async def initiate_call(request: Request):
             formatted_phone = "+" + formatted_phone
         
         # Get the prospect details
-        prospect = get_prospect_by_phone_number(formatted_phone, campaign_id)
+        prospect = await get_prospect_by_phone_number(formatted_phone, campaign_id)
         if not prospect:
             # Try with the original phone number format if the formatted one doesn't match
-            prospect = get_prospect_by_phone_number(phone_number, campaign_id)
+            prospect = await get_prospect_by_phone_number(phone_number, campaign_id)
             if not prospect:
                 raise HTTPException(
                     status_code=404,
@@ -254,18 +317,11 @@ async def initiate_call(request: Request):
             campaignId=prospect.get('campaignId', ''),  # Include the campaign ID
         )
         print(f"prospect_obj: {prospect_obj}")
-        # Initiate the call
+        # Queue the call; the dial queue worker places it after the response is sent
         try:
-            result = create_phone_call([prospect_obj])
-            
-            # return {
-            #     "status": "success",
-            #     "message": f"Call initiated to {formatted_phone}",
-            #     "data": {
-            #         "callId": result.call_id if hasattr(result, 'call_id') else None
-            #     }
-            # }
-            logger.info(f"Total Prospects: {result['total_prospects']}, Total Batches: {result['total_batches']}, Batch Responses: {result['batch_responses']}")
+            result = await asyncio.to_thread(enqueue_prospects, [prospect_obj], "initiate_call")
+            background_tasks.add_task(process_dial_queue)
+            logger.info(f"Queued call to {formatted_phone}: {result}")
         except Exception as call_error:
             raise HTTPException(
                 status_code=500,
@@ -281,7 +337,7 @@ async def initiate_call(request: Request):
         )
 
 @router.post("/campaign_call")
-async def initiate_campaign_calls(request: Request):
+async def initiate_campaign_calls(request: Request, background_tasks: BackgroundTasks):
     try:
         data = await request.json()
         campaign_name = data.get("campaign_name")
@@ -300,10 +356,10 @@ async def initiate_campaign_calls(request: Request):
             formatted_phone = format_phone_number(phone_number)
             
             # Get the prospect details from database
-            prospect = get_prospect_by_phone_number(formatted_phone,campaign_id)
+            prospect = await get_prospect_by_phone_number(formatted_phone,campaign_id)
             if not prospect:
                 # Try with the original format if formatted doesn't match
-                prospect = get_prospect_by_phone_number(phone_number,campaign_id)
+                prospect = await get_prospect_by_phone_number(phone_number,campaign_id)
                 if not prospect:
                     continue  # Skip this number if prospect not found
                 formatted_phone = phone_number
@@ -322,8 +378,9 @@ async def initiate_campaign_calls(request: Request):
         if not prospects_to_call:
             return {"error": "No valid prospects found for the provided phone numbers"}
         
-        # Initiate calls for all valid prospects
-        result = create_phone_call(prospects_to_call)
+        # Queue calls for all valid prospects; the dial queue worker places them in the background
+        await asyncio.to_thread(enqueue_prospects, prospects_to_call, "campaign_call")
+        background_tasks.add_task(process_dial_queue)
         
         return {
             "success": True, 
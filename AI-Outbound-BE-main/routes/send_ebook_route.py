@@ -1,6 +1,7 @@
 import os
 from fastapi import APIRouter, HTTPException, Request
 from services.send_ebook_service import send_ebook_email
+import asyncio
 import logging
 from bson import ObjectId
 from pymongo.errors import PyMongoError
@@ -26,10 +27,8 @@ async def send_ebook(request: Request):
         logger.info(f"Campaign ID: {campaign_id}")
         
         # Retrieve ebook path from database
-        from config.database import get_users_collection, get_campaign_users_collection
-        users = get_users_collection()
-        
-        campaign_users = get_campaign_users_collection()
+        from config.async_database import get_async_campaign_users_collection
+        campaign_users = get_async_campaign_users_collection()
         
         #if owner_name:
         #    user = users.find_one({"name": owner_name})
@@ -37,7 +36,7 @@ async def send_ebook(request: Request):
         #    logger.info(f"User found: {user}")
         
         if campaign_id:
-            campaign_user = campaign_users.find_one({"_id": ObjectId(campaign_id)})
+            campaign_user = await campaign_users.find_one({"_id": ObjectId(campaign_id)})
             logger.info(f"Looked up campaign by ID: {campaign_id}")
             logger.info(f"Campaign found: {campaign_user}")
         
@@ -63,14 +62,14 @@ async def send_ebook(request: Request):
                     
                 logger.info(f"Using converted URL: {ebook_url}")
             
-            # Send the email with the ebook
-            send_ebook_email(email, ebook_url)
+            # Send the email with the ebook (blocking SMTP, off the event loop)
+            await asyncio.to_thread(send_ebook_email, email, ebook_url)
             return {"message": "Email sent successfully", "ebook_path": ebook_path}
         else:
             # Fallback to default PDF if user or ebook path not found
             logger.warning(f"Ebook path not found for user. Using default PDF.")
             default_pdf = os.getenv("DEFAULT_PDF_URL")
-            send_ebook_email(email, default_pdf)
+            await asyncio.to_thread(send_ebook_email, email, default_pdf)
             return {"message": "Email sent with default PDF", "ebook_path": default_pdf}
             
     except PyMongoError as e:
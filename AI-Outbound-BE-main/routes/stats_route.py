@@ -2,6 +2,7 @@
 
 from fastapi import APIRouter, HTTPException, Request
 from services.stats_service import (
+    get_dashboard_stats,
     get_prospects_summary,
     get_total_calls_made,
     get_connected_calls,
@@ -23,11 +24,20 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+@router.get("/dashboard")
+async def dashboard(userId: str):
+    """Endpoint to get every dashboard metric in one request."""
+    try:
+        return await get_dashboard_stats(userId)
+    except Exception as e:
+        logger.error(f"Error getting dashboard stats: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error getting dashboard stats: {str(e)}")
+
 @router.get("/total_calls")
-def total_calls(userId: str):
+async def total_calls(userId: str):
     """Endpoint to get the total number of calls made."""
     try:
-        total = get_total_calls_made(userId)
+        total = await get_total_calls_made(userId)
         logger.info(f"Successfully retrieved total calls: {total}")
         return {"total_calls": total}
     except Exception as e:
@@ -35,10 +45,10 @@ def total_calls(userId: str):
         raise HTTPException(status_code=500, detail=f"Error getting total calls: {str(e)}")
 
 @router.get("/total_connected_calls")
-def connected_calls(userId: str):
+async def connected_calls(userId: str):
     """Endpoint to get the total number of connected calls."""
     try:
-        total_connected_calls = get_connected_calls(userId)
+        total_connected_calls = await get_connected_calls(userId)
 
         logger.info(f"Successfully retrieved total connected calls: {total_connected_calls}")
         return {"total_connected_calls": total_connected_calls}
@@ -47,10 +57,10 @@ def connected_calls(userId: str):
         raise HTTPException(status_code=500, detail=f"Error getting total connected calls: {str(e)}")
 
 @router.get("/appointments_booked")
-def appointments_booked(userId: str):
+async def appointments_booked(userId: str):
     """Endpoint to get the total number of appointments booked."""
     try:
-        total_appointments = get_appointments_booked(userId)
+        total_appointments = await get_appointments_booked(userId)
         logger.info(f"Successfully retrieved total appointments booked: {total_appointments}")
         return {"total_appointments_booked": total_appointments}
     except Exception as e:
@@ -58,10 +68,10 @@ def appointments_booked(userId: str):
         raise HTTPException(status_code=500, detail=f"Error getting total appointments booked: {str(e)}")
 
 @router.get("/total_ebook_sent")
-def ebook_sent(userId: str):
+async def ebook_sent(userId: str):
     """Endpoint to get the total number of ebook sent."""
     try:
-        total_ebook_sent = get_number_of_ebooks_sent(userId)
+        total_ebook_sent = await get_number_of_ebooks_sent(userId)
         logger.info(f"Successfully retrieved total ebooks sent: {total_ebook_sent}")
         return {"total_ebook_sent": total_ebook_sent}
     except Exception as e:
@@ -69,10 +79,10 @@ def ebook_sent(userId: str):
         raise HTTPException(status_code=500, detail=f"Error getting total ebooks sent: {str(e)}")
 
 @router.get("/total_call_backs")
-def call_backs(userId: str):
+async def call_backs(userId: str):
     """Endpoint to get the total number of call backs."""
     try:
-        total_call_backs = get_call_back_schedule(userId)
+        total_call_backs = await get_call_back_schedule(userId)
         logger.info(f"Successfully retrieved total call backs: {total_call_backs}")
         return {"total_call_backs": total_call_backs}
     except Exception as e:
@@ -80,37 +90,37 @@ def call_backs(userId: str):
         raise HTTPException(status_code=500, detail=f"Error getting total call backs: {str(e)}")
     
 @router.get("/average_call_duration")
-def average_call_duration(userId: str):
+async def average_call_duration(userId: str):
     """Endpoint to get the average call duration."""
     try:
-        average_call_duration = get_average_call_duration(userId)
+        average_call_duration = await get_average_call_duration(userId)
         return {"average_call_duration": average_call_duration}
     except Exception as e:
         logger.error(f"Error getting average call duration: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error getting average call duration: {str(e)}")
     
 @router.get("/matrix_details")
-def matrix_details(id: str, userName: str):
+async def matrix_details(id: str, userName: str):
     """Endpoint to get the matrix details."""
     try:
-        matrix_details = get_matrix_details(id, userName)
+        matrix_details = await get_matrix_details(id, userName)
         return {"matrix_details": matrix_details}
     except Exception as e:
         logger.error(f"Error getting matrix details: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error getting matrix details: {str(e)}")
 
 @router.get("/prospects_summary")
-def prospects_summary(userId: str):
+async def prospects_summary(userId: str):
     """Endpoint to get a summary of prospects with phone number, name, and status."""
     try:
-        summary = get_prospects_summary(userId)
+        summary = await get_prospects_summary(userId)
         return {"prospects_summary": summary}
     except Exception as e:
         logger.error(f"Error getting prospects summary: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error getting prospects summary: {str(e)}")
 
 @router.get("/calendar_events")
-def calendar_events(month: int = None, year: int = None, owner_name: str = None, user_role: str = None):
+async def calendar_events(month: int = None, year: int = None, owner_name: str = None, user_role: str = None):
     """Endpoint to get calendar events for all prospects with appointments in a single query.
     
     Query parameters:
@@ -130,7 +140,7 @@ def calendar_events(month: int = None, year: int = None, owner_name: str = None,
         if month is not None and (month < 1 or month > 12):
             raise HTTPException(status_code=400, detail="Month must be between 1 and 12")
         
-        events = get_calendar_events(month, year, owner_name, user_role)
+        events = await get_calendar_events(month, year, owner_name, user_role)
         logger.info(f"Successfully retrieved calendar events: {len(events)} events found")
         logger.info(f"Calendar events: {events}")
         return {"calendar_events": events}
@@ -180,7 +190,7 @@ async def get_stats_by_month(request: Request):
                 detail=f"Year must be between 2020 and {current_year + 5}"
             )
             
-        result = get_monthly_stats(month, year)
+        result = await get_monthly_stats(month, year)
         return result
         
     except ValueError as e:
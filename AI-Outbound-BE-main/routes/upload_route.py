@@ -7,7 +7,7 @@ import shutil
 from pathlib import Path
 from typing import Optional
 from config.cloudinary_config import upload_file_to_cloudinary, configure_cloudinary
-from config.database import get_campaign_users_collection
+from config.async_database import get_async_campaign_users_collection
 import tempfile
 import logging
 import time
@@ -38,8 +38,8 @@ async def upload_ebook(
 
         # Check if campaign exists in campaign_users collection first
         if campaign_id:
-            campaign_users_collection = get_campaign_users_collection()
-            campaign = campaign_users_collection.find_one({"_id": ObjectId(campaign_id)})
+            campaign_users_collection = get_async_campaign_users_collection()
+            campaign = await campaign_users_collection.find_one({"_id": ObjectId(campaign_id)})
             if not campaign:
                 raise HTTPException(
                     status_code=404,
@@ -85,8 +85,8 @@ async def upload_ebook(
                 # Update campaign with ebook information if campaign_id is provided
                 if campaign_id:
                     # Update in campaign_users collection directly
-                    campaign_users_collection = get_campaign_users_collection()
-                    result = campaign_users_collection.update_one(
+                    campaign_users_collection = get_async_campaign_users_collection()
+                    result = await campaign_users_collection.update_one(
                         {"_id": ObjectId(campaign_id)},
                         {
                             "$set": {
@@ -130,8 +130,8 @@ async def upload_ebook(
             # Update campaign with ebook information if campaign_id is provided
             if campaign_id:
                 # Update in campaign_users collection directly
-                campaign_users_collection = get_campaign_users_collection()
-                result = campaign_users_collection.update_one(
+                campaign_users_collection = get_async_campaign_users_collection()
+                result = await campaign_users_collection.update_one(
                     {"_id": ObjectId(campaign_id)},
                     {
                         "$set": {
@@ -17,7 +17,7 @@ router = APIRouter()
 @router.get("/get_users")
 async def get_users_route():
     try:
-        users =get_users()
+        users = await get_users()
         print(users)
         return users
     except Exception as e:
@@ -26,7 +26,7 @@ async def get_users_route():
 @router.put("/update_user/{user_id}")
 async def update_user_route(user_id: str, user_data: UserUpdate):
     try:
-        result = update_user(user_id, user_data.dict(exclude_unset=True))
+        result = await update_user(user_id, user_data.dict(exclude_unset=True))
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,165 @@
+"""
+Prospect audit log, stored as an append-only collection.
+
+Every entry is its own audit_logs document addressed by the prospect's
+phoneNumber and campaignId (the key every prospect API already uses), so
+writing one is a single insert and reading a prospect no longer loads its
+whole history. Entries written by retried jobs and webhooks carry a
+deterministic _id and are only stored once.
+"""
+from config.database import get_audit_logs_collection
+from config.async_database import get_async_audit_logs_collection
+from bson import ObjectId
+from datetime import datetime
+from pymongo.errors import BulkWriteError
+from typing import Any, Dict, List, Optional, Union
+import asyncio
+import logging
+import os
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Largest page get_audit_logs returns
+AUDIT_LOG_MAX_PAGE_SIZE = int(os.getenv("AUDIT_LOG_MAX_PAGE_SIZE", "200"))
+
+
+def _as_datetime(timestamp: Union[datetime, str, Dict[str, str], None]) -> datetime:
+    """Accept a datetime, an ISO string or the legacy {"$date": iso} value"""
+    if isinstance(timestamp, dict):
+        timestamp = timestamp.get("$date")
+    if isinstance(timestamp, str):
+        try:
+            return datetime.fromisoformat(timestamp.rstrip("Z"))
+        except ValueError:
+            return datetime.utcnow()
+    return timestamp or datetime.utcnow()
+
+
+def audit_log_entry(
+    action_type: str,
+    performed_by: str,
+    details: Dict[str, Any],
+    phone_number: str,
+    campaign_id: Optional[str],
+    timestamp: Union[datetime, str, None] = None,
+    entry_id: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Build an audit_logs document
+
+    Args:
+        action_type (str): e.g. "Call Completed"
+        performed_by (str): "AI Agent" or "User"
+        details (dict): Action specific fields (callId, batchId, status, ...)
+        phone_number (str): Phone number of the prospect
+        campaign_id (str): Campaign of the prospect
+        timestamp (datetime | str, optional): When it happened, defaults to now (UTC)
+        entry_id (str, optional): Deterministic id for entries that may be written twice
+
+    Returns:
+        dict: The document to pass to record_audit_logs
+    """
+    return {
+        "_id": entry_id or ObjectId(),
+        "phoneNumber": phone_number,
+        "campaignId": campaign_id,
+        "actionType": action_type,
+        "performedBy": performed_by,
+        "timestamp": _as_datetime(timestamp),
+        "details": details,
+    }
+
+
+def record_audit_logs(entries: List[Optional[Dict[str, Any]]]) -> int:
+    """
+    Append audit entries with one unordered insert_many
+
+    Entries already stored (same _id) are skipped. Audit failures are logged and never
+    raised, the action they describe has already happened.
+
+    Returns:
+        int: Number of entries inserted
+    """
+    entries = [entry for entry in entries if entry]
+    if not entries:
+        return 0
+    try:
+        return len(get_audit_logs_collection().insert_many(entries, ordered=False).inserted_ids)
+    except BulkWriteError as bwe:
+        return _inserted_despite(bwe)
+    except Exception as e:
+        logger.error(f"Error writing {len(entries)} audit logs: {str(e)}")
+        return 0
+
+
+async def record_audit_logs_async(entries: List[Optional[Dict[str, Any]]]) -> int:
+    """record_audit_logs for the async request paths"""
+    entries = [entry for entry in entries if entry]
+    if not entries:
+        return 0
+    try:
+        result = await get_async_audit_logs_collection().insert_many(entries, ordered=False)
+        return len(result.inserted_ids)
+    except BulkWriteError as bwe:
+        return _inserted_despite(bwe)
+    except Exception as e:
+        logger.error(f"Error writing {len(entries)} audit logs: {str(e)}")
+        return 0
+
+
+def _inserted_despite(bwe: BulkWriteError) -> int:
+    """Log the write errors that are not duplicates and return the number inserted"""
+    unexpected = [error for error in bwe.details.get("writeErrors", []) if error.get("code") != 11000]
+    if unexpected:
+        logger.error(f"Error writing audit logs: {unexpected}")
+    return bwe.details.get("nInserted", 0)
+
+
+async def get_audit_logs(
+    phone_number: str = None,
+    campaign_id: str = None,
+    call_id: str = None,
+    page: int = 1,
+    limit: int = 50,
+) -> Dict[str, Any]:
+    """
+    Audit entries of a prospect or a call, newest first
+
+    Args:
+        phone_number (str, optional): Prospect phone number
+        campaign_id (str, optional): Prospect campaign, required with phone_number
+        call_id (str, optional): Only entries about this call
+        page (int): 1-based page number
+        limit (int): Entries per page, capped at AUDIT_LOG_MAX_PAGE_SIZE
+
+    Returns:
+        dict: auditLogs, page, limit, total and hasMore
+    """
+    query = {}
+    if phone_number:
+        query["phoneNumber"] = phone_number
+        query["campaignId"] = campaign_id
+    if call_id:
+        query["details.callId"] = call_id
+    if not query:
+        raise ValueError("Either phone_number and campaign_id or call_id must be provided")
+
+    page = max(page, 1)
+    limit = min(max(limit, 1), AUDIT_LOG_MAX_PAGE_SIZE)
+    collection = get_async_audit_logs_collection()
+    entries, total = await asyncio.gather(
+        collection.find(query).sort([("timestamp", -1), ("_id", -1)]).skip((page - 1) * limit).to_list(limit),
+        collection.count_documents(query),
+    )
+    for entry in entries:
+        entry["_id"] = str(entry["_id"])
+        entry["timestamp"] = entry["timestamp"].isoformat() + "Z"
+    return {
+        "auditLogs": entries,
+        "page": page,
+        "limit": limit,
+        "total": total,
+        "hasMore": page * limit < total,
+    }
@@ -5,10 +5,11 @@ import logging
 from datetime import datetime, timedelta
 from services.user_service import get_user_by_id
 import re
-from config.database import get_users_collection as db_get_users_collection
+from config.async_database import get_async_users_collection
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 import smtplib
+import asyncio
 
 BENCHMARK_API_PATH = os.getenv("BENCHMARK_API_PATH")
 
@@ -177,14 +178,14 @@ async def check_availability_by_campaign(date: str, time: str, campaign_id: str)
 
     # Get campaign and user
     try:
-        campaign = get_campaign_by_id(ObjectId(campaign_id))
+        campaign = await get_campaign_by_id(ObjectId(campaign_id))
         if not campaign or not campaign.get("users"):
             return {"success": False, "error": "No users found in campaign."}
         user_id = campaign.get("users")
     except Exception as e:
         return {"success": False, "error": f"Error retrieving campaign: {str(e)}"}
 
-    user = get_user_by_id(user_id)
+    user = await get_user_by_id(user_id)
     if not user or "email" not in user:
         return {"success": False, "error": "User email not found for campaign."}
     user_email = user["email"]
@@ -212,6 +213,15 @@ async def check_availability_by_campaign(date: str, time: str, campaign_id: str)
     )
 
 
+def _send_email(smtp_user: str, smtp_password: str, to_email: str, msg: MIMEMultipart):
+    """Blocking SMTP send, run in a worker thread by the async callers"""
+    server = smtplib.SMTP("smtp.gmail.com", 587)
+    server.starttls()
+    server.login(smtp_user, smtp_password)
+    server.sendmail(smtp_user, to_email, msg.as_string())
+    server.quit()
+
+
 def is_valid_date(date_str):
     try:
         datetime.strptime(date_str, "%Y-%m-%d")
@@ -261,7 +271,7 @@ async def schedule_appointment(date, time, phone_number=None, subject: str = Non
             
             logger.info(f"[CAMPAIGN] Retrieving users from campaign ID: {campaign_id}")
             # Get the campaign by ID
-            campaign = get_campaign_by_id(ObjectId(campaign_id))
+            campaign = await get_campaign_by_id(ObjectId(campaign_id))
             logger.info(f"[CAMPAIGN] Campaign data retrieved successfully - Campaign ID: {campaign_id}")
             
             if campaign and campaign.get("users"):
@@ -285,7 +295,7 @@ async def schedule_appointment(date, time, phone_number=None, subject: str = Non
         return {"error": "Invalid or missing date. Expected format: YYYY-MM-DD"}
     if not time or not is_valid_time(time):
         return {"error": "Invalid or missing time. Expected format: HH:MM (24-hour)"}
-    user = get_user_by_id(user_id)
+    user = await get_user_by_id(user_id)
     if not user or "email" not in user:
         return {"error": "User email not found."}
     user_email = user["email"]
@@ -326,9 +336,9 @@ async def schedule_appointment(date, time, phone_number=None, subject: str = Non
 
     user_name = user.get("name", user_email)
     subjectValue = f"Appointment with {user_name} on {date} at {time}"
-    from services.prospect_service import get_prospect_details_by_phone_number_and_campaign_id
+    from services.prospect_service import get_prospect_by_phone_number
     # Fetch prospect details
-    prospect = get_prospect_details_by_phone_number_and_campaign_id(phone_number, campaign_id)
+    prospect = await get_prospect_by_phone_number(phone_number, campaign_id) or {}
     prospect_name = prospect.get("name", "N/A")
     prospect_business_name = prospect.get("businessName", "N/A")
     prospect_phone_number = prospect.get("phoneNumber", "N/A")
@@ -362,8 +372,8 @@ async def schedule_appointment(date, time, phone_number=None, subject: str = Non
     print("[DEBUG] create_benchmark_appointment result:", result)
 
     # Get super admin users
-    users_collection = db_get_users_collection()
-    super_admins = list(users_collection.find({"role": "super_admin"}))
+    users_collection = get_async_users_collection()
+    super_admins = await users_collection.find({"role": "super_admin"}).to_list(None)
 
     # Set up SMTP credentials
     smtp_user = os.getenv("SMTP_USER_EMAIL")
@@ -430,11 +440,7 @@ async def schedule_appointment(date, time, phone_number=None, subject: str = Non
         # Send email
         try:
             logger.info(f"Sending appointment confirmation email to {admin_email}")
-            server = smtplib.SMTP("smtp.gmail.com", 587)
-            server.starttls()
-            server.login(smtp_user, smtp_password)
-            server.sendmail(smtp_user, admin_email, msg.as_string())
-            server.quit()
+            await asyncio.to_thread(_send_email, smtp_user, smtp_password, admin_email, msg)
             logger.info(f"Appointment confirmation email successfully sent to {admin_email}")
         except Exception as e:
             logger.error(f"Failed to send email to {admin_email}: {e}")
@@ -443,7 +449,7 @@ async def schedule_appointment(date, time, phone_number=None, subject: str = Non
     if phone_number:
         from services.prospect_service import update_prospect_appointment
 
-        appointment_update = update_prospect_appointment(
+        appointment_update = await update_prospect_appointment(
             phone_number=phone_number,
             campaign_id=campaign_id,
             appointment_interest=True,
@@ -0,0 +1,113 @@
+"""
+Concurrent, rate-limited dispatcher for Retell batch call requests.
+
+Requests are sent from a thread pool capped at RETELL_MAX_IN_FLIGHT concurrent
+requests and paced by a token bucket (RETELL_REQUESTS_PER_SECOND refill rate,
+RETELL_BURST capacity). All settings are per deployment environment variables.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Sequence
+from services.call_pacing import pacer, PACING_ENABLED, PACING_REJECTION_PAUSE_SECONDS, is_concurrency_rejection
+import logging
+import os
+import threading
+import time
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Prospects per Retell batch call
+RETELL_BATCH_SIZE = int(os.getenv("RETELL_BATCH_SIZE", "5"))
+# Concurrent create_batch_call requests (Retell account concurrency is 15)
+RETELL_MAX_IN_FLIGHT = int(os.getenv("RETELL_MAX_IN_FLIGHT", "15"))
+# Sustained request rate and burst size of the token bucket
+RETELL_REQUESTS_PER_SECOND = float(os.getenv("RETELL_REQUESTS_PER_SECOND", "20"))
+RETELL_BURST = int(os.getenv("RETELL_BURST", "20"))
+
+
+class TokenBucket:
+    """Thread-safe token bucket; acquire() blocks until a token is available"""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+# Shared by every dispatch in this process so concurrent campaigns respect the same limit
+_bucket = TokenBucket(RETELL_REQUESTS_PER_SECOND, RETELL_BURST)
+
+
+def chunk(items: Sequence[Any], size: int = None) -> List[List[Any]]:
+    """Split items into consecutive batches of at most size items"""
+    size = size or RETELL_BATCH_SIZE
+    return [list(items[start:start + size]) for start in range(0, len(items), size)]
+
+
+def dispatch_batches(batches: List[Any], send: Callable[[Any], Any], on_success: Callable[[Any, Any], None] = None, max_in_flight: int = None) -> List[Dict[str, Any]]:
+    """
+    Send every batch concurrently under the rate limit.
+
+    Args:
+        batches (list): Items passed one at a time to send
+        send (callable): Sends one batch and returns its response; exceptions are captured
+        on_success (callable, optional): Called with (batch, response) on the worker thread
+            as soon as a batch is accepted, e.g. for database bookkeeping
+        max_in_flight (int, optional): Maximum concurrent sends
+
+    Returns:
+        list: One {"batch", "response", "error"} entry per batch, in input order
+    """
+    if not batches:
+        return []
+    max_in_flight = max_in_flight or RETELL_MAX_IN_FLIGHT
+
+    def run(batch_num: int, batch: Any) -> Dict[str, Any]:
+        slots = len(batch) if hasattr(batch, "__len__") else 1
+        reservation_ids = pacer.acquire(slots) if PACING_ENABLED else None
+        if PACING_ENABLED and reservation_ids is None:
+            logger.warning(f"Batch {batch_num + 1} timed out waiting for dialing headroom")
+            return {"batch": batch, "response": None, "error": "Timed out waiting for dialing headroom"}
+        _bucket.acquire()
+        try:
+            response = send(batch)
+        except Exception as e:
+            logger.error(f"Error in batch {batch_num + 1}: {str(e)}")
+            if PACING_ENABLED:
+                pacer.release(reservation_ids)
+                if is_concurrency_rejection(e):
+                    pacer.pause(PACING_REJECTION_PAUSE_SECONDS)
+            return {"batch": batch, "response": None, "error": str(e)}
+        if on_success:
+            try:
+                on_success(batch, response)
+            except Exception as e:
+                # The calls were placed, so the batch still counts as sent
+                logger.error(f"Error recording batch {batch_num + 1}: {str(e)}")
+        return {"batch": batch, "response": response, "error": None}
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=min(max_in_flight, len(batches))) as executor:
+        results = list(executor.map(run, range(len(batches)), batches))
+
+    failed = sum(1 for result in results if result["error"])
+    logger.info(f"Dispatched {len(batches)} batches in {time.perf_counter() - started:.2f}s ({failed} failed)")
+    return results
@@ -1,9 +1,14 @@
 from datetime import datetime
-from retell import Retell
+from config.retell_config import get_retell_client
 import os
 from dotenv import load_dotenv
-import time
 from config.database import get_prospects_collection
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from services.transcript_service import transcript_operation, save_transcripts
+from services.audit_log_service import audit_log_entry, record_audit_logs
+from services.call_dispatcher import dispatch_batches, chunk, RETELL_BATCH_SIZE
+from services.retry_policy import next_attempt_expression
 import logging
 from typing import List, Dict, Any
 
@@ -13,28 +18,89 @@ logger = logging.getLogger(__name__)
 
 load_dotenv()
 
-def create_phone_call(prospects):
+def record_batch_initiated(collection, batch_prospects, batch_id: str, current_time: str) -> Dict[str, Any]:
     """
-    Initiate phone calls to prospects using batch calls for efficiency
+    Mark every prospect of an accepted Retell batch as contacted with one unordered bulk_write
+
+    Args:
+        collection: Prospects collection
+        batch_prospects (list): ProspectIn objects sent in the batch
+        batch_id (str): The batch ID from Retell
+        current_time (str): ISO timestamp of the initiation
+
+    Returns:
+        dict: Matched and modified counts plus the phone numbers that did not match
+    """
+    operations = [
+        UpdateOne(
+            {"phoneNumber": prospect.phoneNumber, "campaignId": prospect.campaignId},
+            {
+                "$set": {"status": "contacted"},
+                "$inc": {"retryCount": 1},
+                "$push": {"calls": {"batchId": batch_id, "timestamp": current_time}}
+            }
+        )
+        for prospect in batch_prospects
+    ]
+
+    try:
+        result = collection.bulk_write(operations, ordered=False)
+        matched, modified = result.matched_count, result.modified_count
+    except BulkWriteError as bwe:
+        matched = bwe.details.get("nMatched", 0)
+        modified = bwe.details.get("nModified", 0)
+        logger.error(f"Bookkeeping for batch {batch_id} finished with errors: {bwe.details.get('writeErrors')}")
+
+    unmatched = []
+    if matched < len(operations):
+        # Only look up which prospects are missing when something did not match
+        recorded = {
+            (doc.get("phoneNumber"), doc.get("campaignId"))
+            for doc in collection.find({"calls.batchId": batch_id}, {"phoneNumber": 1, "campaignId": 1})
+        }
+        unmatched = [
+            prospect.phoneNumber for prospect in batch_prospects
+            if (prospect.phoneNumber, prospect.campaignId) not in recorded
+        ]
+        for phone_number in unmatched:
+            logger.warning(f"No prospect matched {phone_number} for batch {batch_id}")
+
+    # Audit log entry for call initiation of every prospect that was updated
+    missing = set(unmatched)
+    record_audit_logs([
+        audit_log_entry(
+            "Batch Call Initiated", "AI Agent",
+            {"batchId": batch_id, "status": "Initiated"},
+            prospect.phoneNumber, prospect.campaignId, current_time,
+            entry_id=f"{batch_id}:{prospect.phoneNumber}:initiated"
+        )
+        for prospect in batch_prospects if prospect.phoneNumber not in missing
+    ])
+
+    logger.info(f"Batch {batch_id} bookkeeping: {matched} matched, {modified} modified of {len(operations)}")
+    return {"matched": matched, "modified": modified, "unmatched": unmatched}
+
+
+def create_phone_call(prospects, on_batch_result=None):
+    """
+    Initiate phone calls to prospects using batch calls for efficiency.
+    Batches are sent concurrently through services.call_dispatcher.
     
     Args:
         prospects (list): List of ProspectIn objects containing contact information
+        on_batch_result (callable, optional): Called with (batch prospects, batch ID, error)
+            once each batch has been accepted (error None) or has failed
         
     Returns:
         dict: Result of the call initiation
     """
     try:
-        # Check if API key is available
-        api_key = os.getenv("RETELL_API_KEY")
-        if not api_key:
-            raise ValueError("RETELL_API_KEY environment variable not set")
-            
         # Check if from number is available
         from_number = os.getenv("FROM_NUMBER")
         if not from_number:
             raise ValueError("FROM_NUMBER environment variable not set")
             
-        client = Retell(api_key=api_key)
+        client = get_retell_client()
         current_time = datetime.utcnow().isoformat() + "Z"
         
         if not prospects or len(prospects) == 0:
@@ -48,31 +114,18 @@ def create_phone_call(prospects):
             
         logger.info(f"Processing {len(valid_prospects)} prospects for batch calls")
         
-        # Batch size for Retell (concurrency of 15)
-        BATCH_SIZE = 5
-        total_batches = (len(valid_prospects) + BATCH_SIZE - 1) // BATCH_SIZE
+        batches = chunk(valid_prospects, RETELL_BATCH_SIZE)
+        total_batches = len(batches)
         
         collection = get_prospects_collection()
-        batch_responses = []
         
-        # Process prospects in batches
-        for batch_num in range(total_batches):
-            start_idx = batch_num * BATCH_SIZE
-            end_idx = min(start_idx + BATCH_SIZE, len(valid_prospects))
-            batch_prospects = valid_prospects[start_idx:end_idx]
-            
-            logger.info(f"Processing batch {batch_num + 1}/{total_batches} with {len(batch_prospects)} prospects")
-            
+        def send_batch(batch_prospects):
             # Prepare batch call tasks
             tasks = []
-            prospect_mapping = {}  # Map phone numbers to prospect objects for database updates
-            
             for prospect in batch_prospects:
                 prospect_name = prospect.name or "Unknown"
                 logger.info(f"Adding to batch: {prospect.phoneNumber} for {prospect_name}")
-                
-                # Create task for batch call
-                task = {
+                tasks.append({
                     "to_number": prospect.phoneNumber,
                     "retell_llm_dynamic_variables": {
                         "user_name": prospect.name or "There",
@@ -81,61 +134,44 @@ def create_phone_call(prospects):
                         "phoneNumber": prospect.phoneNumber,
                         "campaign_id": prospect.campaignId
                     }
-                }
-                tasks.append(task)
-                prospect_mapping[prospect.phoneNumber] = prospect
+                })
             
-            try:
-                # Create batch call
-                batch_response = client.batch_call.create_batch_call(
-                    from_number=from_number,
-                    tasks=tasks
-                )
-                
-                logger.info(f"Batch {batch_num + 1} initiated successfully: {batch_response}")
-                batch_responses.append(batch_response)
-                
-                # Update database for each prospect in this batch
-                for prospect in batch_prospects:
-                    # Create audit log entry for call initiation
-                    audit_log = {
-                        "actionType": "Batch Call Initiated",
-                        "performedBy": "AI Agent",
-                        "timestamp": {"$date": current_time},
-                        "details": {
-                            "batchId": batch_response.batch_call_id,
-                            "status": "Initiated"
-                        }
-                    }
-
-                    # Update the prospect in the database
-                    collection.update_one(
-                        {"phoneNumber": prospect.phoneNumber, "campaignId": prospect.campaignId},
-                        {
-                            "$set": {"status": "contacted"},
-                            "$inc": {"retryCount": 1},
-                            "$push": {
-                                "calls": {"batchId": batch_response.batch_call_id, "timestamp": current_time},
-                                "auditLogs": audit_log
-                            }
-                        }
-                    )
-                
-                # Add delay between batches to avoid overwhelming the system
-                if batch_num < total_batches - 1:  # Don't sleep after the last batch
-                    logger.info(f"Waiting 2 seconds before next batch...")
-                    time.sleep(2)
-                    
-            except Exception as batch_error:
-                logger.error(f"Error in batch {batch_num + 1}: {str(batch_error)}")
-                # Continue with next batch even if one fails
-                continue
+            # Create batch call
+            return client.batch_call.create_batch_call(
+                from_number=from_number,
+                tasks=tasks
+            )
+        
+        def record_batch(batch_prospects, batch_response):
+            logger.info(f"Batch initiated successfully: {batch_response}")
+            record_batch_initiated(collection, batch_prospects, batch_response.batch_call_id, current_time)
+            if on_batch_result:
+                on_batch_result(batch_prospects, batch_response.batch_call_id, None)
+        
+        # Send the batches concurrently under the Retell rate limit
+        results = dispatch_batches(batches, send_batch, on_success=record_batch)
+        
+        batch_responses = []
+        failed_batches = []
+        for batch_num, result in enumerate(results):
+            if result["error"]:
+                if on_batch_result:
+                    on_batch_result(result["batch"], None, result["error"])
+                # Other batches continue even if one fails
+                failed_batches.append({
+                    "batch": batch_num + 1,
+                    "phoneNumbers": [prospect.phoneNumber for prospect in result["batch"]],
+                    "error": result["error"]
+                })
+            else:
+                batch_responses.append(result["response"])
         
         logger.info(f"Completed processing {len(valid_prospects)} prospects in {total_batches} batches")
         return {
             "total_prospects": len(valid_prospects),
             "total_batches": total_batches,
-            "batch_responses": batch_responses
+            "batch_responses": batch_responses,
+            "failed_batches": failed_batches
         }
         
     except Exception as e:
@@ -143,22 +179,28 @@ def create_phone_call(prospects):
         raise
 
 
-def update_batch_call_status(batch_id: str, call_results: List[Dict[str, Any]]):
+def update_batch_call_status(batch_id: str, call_results: List[Dict[str, Any]]) -> Dict[str, int]:
     """
-    Update prospect statuses based on batch call results
+    Update prospect statuses based on batch call results with bulk writes
     
     Args:
         batch_id (str): The batch ID from Retell
-        call_results (list): List of call results from Retell batch call
+        call_results (list): Retell call objects of the batch (see list_batch_calls)
+
+    Returns:
+        dict: Number of calls applied to their batch entry, added directly and not matched
     """
     try:
         collection = get_prospects_collection()
         current_time = datetime.utcnow().isoformat() + "Z"
         
+        updates = {}
+        next_attempts = {}
+        transcripts = []
         for call_result in call_results:
             phone_number = call_result.get('to_number')
             call_id = call_result.get('call_id')
-            call_status = call_result.get('status', 'unknown')
+            call_status = call_result.get('call_status', 'unknown')
             
             if not phone_number or not call_id:
                 logger.warning(f"Invalid call result: {call_result}")
@@ -170,7 +212,7 @@ def update_batch_call_status(batch_id: str, call_results: List[Dict[str, Any]]):
             
             # Get additional call details
             transcript = call_result.get('transcript', '')
-            call_summary = call_result.get('call_summary', '')
+            call_summary = (call_result.get('call_analysis') or {}).get('call_summary', '')
             recording_url = call_result.get('recording_url', '')
             start_timestamp = call_result.get('start_timestamp', 0)
             
@@ -180,7 +222,7 @@ def update_batch_call_status(batch_id: str, call_results: List[Dict[str, Any]]):
             # Determine prospect status based on call status
             if call_status == 'ended':
                 prospect_status = 'picked_up'
-            elif call_status in ['busy', 'no_answer', 'voicemail']:
+            elif call_status in ['not_connected', 'busy', 'no_answer', 'voicemail']:
                 prospect_status = 'contacted'  # Keep as contacted for retry
             else:
                 prospect_status = 'error'
@@ -193,70 +235,114 @@ def update_batch_call_status(batch_id: str, call_results: List[Dict[str, Any]]):
                 "duration": duration_seconds,
                 "status": call_status,
                 "recordingUrl": recording_url,
-                "transcript": transcript,
+                "hasTranscript": bool(transcript),
                 "callSummary": call_summary
             }
             
             # Create audit log entry
-            audit_log = {
-                "actionType": "Batch Call Completed",
-                "performedBy": "AI Agent",
-                "timestamp": {"$date": current_time},
-                "details": {
-                    "batchId": batch_id,
-                    "callId": call_id,
-                    "status": call_status,
-                    "duration": duration_seconds
-                }
-            }
-            
-            # Update prospect in database - replace the existing call entry with batchId
-            update_result = collection.update_one(
-                {
-                    "phoneNumber": phone_number,
-                    "calls.batchId": batch_id
-                },
+            audit_log = audit_log_entry(
+                "Batch Call Completed", "AI Agent",
+                {"batchId": batch_id, "callId": call_id, "status": call_status, "duration": duration_seconds},
+                phone_number, (call_result.get('retell_llm_dynamic_variables') or {}).get('campaign_id'), current_time,
+                entry_id=f"{call_id}:batch_call_completed"
+            )
+            updates[call_id] = (phone_number, prospect_status, call_info, audit_log)
+            next_attempts[call_id] = (phone_number, next_attempt_expression(
+                call_status,
+                (call_result.get('retell_llm_dynamic_variables') or {}).get('campaign_id'),
+                disconnection_reason=call_result.get('disconnection_reason'),
+            ))
+            transcripts.append(transcript_operation(call_id, transcript, phone_number))
+
+        if not updates:
+            return {"applied": 0, "added": 0, "unmatched": 0}
+        save_transcripts(transcripts)
+
+        # Replace the batch-only call entry of each prospect in one round trip; entries the
+        # webhook already filled in have a callId and are left alone
+        operations = [
+            UpdateOne(
+                {"phoneNumber": phone_number, "calls": {"$elemMatch": {"batchId": batch_id, "callId": {"$exists": False}}}},
                 {
                     "$set": {
                         "status": prospect_status,
                         "calls.$": call_info,  # Replace the entire call object
                         "updatedAt": {"$date": current_time}
-                    },
-                    "$push": {
-                        "auditLogs": audit_log
                     }
                 }
             )
-            
-            if update_result.modified_count > 0:
-                logger.info(f"Updated prospect {phone_number} with status {prospect_status}, call_id: {call_id}")
-            else:
-                # If no prospect found with batchId, try to find by phone number and add call
+            for call_id, (phone_number, prospect_status, call_info, audit_log) in updates.items()
+        ]
+        applied = _bulk_write_matched(collection, operations, f"batch {batch_id} results")
+
+        added = 0
+        unmatched = 0
+        if applied < len(operations):
+            # Calls that are still missing had no batch entry, add them to the prospect directly
+            recorded = {
+                call["callId"]
+                for doc in collection.find({"calls.callId": {"$in": list(updates)}}, {"calls.callId": 1})
+                for call in doc.get("calls", []) if call.get("callId") in updates
+            }
+            missing = {call_id: update for call_id, update in updates.items() if call_id not in recorded}
+            for call_id, (phone_number, _, _, _) in missing.items():
                 logger.warning(f"No prospect found with batch ID {batch_id} for phone {phone_number}, trying to add call directly")
-                
-                # Find prospect by phone number and add call
-                prospect = collection.find_one({"phoneNumber": phone_number})
-                if prospect:
-                    collection.update_one(
-                        {"phoneNumber": phone_number},
-                        {
-                            "$set": {"status": prospect_status},
-                            "$push": {
-                                "calls": call_info,
-                                "auditLogs": audit_log
-                            },
-                            "$inc": {"retryCount": 1}
-                        }
-                    )
-                    logger.info(f"Added call to prospect {phone_number} directly")
-                else:
-                    logger.error(f"No prospect found for phone number {phone_number}")
+            fallback_operations = [
+                UpdateOne(
+                    {"phoneNumber": phone_number, "calls.callId": {"$ne": call_id}},
+                    {
+                        "$set": {"status": prospect_status},
+                        "$push": {"calls": call_info},
+                        "$inc": {"retryCount": 1}
+                    }
+                )
+                for call_id, (phone_number, prospect_status, call_info, audit_log) in missing.items()
+            ]
+            if fallback_operations:
+                added = _bulk_write_matched(collection, fallback_operations, f"batch {batch_id} direct calls")
+                unmatched = len(fallback_operations) - added
+                if unmatched:
+                    logger.error(f"No prospect found for {unmatched} calls of batch {batch_id}")
+
+        # Audit the calls that reached a prospect
+        if unmatched:
+            recorded = {
+                call["callId"]
+                for doc in collection.find({"calls.callId": {"$in": list(updates)}}, {"calls.callId": 1})
+                for call in doc.get("calls", []) if call.get("callId") in updates
+            }
+        else:
+            recorded = set(updates)
+        record_audit_logs([update[3] for call_id, update in updates.items() if call_id in recorded])
+
+        # Schedule the retries, unless a call_analyzed webhook already decided the next attempt
+        retry_operations = [
+            UpdateOne(
+                {"phoneNumber": phone_number, "calls.callId": call_id, "nextAttemptAt": {"$exists": False}},
+                [{"$set": {"nextAttemptAt": next_attempt}}]
+            )
+            for call_id, (phone_number, next_attempt) in next_attempts.items() if call_id in recorded
+        ]
+        if retry_operations:
+            _bulk_write_matched(collection, retry_operations, f"batch {batch_id} retries")
+
+        logger.info(f"Batch {batch_id} results: {applied} applied, {added} added directly, {unmatched} unmatched")
+        return {"applied": applied, "added": added, "unmatched": unmatched}
                 
     except Exception as e:
         logger.error(f"Error updating batch call status: {str(e)}")
         raise
 
 
+def _bulk_write_matched(collection, operations, description: str) -> int:
+    """Run an unordered bulk_write and return the matched count, logging write errors"""
+    try:
+        return collection.bulk_write(operations, ordered=False).matched_count
+    except BulkWriteError as bwe:
+        logger.error(f"Bulk write for {description} finished with errors: {bwe.details.get('writeErrors')}")
+        return bwe.details.get("nMatched", 0)
+
+
 def get_batch_call_status(batch_id: str):
     """
     Get the status of a batch call from Retell
@@ -268,11 +354,7 @@ def get_batch_call_status(batch_id: str):
         dict: Batch call status and results
     """
     try:
-        api_key = os.getenv("RETELL_API_KEY")
-        if not api_key:
-            raise ValueError("RETELL_API_KEY environment variable not set")
-            
-        client = Retell(api_key=api_key)
+        client = get_retell_client()
         
         # Get batch call status
         batch_status = client.batch_call.get_batch_call(batch_id)
@@ -282,4 +364,40 @@ def get_batch_call_status(batch_id: str):
         
     except Exception as e:
         logger.error(f"Error getting batch call status: {str(e)}")
-        raise
\ No newline at end of file
+        raise
+
+def list_batch_calls(batch_id: str, page_size: int = 1000) -> List[Dict[str, Any]]:
+    """
+    List the calls Retell placed for a batch
+
+    get_batch_call only returns the batch metadata, so the calls are read from
+    list-calls filtered on the batch ID, a page at a time.
+
+    Args:
+        batch_id (str): The batch ID from Retell
+        page_size (int): Calls fetched per request
+
+    Returns:
+        list: Retell call objects of the batch
+    """
+    try:
+        client = get_retell_client()
+        batch_calls = []
+        pagination_key = None
+        while True:
+            params = {"filter_criteria": {"batch_call_id": [batch_id]}, "limit": page_size}
+            if pagination_key:
+                params["pagination_key"] = pagination_key
+            page = [
+                call.model_dump() if hasattr(call, "model_dump") else call
+                for call in client.call.list(**params)
+            ]
+            # Only keep calls of this batch, in case the filter is not applied
+            batch_calls.extend(call for call in page if call.get("batch_call_id") in (None, batch_id))
+            if len(page) < page_size:
+                return batch_calls
+            pagination_key = page[-1]["call_id"]
+
+    except Exception as e:
+        logger.error(f"Error listing calls of batch {batch_id}: {str(e)}")
+        raise
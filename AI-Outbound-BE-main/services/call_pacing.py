@@ -0,0 +1,239 @@
+"""
+Adaptive dial pacing driven by Retell call events.
+
+The webhook feeds call_started / call_ended events into a live-call registry.
+Before a batch is sent, the dispatcher reserves one slot per task and waits until
+live calls plus outstanding reservations leave enough headroom under
+RETELL_CONCURRENCY_LIMIT. A reservation turns into a live call when its
+call_started event arrives, is freed when the call ends without starting, or
+expires after PACING_RESERVATION_SECONDS.
+
+Live calls, reservations and rejection pauses are documents in the call_slots
+collection, so the web workers that receive the webhooks and every process that
+dials (scheduler, upload routes) count against the same limit. Every document
+has an expiresAt; expired ones are not counted and the TTL index removes them.
+"""
+from config.database import get_call_slots_collection
+from pymongo import ASCENDING
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+import logging
+import os
+import random
+import threading
+import time
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Concurrent calls allowed on the Retell account
+RETELL_CONCURRENCY_LIMIT = int(os.getenv("RETELL_CONCURRENCY_LIMIT", "15"))
+# Set to false to dispatch without waiting for headroom
+PACING_ENABLED = os.getenv("RETELL_PACING_ENABLED", "true").lower() != "false"
+# How long a reserved slot waits for its call_started event
+PACING_RESERVATION_SECONDS = int(os.getenv("PACING_RESERVATION_SECONDS", "90"))
+# How long a batch waits for headroom before it is failed back to the dial queue
+PACING_MAX_WAIT_SECONDS = int(os.getenv("PACING_MAX_WAIT_SECONDS", "300"))
+# Pause after Retell rejects a batch for exceeding the concurrency limit
+PACING_REJECTION_PAUSE_SECONDS = int(os.getenv("PACING_REJECTION_PAUSE_SECONDS", "30"))
+# Live calls without a call_ended event are dropped after this long
+LIVE_CALL_MAX_SECONDS = int(os.getenv("LIVE_CALL_MAX_SECONDS", "1800"))
+
+# call_slots document kinds; "ended" marks a finished call so a late call_started is ignored
+LIVE = "live"
+RESERVED = "reserved"
+ENDED = "ended"
+PAUSE_ID = "pause"
+
+
+class LiveCallRegistry:
+    """Live calls and reserved slots of every process, kept in call_slots"""
+
+    def __init__(self, max_call_seconds: int):
+        self.max_call_seconds = max_call_seconds
+
+    def call_started(self, call_id: str, to_number: str = None) -> bool:
+        """Register a call, returns False if it was already registered or has ended"""
+        now = datetime.utcnow()
+        result = get_call_slots_collection().update_one(
+            {"_id": call_id},
+            {"$setOnInsert": {
+                "kind": LIVE,
+                "toNumber": to_number,
+                "startedAt": now,
+                "expiresAt": now + timedelta(seconds=self.max_call_seconds),
+            }},
+            upsert=True
+        )
+        return result.upserted_id is not None
+
+    def call_ended(self, call_id: str) -> Optional[str]:
+        """
+        Mark a call as ended
+
+        Returns:
+            str: "live" if the call was live, None if it had never started
+                 (e.g. not connected), "ended" if it had already ended
+        """
+        now = datetime.utcnow()
+        previous = get_call_slots_collection().find_one_and_update(
+            {"_id": call_id},
+            {"$set": {"kind": ENDED, "expiresAt": now + timedelta(seconds=self.max_call_seconds)}},
+            projection={"kind": 1},
+            upsert=True
+        )
+        return previous["kind"] if previous else None
+
+    def reserve(self, slots: int, reservation_seconds: int) -> List[Any]:
+        """Insert slots reservations, returns their ids"""
+        expires_at = datetime.utcnow() + timedelta(seconds=reservation_seconds)
+        result = get_call_slots_collection().insert_many([
+            {"kind": RESERVED, "expiresAt": expires_at} for _ in range(slots)
+        ])
+        return result.inserted_ids
+
+    def release(self, reservation_ids: List[Any]):
+        if reservation_ids:
+            get_call_slots_collection().delete_many({"_id": {"$in": reservation_ids}, "kind": RESERVED})
+
+    def consume_reservation(self) -> bool:
+        """Drop the oldest reservation, its call has started or ended"""
+        return get_call_slots_collection().find_one_and_delete(
+            {"kind": RESERVED, "expiresAt": {"$gt": datetime.utcnow()}},
+            sort=[("expiresAt", ASCENDING)]
+        ) is not None
+
+    def count(self, kinds=(LIVE, RESERVED)) -> int:
+        return get_call_slots_collection().count_documents(
+            {"kind": {"$in": list(kinds)}, "expiresAt": {"$gt": datetime.utcnow()}}
+        )
+
+
+class PacingEngine:
+    """Admits batches only while there is headroom under the concurrency limit"""
+
+    def __init__(self, registry: LiveCallRegistry, capacity: int, reservation_seconds: int):
+        self.registry = registry
+        self.capacity = max(1, capacity)
+        self.reservation_seconds = reservation_seconds
+        # Events handled by this process wake its waiters early; others are seen on the next poll
+        self._condition = threading.Condition()
+
+    def _paused_seconds(self) -> float:
+        pause = get_call_slots_collection().find_one({"_id": PAUSE_ID}, {"expiresAt": 1})
+        if not pause:
+            return 0.0
+        return max((pause["expiresAt"] - datetime.utcnow()).total_seconds(), 0.0)
+
+    def _headroom(self) -> int:
+        return self.capacity - self.registry.count()
+
+    def available_slots(self) -> int:
+        """Calls that could be placed right now"""
+        if self._paused_seconds() > 0:
+            return 0
+        return max(self._headroom(), 0)
+
+    def acquire(self, slots: int, timeout: float = None) -> Optional[List[Any]]:
+        """
+        Wait until slots calls can be placed and reserve them.
+
+        Args:
+            slots (int): Calls about to be placed (capped at the concurrency limit)
+            timeout (float, optional): Seconds to wait before giving up
+
+        Returns:
+            list: Ids of the reserved slots, to pass to release() if the batch is not sent,
+                  or None if no headroom opened up in time
+        """
+        slots = min(max(1, slots), self.capacity)
+        deadline = time.monotonic() + (timeout if timeout is not None else PACING_MAX_WAIT_SECONDS)
+        while True:
+            if self._paused_seconds() == 0 and self._headroom() >= slots:
+                reservation_ids = self.registry.reserve(slots, self.reservation_seconds)
+                # Another process may have reserved at the same time; whoever counts
+                # last sees both reservations, so the limit is never overshot
+                if self._headroom() >= 0:
+                    return reservation_ids
+                self.registry.release(reservation_ids)
+            now = time.monotonic()
+            if now >= deadline:
+                return None
+            # Jittered, so processes that backed off together do not collide again
+            with self._condition:
+                self._condition.wait(min(random.uniform(0.5, 1.0), deadline - now))
+
+    def release(self, reservation_ids: List[Any]):
+        """Give back the slots acquire() reserved for a batch that was not sent"""
+        self.registry.release(reservation_ids)
+        with self._condition:
+            self._condition.notify_all()
+
+    def pause(self, seconds: float):
+        """Stop admitting batches everywhere for a while, e.g. after a provider rejection"""
+        get_call_slots_collection().update_one(
+            {"_id": PAUSE_ID},
+            {"$set": {"kind": PAUSE_ID}, "$max": {"expiresAt": datetime.utcnow() + timedelta(seconds=seconds)}},
+            upsert=True
+        )
+        logger.warning(f"Dial pacing paused for {seconds}s")
+
+    def call_started(self, call_id: str, to_number: str = None):
+        if self.registry.call_started(call_id, to_number):
+            # The reserved slot is now a live call
+            self.registry.consume_reservation()
+        with self._condition:
+            self._condition.notify_all()
+
+    def call_ended(self, call_id: str):
+        if self.registry.call_ended(call_id) is None:
+            # The call ended without starting, its reserved slot is free again
+            self.registry.consume_reservation()
+        with self._condition:
+            self._condition.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        live = self.registry.count((LIVE,))
+        reserved = self.registry.count((RESERVED,))
+        return {
+            "enabled": PACING_ENABLED,
+            "capacity": self.capacity,
+            "liveCalls": live,
+            "reservedSlots": reserved,
+            "headroom": max(self.capacity - live - reserved, 0),
+            "pausedSeconds": round(self._paused_seconds(), 1),
+        }
+
+
+# Every process shares the registry through call_slots
+live_calls = LiveCallRegistry(LIVE_CALL_MAX_SECONDS)
+pacer = PacingEngine(live_calls, RETELL_CONCURRENCY_LIMIT, PACING_RESERVATION_SECONDS)
+
+
+def record_call_event(data: Dict[str, Any]) -> Optional[str]:
+    """
+    Update the live-call registry from a Retell webhook payload
+
+    Returns:
+        str: The call ID, or None if the payload has none
+    """
+    call = data.get("call") or {}
+    call_id = call.get("call_id")
+    if not call_id:
+        return None
+    event = data.get("event")
+    if event == "call_started":
+        pacer.call_started(call_id, call.get("to_number"))
+    elif event in ("call_ended", "call_analyzed"):
+        # call_analyzed also ends the call in case call_ended was missed
+        pacer.call_ended(call_id)
+    return call_id
+
+
+def is_concurrency_rejection(error: Exception) -> bool:
+    """Whether Retell refused a request because the account is at its limit"""
+    if getattr(error, "status_code", None) == 429:
+        return True
+    message = str(error).lower()
+    return "concurrency" in message or "too many" in message
@@ -1,15 +1,22 @@
 from fastapi import HTTPException
-from config.database import get_campaign_users_collection, get_campaigns_collection, get_users_collection, get_prospects_collection
+from config.async_database import (
+    get_async_campaign_users_collection,
+    get_async_campaigns_collection,
+    get_async_users_collection,
+    get_async_prospects_collection,
+)
 from pymongo.errors import DuplicateKeyError
 from datetime import datetime
 from bson import ObjectId
 from pydantic import BaseModel
-from utils.timezone import get_brisbane_now
+from utils.timezone import get_brisbane_now, scheduled_at_utc, call_window_utc
+from services.retry_policy import forget_campaign_max_retry
+import asyncio
 
-def create_new_campaign(campaign_name: str, users: str, campaignDate: str = None, description: str = None, has_ebook: bool = False, campaignTime: str = None):
+async def create_new_campaign(campaign_name: str, users: str, campaignDate: str = None, description: str = None, has_ebook: bool = False, campaignTime: str = None):
     try:
-        campaign_users_collection = get_campaign_users_collection()
-        users_collection = get_users_collection()
+        campaign_users_collection = get_async_campaign_users_collection()
+        users_collection = get_async_users_collection()
         
         new_campaign = {
             "campaignName": campaign_name,
@@ -25,8 +32,8 @@ def create_new_campaign(campaign_name: str, users: str, campaignDate: str = None
         }
         print("New campaign:", new_campaign)
         
-        result = campaign_users_collection.insert_one(new_campaign)
-        created_campaign = campaign_users_collection.find_one({"_id": result.inserted_id})
+        result = await campaign_users_collection.insert_one(new_campaign)
+        created_campaign = await campaign_users_collection.find_one({"_id": result.inserted_id})
         campaign_id = str(created_campaign["_id"])
         
         # Update each user in the users list by adding this campaign_id to their campaign_user_ids array
@@ -66,10 +73,10 @@ def create_new_campaign(campaign_name: str, users: str, campaignDate: str = None
             detail=f"An error occurred while creating the campaign: {str(e)}"
         )
 
-def getCampaigns():
+async def getCampaigns():
     try:
-        campaign_collection = get_campaigns_collection()
-        campaigns = list(campaign_collection.find({"isVisible": True}))
+        campaign_collection = get_async_campaigns_collection()
+        campaigns = await campaign_collection.find({"isVisible": True}).to_list(None)
         transformed_campaigns = [{
             "id": str(campaign["_id"]),
             "campaignName": campaign.get("campaignName"),
@@ -97,12 +104,12 @@ def getCampaigns():
             detail=f"An error occurred while fetching campaigns: {str(e)}"
         )
 
-def update_campaign_ebook(campaign_id: str, ebook_path: str):
+async def update_campaign_ebook(campaign_id: str, ebook_path: str):
     try:
-        campaign_collection = get_campaigns_collection()
+        campaign_collection = get_async_campaigns_collection()
         
         # Update campaign with ebook information
-        result = campaign_collection.update_one(
+        result = await campaign_collection.update_one(
             {"_id": ObjectId(campaign_id)},
             {
                 "$set": {
@@ -130,10 +137,10 @@ def update_campaign_ebook(campaign_id: str, ebook_path: str):
             detail=f"An error occurred while updating campaign ebook information: {str(e)}"
         )
 
-def get_brokers():
+async def get_brokers():
     try:
-        users_collection = get_users_collection()
-        brokers = list(users_collection.find({"role": "user"}))
+        users_collection = get_async_users_collection()
+        brokers = await users_collection.find({"role": "user"}).to_list(None)
         return [
             {
                 "id": str(broker["_id"]),
@@ -149,14 +156,21 @@ def get_brokers():
             detail=f"An error occurred while fetching brokers: {str(e)}"
         )
     
-def getCampaignUsers():
+async def getCampaignUsers():
     try:
         print("Getting campaign users")
-        campaign_users_collection = get_campaign_users_collection()
-        users_collection = get_users_collection()
+        campaign_users_collection = get_async_campaign_users_collection()
+        users_collection = get_async_users_collection()
         print("Campaign users collection:", campaign_users_collection)
-        campaign_users = list(campaign_users_collection.find({"isVisible": True}))
+        campaign_users = await campaign_users_collection.find({"isVisible": True}).to_list(None)
         print("Campaign users:", campaign_users)
+
+        # Owners of every campaign in one query instead of one per campaign
+        owner_ids = {ObjectId(campaign_user["users"]) for campaign_user in campaign_users if campaign_user.get("users")}
+        owners = {
+            str(user["_id"]): user
+            for user in await users_collection.find({"_id": {"$in": list(owner_ids)}}, {"name": 1, "email": 1}).to_list(None)
+        } if owner_ids else {}
         
         transformed_campaign_users = []
         for campaign_user in campaign_users:
@@ -164,7 +178,7 @@ def getCampaignUsers():
             owner_name = None
             owner_email = None
             if campaign_user.get("users"):
-                user = users_collection.find_one({"_id": ObjectId(campaign_user["users"])})
+                user = owners.get(str(campaign_user["users"]))
                 if user:
                     owner_name = user.get("name")
                     owner_email = user.get("email")
@@ -194,13 +208,13 @@ def getCampaignUsers():
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
-def get_campaigns_by_user_id(user_id: str):
+async def get_campaigns_by_user_id(user_id: str):
     try:
-        #users_collection = get_users_collection()
-        campaign_users_collection = get_campaign_users_collection()
+        #users_collection = get_async_users_collection()
+        campaign_users_collection = get_async_campaign_users_collection()
         
         # Get the user document to find their campaign_user_ids
-        user = get_users_collection().find_one({"_id": ObjectId(user_id)})
+        user = await get_async_users_collection().find_one({"_id": ObjectId(user_id)})
         # if not user or "campaign_user_ids" not in user or not user["campaign_user_ids"]:
         #     return {
         #         "status": "success",
@@ -215,7 +229,7 @@ def get_campaigns_by_user_id(user_id: str):
         
         # Fetch all campaigns where _id is in the user's campaign_user_ids
         # campaigns = list(campaign_users_collection.find({"_id": {"$in": campaign_ids}}))
-        campaigns = list(campaign_users_collection.find({"users": user_id}))
+        campaigns = await campaign_users_collection.find({"users": user_id}).to_list(None)
         transformed_campaigns = [{
             "id": str(campaign["_id"]),
             "campaignName": campaign.get("campaignName"),
@@ -244,13 +258,13 @@ def get_campaigns_by_user_id(user_id: str):
             detail=f"An error occurred while fetching user campaigns: {str(e)}"
         )
 
-def get_prospects_for_campaign(campaign_id: str):
+async def get_prospects_for_campaign(campaign_id: str):
     try:
-        campaign_users_collection = get_campaign_users_collection()
-        prospects_collection = get_prospects_collection()
+        campaign_users_collection = get_async_campaign_users_collection()
+        prospects_collection = get_async_prospects_collection()
         
         # Find the campaign
-        campaign = campaign_users_collection.find_one({"_id": ObjectId(campaign_id)})
+        campaign = await campaign_users_collection.find_one({"_id": ObjectId(campaign_id)})
         if not campaign:
             raise HTTPException(
                 status_code=404,
@@ -271,7 +285,8 @@ def get_prospects_for_campaign(campaign_id: str):
         # prospect_object_ids = [ObjectId(pid) for pid in prospect_ids]
         
         # Fetch prospects from prospects collection
-        prospects = list(prospects_collection.find({"campaignId": campaign_id}))
+        # Transcripts are fetched per call, see GET /api/transcripts/{call_id}
+        prospects = await prospects_collection.find({"campaignId": campaign_id}, {"calls.transcript": 0, "auditLogs": 0}).to_list(None)
         
         # Transform prospects data
         transformed_prospects = []
@@ -313,10 +328,10 @@ def get_prospects_for_campaign(campaign_id: str):
 # Define the data model
 
 
-def unarchive_campaign_by_id(campaign_id: str):
+async def unarchive_campaign_by_id(campaign_id: str):
     try:
-        campaign_users_collection = get_campaign_users_collection()
-        campaign_users_collection.update_one({"_id": ObjectId(campaign_id)}, {"$set": {"isVisible": True}})
+        campaign_users_collection = get_async_campaign_users_collection()
+        await campaign_users_collection.update_one({"_id": ObjectId(campaign_id)}, {"$set": {"isVisible": True}})
         return {
             "status": "success",
             "message": "Campaign unarchived successfully"
@@ -324,10 +339,10 @@ def unarchive_campaign_by_id(campaign_id: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
-def get_archived_campaigns_list():
+async def get_archived_campaigns_list():
     try:
-        campaign_users_collection = get_campaign_users_collection()
-        campaigns = list(campaign_users_collection.find({"isVisible": False}))
+        campaign_users_collection = get_async_campaign_users_collection()
+        campaigns = await campaign_users_collection.find({"isVisible": False}).to_list(None)
 
         transformed_campaigns = [{
             "id": str(campaign["_id"]),
@@ -341,9 +356,9 @@ def get_archived_campaigns_list():
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
-def get_campaign_analytics_list(campaign_id: str):
+async def get_campaign_analytics_list(campaign_id: str):
     try:
-        prospects_collection = get_prospects_collection()
+        prospects_collection = get_async_prospects_collection()
         
         # Base match stage for this campaign
         base_match = {"campaignId": campaign_id}
@@ -354,7 +369,6 @@ def get_campaign_analytics_list(campaign_id: str):
             {"$unwind": {"path": "$calls", "preserveNullAndEmptyArrays": False}},
             {"$count": "totalCalls"}
         ]
-        total_calls_result = next(prospects_collection.aggregate(total_calls_pipeline), {"totalCalls": 0})
         
         # 2. Get total connected calls (with status "ended")
         connected_calls_pipeline = [
@@ -363,21 +377,18 @@ def get_campaign_analytics_list(campaign_id: str):
             {"$match": {"calls.status": "ended"}},
             {"$count": "totalConnectedCalls"}
         ]
-        connected_calls_result = next(prospects_collection.aggregate(connected_calls_pipeline), {"totalConnectedCalls": 0})
         
         # 3. Get total appointments booked
         appointments_pipeline = [
             {"$match": {**base_match, "appointment.appointmentInterest": True}},
             {"$count": "totalAppointmentsBooked"}
         ]
-        appointments_result = next(prospects_collection.aggregate(appointments_pipeline), {"totalAppointmentsBooked": 0})
         
         # 4. Get total ebooks sent
         ebooks_pipeline = [
             {"$match": {**base_match, "isEbook": True}},
             {"$count": "totalEbooksSent"}
         ]
-        ebooks_result = next(prospects_collection.aggregate(ebooks_pipeline), {"totalEbooksSent": 0})
         
         # 5. Get scheduled callbacks
         callbacks_pipeline = [
@@ -387,7 +398,6 @@ def get_campaign_analytics_list(campaign_id: str):
             }},
             {"$count": "totalScheduledCallbacks"}
         ]
-        callbacks_result = next(prospects_collection.aggregate(callbacks_pipeline), {"totalScheduledCallbacks": 0})
 
 
         average_call_duration_pipeline = [
@@ -395,7 +405,27 @@ def get_campaign_analytics_list(campaign_id: str):
             {"$unwind": {"path": "$calls", "preserveNullAndEmptyArrays": False}},
             {"$group": {"_id": None, "averageCallDuration": {"$avg": "$calls.duration"}}}
         ]
-        average_call_duration_result = next(prospects_collection.aggregate(average_call_duration_pipeline), {"averageCallDuration": 0})
+
+        # The pipelines are independent, run them concurrently
+        async def first_result(pipeline, default):
+            results = await prospects_collection.aggregate(pipeline).to_list(1)
+            return results[0] if results else default
+
+        (
+            total_calls_result,
+            connected_calls_result,
+            appointments_result,
+            ebooks_result,
+            callbacks_result,
+            average_call_duration_result,
+        ) = await asyncio.gather(
+            first_result(total_calls_pipeline, {"totalCalls": 0}),
+            first_result(connected_calls_pipeline, {"totalConnectedCalls": 0}),
+            first_result(appointments_pipeline, {"totalAppointmentsBooked": 0}),
+            first_result(ebooks_pipeline, {"totalEbooksSent": 0}),
+            first_result(callbacks_pipeline, {"totalScheduledCallbacks": 0}),
+            first_result(average_call_duration_pipeline, {"averageCallDuration": 0}),
+        )
         
         # Combine all results
         transformed_campaign = {
@@ -421,11 +451,11 @@ class CampaignUpdate:
     maxRetry: int
     campaignTime: str
 
-def update_campaign_settings(campaign_id: str, campaign_update: CampaignUpdate):
+async def update_campaign_settings(campaign_id: str, campaign_update: CampaignUpdate):
     print("Campaign     :", campaign_update)
     try:
-        campaign_users_collection = get_campaign_users_collection()
-        prospects_collection = get_prospects_collection()
+        campaign_users_collection = get_async_campaign_users_collection()
+        prospects_collection = get_async_prospects_collection()
         
         # Convert the Pydantic model to a dictionary
         update_data = {
@@ -439,7 +469,7 @@ def update_campaign_settings(campaign_id: str, campaign_update: CampaignUpdate):
         print("Update data:", update_data)
         
         # Update campaign settings
-        result = campaign_users_collection.update_one(
+        result = await campaign_users_collection.update_one(
             {"_id": ObjectId(campaign_id)},
             {"$set": update_data}
         )
@@ -449,18 +479,38 @@ def update_campaign_settings(campaign_id: str, campaign_update: CampaignUpdate):
                 status_code=404,
                 detail=f"Campaign with ID {campaign_id} not found"
             )
+        # Retries of this campaign follow the new maxRetry right away
+        forget_campaign_max_retry(campaign_id)
         
         # Now update all prospects associated with this campaign
         # This will update the scheduledCallDate for all prospects with this campaignId
         if update_data.get("campaignDate"):
-            prospects_update_result = prospects_collection.update_many(
-                {"campaignId": campaign_id},
-                {"$set": {
-                    "scheduledCallDate": update_data["campaignDate"],
-                    "scheduledCallTime": update_data["campaignTime"],
-                    "updated_at": get_brisbane_now().isoformat()
-                }}
-            )
+            scheduled_at = scheduled_at_utc(update_data["campaignDate"], update_data["campaignTime"])
+            updated_at = get_brisbane_now().isoformat()
+
+            async def reschedule(prospect_timezone):
+                # The call window depends on the prospect's timezone, one update per timezone
+                call_window_start, call_window_end = call_window_utc(scheduled_at, prospect_timezone)
+                await prospects_collection.update_many(
+                    {"campaignId": campaign_id, "timezone": prospect_timezone},
+                    {"$set": {
+                        "scheduledCallDate": update_data["campaignDate"],
+                        "scheduledCallTime": update_data["campaignTime"],
+                        "scheduledAt": scheduled_at,
+                        "callWindowStart": call_window_start,
+                        "callWindowEnd": call_window_end,
+                        "updated_at": updated_at
+                    },
+                    # A rescheduled prospect can be claimed by the scheduled calls job again. Its
+                    # nextAttemptAt is kept: unlike an upload, a reschedule does not reset the
+                    # status, so a pending retry or callback of a called prospect still applies
+                    "$unset": {"scheduledClaim": ""}}
+                )
+
+            # None also covers prospects stored before the timezone was recorded
+            prospect_timezones = set(await prospects_collection.distinct("timezone", {"campaignId": campaign_id}))
+            prospect_timezones.add(None)
+            await asyncio.gather(*(reschedule(prospect_timezone) for prospect_timezone in prospect_timezones))
             
         return {
             "status": "success",
@@ -469,7 +519,7 @@ def update_campaign_settings(campaign_id: str, campaign_update: CampaignUpdate):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
-def get_campaign_by_id(campaign_id):
+async def get_campaign_by_id(campaign_id):
     """
     Retrieve campaign details from the campaign_users table by campaign ID
     
@@ -480,9 +530,9 @@ def get_campaign_by_id(campaign_id):
         dict: Campaign details if found, None otherwise
     """
     try:
-        campaign_users_collection = get_campaign_users_collection()
+        campaign_users_collection = get_async_campaign_users_collection()
         # Find the campaign by ID
-        campaign = campaign_users_collection.find_one({"_id": campaign_id})
+        campaign = await campaign_users_collection.find_one({"_id": campaign_id})
         # campaign = campaign_users_collection.find_one({"_id": wjer})
 
         return campaign
@@ -490,10 +540,10 @@ def get_campaign_by_id(campaign_id):
         print(f"Error in get_campaign_by_id: {str(e)}")
         return None 
     
-def delete_campaign_by_id(campaign_id: str):
+async def delete_campaign_by_id(campaign_id: str):
     try:
-        campaign_users_collection = get_campaign_users_collection()
-        campaign_users_collection.update_one({"_id": ObjectId(campaign_id)}, {"$set": {"isVisible": False}})
+        campaign_users_collection = get_async_campaign_users_collection()
+        await campaign_users_collection.update_one({"_id": ObjectId(campaign_id)}, {"$set": {"isVisible": False}})
         # campaign_users_collection.delete_one({"_id": ObjectId(campaign_id)})
         return {
             "status": "success",
@@ -0,0 +1,246 @@
+"""
+Durable outbound dial queue.
+
+Producers enqueue prospects; dispatcher workers claim them with leased
+find_one_and_update calls so several app instances can share dialing. A failed
+item goes back to pending with exponential backoff until it runs out of
+attempts, then it is dead-lettered. A prospect can only be queued once at a
+time (unique partial index on phoneNumber/campaignId for active items).
+
+Once an item is dialed or dead-lettered, its prospect leaves the "new" status
+(contacted or error) and loses its scheduled claim, so the scheduled calls job
+does not queue it again when the claim lease expires.
+"""
+from config.database import get_dial_queue_collection, get_prospects_collection
+from models.prospect import ProspectIn
+from pymongo import UpdateOne, ReturnDocument
+from pymongo.errors import BulkWriteError
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Iterable
+import logging
+import os
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DIAL_QUEUE_MAX_ATTEMPTS = int(os.getenv("DIAL_QUEUE_MAX_ATTEMPTS", "5"))
+DIAL_QUEUE_LEASE_SECONDS = int(os.getenv("DIAL_QUEUE_LEASE_SECONDS", "300"))
+DIAL_QUEUE_BACKOFF_SECONDS = int(os.getenv("DIAL_QUEUE_BACKOFF_SECONDS", "30"))
+DIAL_QUEUE_MAX_BACKOFF_SECONDS = int(os.getenv("DIAL_QUEUE_MAX_BACKOFF_SECONDS", "900"))
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+def _queue_fields(prospect) -> Dict[str, Any]:
+    """Fields copied from a ProspectIn or a prospect document"""
+    if isinstance(prospect, ProspectIn):
+        prospect = prospect.model_dump()
+    return {
+        "name": prospect.get("name"),
+        "phoneNumber": prospect.get("phoneNumber"),
+        "businessName": prospect.get("businessName", ""),
+        "ownerName": prospect.get("ownerName", ""),
+        "campaignId": prospect.get("campaignId", ""),
+        "campaignName": prospect.get("campaignName", ""),
+    }
+
+
+def enqueue_prospects(prospects: Iterable, source: str) -> Dict[str, int]:
+    """
+    Add prospects to the dial queue, skipping those that are already queued
+
+    Args:
+        prospects (iterable): ProspectIn objects or prospect documents
+        source (str): Producer name, e.g. "scheduled", "initiate_call", "campaign_call"
+
+    Returns:
+        dict: Number of prospects queued and already queued
+    """
+    collection = get_dial_queue_collection()
+    now = datetime.utcnow()
+    operations = []
+    for prospect in prospects:
+        fields = _queue_fields(prospect)
+        if not fields["phoneNumber"]:
+            continue
+        operations.append(UpdateOne(
+            {"phoneNumber": fields["phoneNumber"], "campaignId": fields["campaignId"], "active": True},
+            {
+                "$setOnInsert": {
+                    **fields,
+                    "source": source,
+                    "state": "pending",
+                    "attempts": 0,
+                    "maxAttempts": DIAL_QUEUE_MAX_ATTEMPTS,
+                    "availableAt": now,
+                    "leaseOwner": None,
+                    "leaseExpiresAt": None,
+                    "lastError": None,
+                    "createdAt": now,
+                    "updatedAt": now,
+                }
+            },
+            upsert=True
+        ))
+    if not operations:
+        return {"queued": 0, "alreadyQueued": 0}
+
+    try:
+        result = collection.bulk_write(operations, ordered=False)
+        queued = result.upserted_count
+    except BulkWriteError as bwe:
+        # Two producers racing on the same prospect hit the unique index; the other one won
+        errors = bwe.details.get("writeErrors", [])
+        unexpected = [error for error in errors if error.get("code") != DUPLICATE_KEY_ERROR]
+        if unexpected:
+            logger.error(f"Error enqueueing prospects: {unexpected}")
+        queued = bwe.details.get("nUpserted", 0)
+
+    logger.info(f"Dial queue: {queued} queued, {len(operations) - queued} already queued (source: {source})")
+    return {"queued": queued, "alreadyQueued": len(operations) - queued}
+
+
+def claim_items(owner: str, limit: int, lease_seconds: int = None) -> List[Dict[str, Any]]:
+    """
+    Lease up to limit due items to owner.
+
+    Pending items whose backoff has elapsed and leased items whose lease expired are
+    both claimable; every claim counts as an attempt.
+    """
+    collection = get_dial_queue_collection()
+    lease_seconds = lease_seconds or DIAL_QUEUE_LEASE_SECONDS
+    claimed = []
+    while len(claimed) < limit:
+        now = datetime.utcnow()
+        item = collection.find_one_and_update(
+            {
+                "$or": [
+                    {"state": "pending", "availableAt": {"$lte": now}},
+                    {"state": "leased", "leaseExpiresAt": {"$lt": now}},
+                ],
+                "$expr": {"$lt": ["$attempts", "$maxAttempts"]},
+            },
+            {
+                "$set": {
+                    "state": "leased",
+                    "leaseOwner": owner,
+                    "leaseExpiresAt": now + timedelta(seconds=lease_seconds),
+                    "updatedAt": now,
+                },
+                "$inc": {"attempts": 1},
+            },
+            sort=[("availableAt", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+        if not item:
+            break
+        claimed.append(item)
+    return claimed
+
+
+def _settle_prospects(items: List[Dict[str, Any]], status: str):
+    """
+    Move the prospects of dialed or dead-lettered items out of the scheduled calls job
+
+    Args:
+        items (list): Dial queue items (phoneNumber and campaignId are used)
+        status (str): Status for prospects still "new", e.g. "contacted" or "error"
+    """
+    operations = [
+        UpdateOne(
+            {"phoneNumber": item["phoneNumber"], "campaignId": item.get("campaignId", ""), "status": "new"},
+            {"$set": {"status": status}, "$unset": {"scheduledClaim": ""}}
+        )
+        for item in items if item.get("phoneNumber")
+    ]
+    if not operations:
+        return
+    try:
+        get_prospects_collection().bulk_write(operations, ordered=False)
+    except BulkWriteError as bwe:
+        logger.error(f"Error settling prospects of dial queue items: {bwe.details.get('writeErrors')}")
+
+
+def _settle_items(collection, item_ids: List[Any], state: str, status: str):
+    """Settle the prospects of the items of item_ids that are now in state"""
+    items = list(collection.find({"_id": {"$in": item_ids}, "state": state}, {"phoneNumber": 1, "campaignId": 1}))
+    _settle_prospects(items, status)
+
+
+def complete_items(item_ids: List[Any], owner: str, batch_id: str = None):
+    """Mark leased items as dialed"""
+    if not item_ids:
+        return
+    now = datetime.utcnow()
+    collection = get_dial_queue_collection()
+    collection.update_many(
+        {"_id": {"$in": item_ids}, "leaseOwner": owner},
+        {"$set": {
+            "state": "done",
+            "active": False,
+            "batchId": batch_id,
+            "leaseOwner": None,
+            "leaseExpiresAt": None,
+            "completedAt": now,
+            "updatedAt": now,
+        }}
+    )
+    # Usually already contacted by the batch bookkeeping
+    _settle_items(collection, item_ids, "done", "contacted")
+
+
+def fail_items(item_ids: List[Any], owner: str, error: str):
+    """Return leased items to pending with exponential backoff, or dead-letter them"""
+    if not item_ids:
+        return
+    now = datetime.utcnow()
+    exhausted = {"$gte": ["$attempts", "$maxAttempts"]}
+    backoff_ms = {"$min": [
+        DIAL_QUEUE_MAX_BACKOFF_SECONDS * 1000,
+        {"$multiply": [DIAL_QUEUE_BACKOFF_SECONDS * 1000, {"$pow": [2, {"$subtract": ["$attempts", 1]}]}]},
+    ]}
+    collection = get_dial_queue_collection()
+    result = collection.update_many(
+        {"_id": {"$in": item_ids}, "leaseOwner": owner},
+        [{"$set": {
+            "state": {"$cond": [exhausted, "dead", "pending"]},
+            "active": {"$cond": [exhausted, False, True]},
+            "availableAt": {"$add": [{"$literal": now}, backoff_ms]},
+            "leaseOwner": None,
+            "leaseExpiresAt": None,
+            "lastError": {"$literal": error},
+            "updatedAt": {"$literal": now},
+        }}]
+    )
+    logger.warning(f"Dial queue: {result.modified_count} items failed ({error})")
+    _settle_items(collection, item_ids, "dead", "error")
+
+
+def dead_letter_expired() -> int:
+    """Dead-letter leased items whose lease expired after their last attempt"""
+    now = datetime.utcnow()
+    collection = get_dial_queue_collection()
+    expired = {
+        "state": "leased",
+        "leaseExpiresAt": {"$lt": now},
+        "$expr": {"$gte": ["$attempts", "$maxAttempts"]},
+    }
+    items = list(collection.find(expired, {"phoneNumber": 1, "campaignId": 1}))
+    if not items:
+        return 0
+    result = collection.update_many(
+        {**expired, "_id": {"$in": [item["_id"] for item in items]}},
+        {"$set": {
+            "state": "dead",
+            "active": False,
+            "lastError": "Lease expired on the last attempt",
+            "leaseOwner": None,
+            "leaseExpiresAt": None,
+            "updatedAt": now,
+        }}
+    )
+    if result.modified_count:
+        logger.warning(f"Dial queue: dead-lettered {result.modified_count} items with expired leases")
+    _settle_items(collection, [item["_id"] for item in items], "dead", "error")
+    return result.modified_count
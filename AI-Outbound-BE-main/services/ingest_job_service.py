@@ -0,0 +1,279 @@
+from config.database import get_ingest_jobs_collection, get_ingest_job_chunks_collection
+from services.prospect_ingest_service import ingest_prospects, INGEST_CHUNK_SIZE, SKIPPED_DETAILS_LIMIT
+from models.prospect import ProspectIn
+from pymongo import ReturnDocument
+from bson import ObjectId
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Optional
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# A job whose lease has expired is considered abandoned and can be resumed by any process
+JOB_LEASE_SECONDS = int(os.getenv("INGEST_JOB_LEASE_SECONDS", "120"))
+
+# Identifies this process as the owner of the jobs it runs
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+# Jobs currently running on a thread in this process
+_active_jobs = set()
+_active_jobs_lock = threading.Lock()
+
+
+def create_ingest_job(prospects: List[ProspectIn], context: Dict[str, Any], skipped_prospects: List[Dict[str, str]] = None, chunk_size: int = None) -> str:
+    """
+    Persist an upload as a background ingest job.
+
+    The validated rows are stored in fixed-size chunk documents so the job can be
+    resumed from the last committed chunk after a restart. Skipped rows are counted,
+    and only the first SKIPPED_DETAILS_LIMIT are kept on the job document so a dirty
+    upload cannot grow it past the document size limit.
+
+    Returns:
+        str: The job id
+    """
+    jobs_collection = get_ingest_jobs_collection()
+    chunks_collection = get_ingest_job_chunks_collection()
+    chunk_size = chunk_size or INGEST_CHUNK_SIZE
+    skipped_prospects = skipped_prospects or []
+    now = datetime.utcnow()
+    total_chunks = (len(prospects) + chunk_size - 1) // chunk_size
+
+    job = {
+        "status": "queued",
+        "context": context,
+        "totalRows": len(prospects) + len(skipped_prospects),
+        "totalChunks": total_chunks,
+        "committedChunks": 0,
+        "rowsProcessed": len(skipped_prospects),
+        "rowsWritten": 0,
+        "inserted": 0,
+        "updated": 0,
+        "skippedCount": len(skipped_prospects),
+        "skippedProspects": skipped_prospects[:SKIPPED_DETAILS_LIMIT],
+        "processingSeconds": 0,
+        "owner": None,
+        "leaseExpiresAt": None,
+        "error": None,
+        "createdAt": now,
+        "updatedAt": now,
+        "completedAt": None,
+    }
+    job_id = jobs_collection.insert_one(job).inserted_id
+
+    chunk_documents = [
+        {
+            "jobId": job_id,
+            "chunkIndex": chunk_index,
+            "prospects": [prospect.model_dump(mode="json") for prospect in prospects[start:start + chunk_size]],
+        }
+        for chunk_index, start in enumerate(range(0, len(prospects), chunk_size))
+    ]
+    if chunk_documents:
+        chunks_collection.insert_many(chunk_documents, ordered=False)
+
+    logger.info(f"Created ingest job {job_id} with {len(prospects)} prospects in {total_chunks} chunks")
+    return str(job_id)
+
+
+def _claim_job(job_id: ObjectId) -> Optional[Dict[str, Any]]:
+    """Take the lease on a job unless another live process holds it"""
+    now = datetime.utcnow()
+    return get_ingest_jobs_collection().find_one_and_update(
+        {
+            "_id": job_id,
+            "status": {"$in": ["queued", "running"]},
+            "$or": [
+                {"owner": None},
+                {"owner": WORKER_ID},
+                {"leaseExpiresAt": {"$lt": now}},
+            ],
+        },
+        {
+            "$set": {
+                "status": "running",
+                "owner": WORKER_ID,
+                "leaseExpiresAt": now + timedelta(seconds=JOB_LEASE_SECONDS),
+                "updatedAt": now,
+            },
+            # startedAt is only set the first time the job is claimed
+            "$min": {"startedAt": now},
+        },
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+def run_ingest_job(job_id: str):
+    """Write the job's remaining chunks, committing progress after each one"""
+    jobs_collection = get_ingest_jobs_collection()
+    chunks_collection = get_ingest_job_chunks_collection()
+    job_object_id = ObjectId(job_id)
+
+    job = _claim_job(job_object_id)
+    if not job:
+        logger.info(f"Ingest job {job_id} is finished or owned by another process")
+        return
+
+    context = job["context"]
+    try:
+        for chunk_index in range(job["committedChunks"], job["totalChunks"]):
+            chunk = chunks_collection.find_one({"jobId": job_object_id, "chunkIndex": chunk_index})
+            if not chunk:
+                logger.warning(f"Ingest job {job_id} is missing chunk {chunk_index}, skipping it")
+                continue
+
+            started = time.perf_counter()
+            prospects = [ProspectIn(**prospect) for prospect in chunk["prospects"]]
+            result = ingest_prospects(
+                prospects,
+                context.get("scheduled_call_date"),
+                context.get("campaign_name"),
+                context.get("campaign_id"),
+                context.get("scheduled_call_time"),
+            )
+            now = datetime.utcnow()
+            skipped = result.get("skipped_prospects", {}).get("details", [])
+
+            # Commit the chunk - upserts are idempotent, so a chunk replayed after a crash is safe
+            committed = jobs_collection.update_one(
+                {"_id": job_object_id, "owner": WORKER_ID},
+                {
+                    "$set": {
+                        "committedChunks": chunk_index + 1,
+                        "leaseExpiresAt": now + timedelta(seconds=JOB_LEASE_SECONDS),
+                        "updatedAt": now,
+                    },
+                    "$inc": {
+                        "rowsProcessed": len(prospects),
+                        "rowsWritten": len(prospects),
+                        "inserted": result["inserted"],
+                        "updated": result["updated"],
+                        "processingSeconds": time.perf_counter() - started,
+                        "skippedCount": result["skipped"],
+                    },
+                    "$push": {
+                        "skippedProspects": {"$each": skipped, "$slice": SKIPPED_DETAILS_LIMIT}
+                    },
+                },
+            )
+            if committed.matched_count == 0:
+                logger.warning(f"Lost the lease on ingest job {job_id}, stopping")
+                return
+            chunks_collection.delete_one({"_id": chunk["_id"]})
+
+        jobs_collection.update_one(
+            {"_id": job_object_id, "owner": WORKER_ID},
+            {"$set": {
+                "status": "completed",
+                "owner": None,
+                "leaseExpiresAt": None,
+                "completedAt": datetime.utcnow(),
+                "updatedAt": datetime.utcnow(),
+            }}
+        )
+        logger.info(f"Ingest job {job_id} completed")
+    except Exception as e:
+        logger.error(f"Error running ingest job {job_id}: {str(e)}")
+        jobs_collection.update_one(
+            {"_id": job_object_id, "owner": WORKER_ID},
+            {"$set": {
+                "status": "failed",
+                "owner": None,
+                "leaseExpiresAt": None,
+                "error": str(e),
+                "updatedAt": datetime.utcnow(),
+            }}
+        )
+
+
+def _run_tracked_job(job_id: str):
+    try:
+        run_ingest_job(job_id)
+    finally:
+        with _active_jobs_lock:
+            _active_jobs.discard(job_id)
+
+
+def start_ingest_job(job_id: str):
+    """Run an ingest job on a background thread unless it is already running here"""
+    with _active_jobs_lock:
+        if job_id in _active_jobs:
+            return None
+        _active_jobs.add(job_id)
+    thread = threading.Thread(target=_run_tracked_job, args=(job_id,), daemon=True)
+    thread.start()
+    return thread
+
+
+def resume_ingest_jobs():
+    """Restart queued jobs and jobs whose owner stopped renewing its lease"""
+    try:
+        jobs = get_ingest_jobs_collection().find(
+            {
+                "status": {"$in": ["queued", "running"]},
+                "$or": [
+                    {"owner": None},
+                    {"owner": WORKER_ID},
+                    {"leaseExpiresAt": {"$lt": datetime.utcnow()}},
+                ],
+            },
+            {"_id": 1}
+        )
+        for job in jobs:
+            logger.info(f"Resuming ingest job {job['_id']}")
+            start_ingest_job(str(job["_id"]))
+    except Exception as e:
+        logger.error(f"Error resuming ingest jobs: {str(e)}")
+
+
+def get_ingest_job_status(job_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Get progress of an ingest job
+
+    Returns:
+        dict: Rows processed, skipped details, throughput and ETA, or None if not found
+    """
+    job = get_ingest_jobs_collection().find_one({"_id": ObjectId(job_id)})
+    if not job:
+        return None
+
+    processing_seconds = job.get("processingSeconds", 0)
+    rows_per_second = round(job.get("rowsWritten", 0) / processing_seconds, 2) if processing_seconds > 0 else None
+    remaining_rows = max(job["totalRows"] - job["rowsProcessed"], 0)
+    if job["status"] == "completed":
+        eta_seconds = 0
+    elif rows_per_second:
+        eta_seconds = round(remaining_rows / rows_per_second, 1)
+    else:
+        eta_seconds = None
+
+    skipped_prospects = job.get("skippedProspects", [])
+    skipped_count = job.get("skippedCount", len(skipped_prospects))
+    return {
+        "jobId": str(job["_id"]),
+        "status": job["status"],
+        "totalRows": job["totalRows"],
+        "rowsProcessed": job["rowsProcessed"],
+        "inserted": job["inserted"],
+        "updated": job["updated"],
+        "committedChunks": job["committedChunks"],
+        "totalChunks": job["totalChunks"],
+        "rows_per_second": rows_per_second,
+        "eta_seconds": eta_seconds,
+        "skipped_prospects": {
+            "count": skipped_count,
+            "details": skipped_prospects,
+            "truncated": skipped_count > len(skipped_prospects),
+        },
+        "error": job.get("error"),
+        "createdAt": job["createdAt"].isoformat() + "Z",
+        "startedAt": job["startedAt"].isoformat() + "Z" if job.get("startedAt") else None,
+        "completedAt": job["completedAt"].isoformat() + "Z" if job.get("completedAt") else None,
+    }
@@ -281,7 +281,7 @@ async def schedule_appointment(date, time, phone_number=None, meeting_type="defa
             
             logger.info(f"Attempting to retrieve users from campaign_id: {campaign_id}")
             # Get the campaign by ID
-            campaign = get_campaign_by_id(ObjectId(campaign_id))
+            campaign = await get_campaign_by_id(ObjectId(campaign_id))
             logger.info(f"Campaign data retrieved: {campaign}")
             
             if campaign and campaign.get("users"):
@@ -353,7 +353,7 @@ async def schedule_appointment(date, time, phone_number=None, meeting_type="defa
             if phone_number:
                 from services.prospect_service import update_prospect_appointment
                 
-                appointment_update = update_prospect_appointment(
+                appointment_update = await update_prospect_appointment(
                     phone_number=phone_number,
                     campaign_id=campaign_id,
                     appointment_interest=True,
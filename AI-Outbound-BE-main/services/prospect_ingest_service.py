@@ -0,0 +1,572 @@
+from config.database import get_prospects_collection, get_campaign_users_collection, get_upload_progress_collection
+from models.prospect import ProspectIn
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from bson import ObjectId
+from collections import deque
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, AsyncIterator, Optional, Tuple
+import asyncio
+import codecs
+import csv
+import json
+import logging
+import os
+import time
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+from utils.phone import format_phone_number, phone_timezone
+from utils.timezone import get_brisbane_now, get_brisbane_datetime_iso, scheduled_at_utc, call_window_utc
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Number of upserts sent to MongoDB in a single bulk_write call
+INGEST_CHUNK_SIZE = int(os.getenv("PROSPECT_INGEST_CHUNK_SIZE", "1000"))
+
+# Skipped rows kept with their reason for large uploads; the rest are only counted
+SKIPPED_DETAILS_LIMIT = int(os.getenv("PROSPECT_SKIPPED_DETAILS_LIMIT", "1000"))
+
+# Rows validated and written together by the streaming upload
+STREAM_CHUNK_SIZE = int(os.getenv("PROSPECT_STREAM_CHUNK_SIZE", "500"))
+
+# How long the progress of a streaming upload can be polled after its last chunk
+UPLOAD_PROGRESS_TTL_HOURS = int(os.getenv("UPLOAD_PROGRESS_TTL_HOURS", "24"))
+
+
+def get_campaign_upload_context(campaign_id: str = None, campaign_name: str = None, scheduled_call_date: str = None, scheduled_call_time: str = None, owner_name: str = None) -> Dict[str, Any]:
+    """
+    Resolve the campaign name and schedule applied to every uploaded row.
+
+    When the campaign exists its stored name, date and time take precedence over
+    the values sent with the upload.
+    """
+    if campaign_id:
+        try:
+            campaign = get_campaign_users_collection().find_one({"_id": ObjectId(campaign_id)})
+            if campaign:
+                campaign_name = campaign.get('name', campaign_name)
+                scheduled_call_date = campaign.get('campaignDate', '')
+                scheduled_call_time = campaign.get('campaignTime', '')
+                logger.info(f"Retrieved campaign details - Name: {campaign_name}, Date: {scheduled_call_date}")
+        except Exception as ce:
+            # Continue with request data if campaign fetch fails
+            logger.error(f"Error fetching campaign details: {str(ce)}")
+
+    return {
+        "campaign_id": campaign_id or '',
+        "campaign_name": campaign_name or '',
+        "scheduled_call_date": scheduled_call_date or '',
+        "scheduled_call_time": scheduled_call_time or '',
+        "owner_name": owner_name or 'Unknown User',
+    }
+
+
+def _clean(value) -> str:
+    """Strip a CSV/JSON cell that may be missing or not a string"""
+    if value is None:
+        return ''
+    return str(value).strip()
+
+
+def normalize_prospect_row(row: Dict[str, Any], context: Dict[str, Any]) -> Tuple[Optional[ProspectIn], Optional[Dict[str, str]]]:
+    """
+    Validate one uploaded row and build its ProspectIn.
+
+    Returns:
+        tuple: (ProspectIn, None) for a valid row, (None, skipped detail) otherwise
+    """
+    name = _clean(row.get('name')) or None
+    try:
+        # Check if phone number exists and is not empty
+        raw_phone = _clean(row.get('phoneNumber'))
+        if not raw_phone:
+            return None, {'name': name or 'Unknown', 'reason': 'No phone number provided'}
+
+        # Format phone number to ensure it has + prefix
+        formatted_phone = format_phone_number(raw_phone)
+        if not formatted_phone or formatted_phone == '+':
+            return None, {'name': name or 'Unknown', 'reason': 'Invalid phone number format'}
+
+        prospect = ProspectIn(
+            name=name,
+            phoneNumber=formatted_phone,
+            businessName=_clean(row.get('businessName')),
+            email=_clean(row.get('email')),
+            ownerName=context["owner_name"],
+            campaignName=context["campaign_name"],
+            campaignId=context["campaign_id"],
+            scheduledCallDate=context["scheduled_call_date"],
+            scheduledCallTime=context["scheduled_call_time"]
+        )
+        return prospect, None
+    except Exception as e:
+        return None, {'name': name or 'Unknown', 'reason': f'Error: {str(e)}'}
+
+
+def _prospect_key(prospect: ProspectIn, campaign_id: str = None):
+    """Key used to dedupe prospects in memory and to match them in the database"""
+    return (prospect.phoneNumber, prospect.campaignId or campaign_id)
+
+
+def build_prospect_upsert(prospect: ProspectIn, scheduled_call_date: str, campaign_name: str, campaign_id: str = None, scheduled_call_time: str = None, current_time: str = None):
+    """
+    Build the upsert for a single prospect keyed on (phoneNumber, campaignId).
+
+    Fields in $set are reset on every upload (same as the previous update path),
+    fields in $setOnInsert are only written when the prospect is created.
+    """
+    current_time = current_time or get_brisbane_now().isoformat() + "Z"
+    prospect_campaign = prospect.campaignName if prospect.campaignName else campaign_name
+    prospect_campaign_id = prospect.campaignId if prospect.campaignId else campaign_id
+    scheduled_at = scheduled_at_utc(scheduled_call_date, scheduled_call_time)
+    # Local call hours from the phone number's area code
+    prospect_timezone = phone_timezone(prospect.phoneNumber)
+    call_window_start, call_window_end = call_window_utc(scheduled_at, prospect_timezone)
+
+    return UpdateOne(
+        {"phoneNumber": prospect.phoneNumber, "campaignId": prospect_campaign_id},
+        {
+            "$set": {
+                "campaignName": prospect_campaign,
+                "businessName": prospect.businessName,
+                "scheduledCallDate": scheduled_call_date,
+                "scheduledCallTime": scheduled_call_time,
+                "scheduledAt": scheduled_at,
+                # Indexed UTC window in which the scheduled calls job may dial the prospect
+                "timezone": prospect_timezone,
+                "callWindowStart": call_window_start,
+                "callWindowEnd": call_window_end,
+                "ownerName": prospect.ownerName,
+                "status": "new",
+                "retryCount": 0,
+                "callBackCount": 0,
+                "isCallBack": None,
+                "callBackDate": None,
+                "isEbook": None,
+                "updatedAt": {"$date": current_time},
+                "appointment": {
+                    "appointmentInterest": None,
+                    "appointmentDateTime": None,
+                },
+            },
+            "$setOnInsert": {
+                "name": prospect.name,
+                "email": None,
+                "isNewsletterSent": None,
+                "createdAt": {"$date": current_time},
+                "calls": [],
+            },
+            # A claim of the previous schedule would hold the prospect back until it expired, and a
+            # retry due from the previous call would be dialed before the new schedule
+            "$unset": {"scheduledClaim": "", "nextAttemptAt": ""},
+        },
+        upsert=True,
+    )
+
+
+def _write_chunk(collection, operations: List[UpdateOne]):
+    """
+    Send one chunk as an unordered bulk_write.
+
+    Returns a tuple of (upserted indexes, {index: error message}) relative to the chunk.
+    """
+    try:
+        result = collection.bulk_write(operations, ordered=False)
+        return set(result.upserted_ids.keys()), {}
+    except BulkWriteError as bwe:
+        # Unordered writes keep going after a failure, so report what did get applied
+        details = bwe.details or {}
+        upserted = {item["index"] for item in details.get("upserted", [])}
+        errors = {error["index"]: error.get("errmsg", "Write error") for error in details.get("writeErrors", [])}
+        logger.error(f"Bulk write finished with {len(errors)} errors")
+        return upserted, errors
+
+
+def ingest_prospects(prospects: List[ProspectIn], scheduled_call_date: str, campaign_name: str, campaign_id: str = None, scheduled_call_time: str = None, chunk_size: int = None) -> Dict[str, Any]:
+    """
+    Insert or update prospects using chunked, unordered bulk_write upserts.
+
+    Args:
+        prospects (list): ProspectIn objects to ingest
+        scheduled_call_date (str): Date the calls are scheduled for
+        campaign_name (str): Campaign name used when the prospect has none
+        campaign_id (str, optional): Campaign ID used when the prospect has none
+        scheduled_call_time (str, optional): Time the calls are scheduled for
+        chunk_size (int, optional): Number of upserts per bulk_write
+
+    Returns:
+        dict: Upload message, counts, per-row outcomes and rows per second
+    """
+    collection = get_prospects_collection()
+    chunk_size = chunk_size or INGEST_CHUNK_SIZE
+    current_time = get_brisbane_now().isoformat() + "Z"
+    started = time.perf_counter()
+
+    if not campaign_name:
+        campaign_name = "Default Campaign"
+    if not scheduled_call_date:
+        scheduled_call_date = None
+
+    logger.info(f"Ingesting {len(prospects)} prospects to campaign '{campaign_name}' (ID: {campaign_id}) in chunks of {chunk_size}")
+
+    # One outcome per input row, in input order
+    results = [
+        {"name": prospect.name or "Unknown", "phoneNumber": prospect.phoneNumber, "outcome": None}
+        for prospect in prospects
+    ]
+    skipped_prospects = []
+
+    # Prospects whose local call hours are over by the scheduled time are reported, the scheduled
+    # calls job never dials them
+    scheduled_at = scheduled_at_utc(scheduled_call_date, scheduled_call_time)
+    outside_call_hours = 0
+
+    # Dedupe the batch in memory - the first occurrence of a phone number wins
+    seen = set()
+    row_indexes = []
+    operations = []
+    for row_index, prospect in enumerate(prospects):
+        key = _prospect_key(prospect, campaign_id)
+        if key in seen:
+            results[row_index]["outcome"] = "skipped"
+            skipped_prospects.append({
+                "name": prospect.name or "Unknown",
+                "reason": "Duplicate phone number in upload"
+            })
+            continue
+        seen.add(key)
+        call_window_start, call_window_end = call_window_utc(scheduled_at, phone_timezone(prospect.phoneNumber))
+        if scheduled_at and call_window_start >= call_window_end:
+            outside_call_hours += 1
+        row_indexes.append(row_index)
+        operations.append(build_prospect_upsert(prospect, scheduled_call_date, campaign_name, campaign_id, scheduled_call_time, current_time))
+
+    for start in range(0, len(operations), chunk_size):
+        chunk = operations[start:start + chunk_size]
+        upserted, errors = _write_chunk(collection, chunk)
+        for chunk_index in range(len(chunk)):
+            row_index = row_indexes[start + chunk_index]
+            if chunk_index in errors:
+                results[row_index]["outcome"] = "skipped"
+                skipped_prospects.append({
+                    "name": results[row_index]["name"],
+                    "reason": f"Error: {errors[chunk_index]}"
+                })
+            elif chunk_index in upserted:
+                results[row_index]["outcome"] = "inserted"
+            else:
+                results[row_index]["outcome"] = "updated"
+
+    elapsed = time.perf_counter() - started
+    rows_per_second = round(len(prospects) / elapsed, 2) if elapsed > 0 else float(len(prospects))
+    inserted = sum(1 for row in results if row["outcome"] == "inserted")
+    updated = sum(1 for row in results if row["outcome"] == "updated")
+
+    logger.info(f"Ingested {len(prospects)} prospects in {elapsed:.2f}s ({rows_per_second} rows/s): "
+                f"{inserted} inserted, {updated} updated, {len(skipped_prospects)} skipped")
+
+    response = {
+        "message": "Prospects Added successfully",
+        "inserted": inserted,
+        "updated": updated,
+        "skipped": len(skipped_prospects),
+        "rows_per_second": rows_per_second,
+        "results": results,
+    }
+    if outside_call_hours:
+        logger.warning(f"{outside_call_hours} prospects are scheduled after their local call hours and will not be called")
+        response["outside_call_hours"] = outside_call_hours
+    if skipped_prospects:
+        response["skipped_prospects"] = {
+            "count": len(skipped_prospects),
+            "details": skipped_prospects
+        }
+    return response
+
+
+async def _iter_lines(byte_chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Decode a byte stream incrementally and yield it line by line"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    buffer = ""
+    async for chunk in byte_chunks:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer.rstrip("\r")
+
+
+class MultipartFileStream:
+    """
+    Reads one file field of a multipart/form-data body while the body streams in.
+
+    request.form() spools the whole body before it returns; this feeds the request
+    stream to the multipart parser block by block instead, so only the blocks not
+    consumed yet are held in memory.
+
+        upload = MultipartFileStream(request.stream(), content_type)
+        if await upload.open():  # reads up to the headers of the file field
+            async for block in upload.chunks():
+                ...
+    """
+
+    def __init__(self, byte_chunks: AsyncIterator[bytes], content_type: str, field_name: str = "file"):
+        _, options = parse_options_header(content_type)
+        boundary = options.get(b"boundary")
+        if not boundary:
+            raise ValueError("Missing multipart boundary")
+        self.field_name = field_name.encode()
+        self.filename = ""
+        self.content_type = ""
+        self._source = byte_chunks.__aiter__()
+        self._blocks = deque()
+        self._in_file = False
+        self._file_started = False
+        self._file_done = False
+        self._headers = {}
+        self._header_field = bytearray()
+        self._header_value = bytearray()
+        self._parser = MultipartParser(boundary.strip(b'"'), callbacks={
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": lambda data, start, end: self._header_field.extend(data[start:end]),
+            "on_header_value": lambda data, start, end: self._header_value.extend(data[start:end]),
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        })
+
+    def _on_part_begin(self):
+        self._headers = {}
+
+    def _on_header_end(self):
+        self._headers[bytes(self._header_field).lower()] = bytes(self._header_value)
+        self._header_field.clear()
+        self._header_value.clear()
+
+    def _on_headers_finished(self):
+        _, disposition = parse_options_header(self._headers.get(b"content-disposition", b""))
+        if disposition.get(b"name") == self.field_name and not self._file_started:
+            self._in_file = self._file_started = True
+            self.filename = disposition.get(b"filename", b"").decode("utf-8", "replace")
+            self.content_type = self._headers.get(b"content-type", b"").decode("latin-1")
+
+    def _on_part_data(self, data, start: int, end: int):
+        if self._in_file:
+            self._blocks.append(bytes(data[start:end]))
+
+    def _on_part_end(self):
+        if self._in_file:
+            self._in_file = False
+            self._file_done = True
+
+    async def _feed(self) -> bool:
+        """Parse the next block of the body, returns False once the body has ended"""
+        try:
+            block = await self._source.__anext__()
+        except StopAsyncIteration:
+            self._parser.finalize()
+            return False
+        if block:
+            self._parser.write(block)
+        return True
+
+    async def open(self) -> bool:
+        """Read up to the headers of the file field, returns False if the body has none"""
+        while not self._file_started:
+            if not await self._feed():
+                return False
+        return True
+
+    async def chunks(self) -> AsyncIterator[bytes]:
+        """The file's content block by block; the body after the file is not read"""
+        while True:
+            while self._blocks:
+                yield self._blocks.popleft()
+            if self._file_done or not await self._feed():
+                return
+
+
+async def _iter_csv_rows(lines: AsyncIterator[str]):
+    headers = None
+    pending = ""
+    async for line in lines:
+        record = f"{pending}\n{line}" if pending else line
+        # An odd number of quotes means a quoted field continues on the next line
+        if record.count('"') % 2:
+            pending = record
+            continue
+        pending = ""
+        if not record.strip():
+            continue
+        try:
+            values = next(csv.reader([record]))
+        except csv.Error as e:
+            yield None, f"Error: Invalid CSV row ({str(e)})"
+            continue
+        if headers is None:
+            headers = [header.strip() for header in values]
+            continue
+        yield dict(zip(headers, values)), None
+    if pending:
+        yield None, "Error: Unterminated quoted field"
+
+
+async def _iter_ndjson_rows(lines: AsyncIterator[str]):
+    async for line in lines:
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield None, f"Error: Invalid JSON line ({str(e)})"
+            continue
+        if not isinstance(row, dict):
+            yield None, "Error: JSON line is not an object"
+            continue
+        yield row, None
+
+
+def iter_upload_rows(byte_chunks: AsyncIterator[bytes], upload_format: str):
+    """
+    Parse an uploaded CSV (with header row) or NDJSON body as it streams in.
+
+    Yields (row dict, parse error) tuples so bad lines can be reported as skipped.
+    """
+    lines = _iter_lines(byte_chunks)
+    if upload_format == "ndjson":
+        return _iter_ndjson_rows(lines)
+    return _iter_csv_rows(lines)
+
+
+def _set_upload_progress(upload_id: str, progress: Dict[str, Any]):
+    """Store the progress in upload_progress, so any worker can answer a poll"""
+    expires_at = datetime.utcnow() + timedelta(hours=UPLOAD_PROGRESS_TTL_HOURS)
+    get_upload_progress_collection().replace_one(
+        {"_id": upload_id},
+        {**progress, "expiresAt": expires_at},
+        upsert=True
+    )
+
+
+def get_upload_progress(upload_id: str) -> Optional[Dict[str, Any]]:
+    """Return the latest per-chunk progress of a streaming upload"""
+    return get_upload_progress_collection().find_one({"_id": upload_id}, {"_id": 0, "expiresAt": 0})
+
+
+async def ingest_prospect_stream(rows: AsyncIterator[Tuple[Optional[Dict[str, Any]], Optional[str]]], context: Dict[str, Any], upload_id: str, chunk_size: int = None) -> Dict[str, Any]:
+    """
+    Validate and write prospects as they arrive, one fixed-size chunk at a time.
+
+    Only the current chunk is held in memory; each chunk is normalized, handed to
+    ingest_prospects in a worker thread and then dropped. The (phoneNumber,
+    campaignId) keys seen so far are kept for the whole upload, so a repeated
+    phone number is skipped as a duplicate even when it lands in a later chunk;
+    the first row wins, as in ingest_prospects.
+
+    Args:
+        rows: Async iterator of (row dict, parse error) tuples
+        context (dict): Campaign context from get_campaign_upload_context
+        upload_id (str): Key of the progress document in upload_progress
+        chunk_size (int, optional): Rows per chunk
+
+    Returns:
+        dict: Totals for the whole upload
+    """
+    chunk_size = chunk_size or STREAM_CHUNK_SIZE
+    started = time.perf_counter()
+    progress = {
+        "uploadId": upload_id,
+        "status": "running",
+        "rowsReceived": 0,
+        "chunksProcessed": 0,
+        "inserted": 0,
+        "updated": 0,
+        "skipped": 0,
+        "rowsPerSecond": 0,
+        "startedAt": get_brisbane_datetime_iso(),
+        "updatedAt": get_brisbane_datetime_iso(),
+    }
+    # Only the first SKIPPED_DETAILS_LIMIT skipped rows are kept, the rest are counted
+    skipped_prospects = []
+    # Prospect keys already written or queued in this upload
+    seen_keys = set()
+    await asyncio.to_thread(_set_upload_progress, upload_id, dict(progress))
+
+    def skip(details: List[Dict[str, str]]):
+        progress["skipped"] += len(details)
+        skipped_prospects.extend(details[:max(SKIPPED_DETAILS_LIMIT - len(skipped_prospects), 0)])
+
+    async def flush(chunk: List[ProspectIn]):
+        if chunk:
+            result = await asyncio.to_thread(
+                ingest_prospects,
+                chunk,
+                context["scheduled_call_date"],
+                context["campaign_name"],
+                context["campaign_id"],
+                context["scheduled_call_time"],
+            )
+            progress["inserted"] += result["inserted"]
+            progress["updated"] += result["updated"]
+            skip(result.get("skipped_prospects", {}).get("details", []))
+        progress["chunksProcessed"] += 1
+        elapsed = time.perf_counter() - started
+        progress["rowsPerSecond"] = round(progress["rowsReceived"] / elapsed, 2) if elapsed > 0 else 0
+        progress["updatedAt"] = get_brisbane_datetime_iso()
+        await asyncio.to_thread(_set_upload_progress, upload_id, dict(progress))
+
+    try:
+        chunk = []
+        pending_rows = 0
+        async for row, error in rows:
+            progress["rowsReceived"] += 1
+            pending_rows += 1
+            if error:
+                skip([{'name': 'Unknown', 'reason': error}])
+            else:
+                prospect, skipped = normalize_prospect_row(row, context)
+                key = _prospect_key(prospect, context["campaign_id"]) if prospect else None
+                if skipped:
+                    skip([skipped])
+                elif key in seen_keys:
+                    skip([{'name': prospect.name or 'Unknown', 'reason': 'Duplicate phone number in upload'}])
+                else:
+                    seen_keys.add(key)
+                    chunk.append(prospect)
+            if pending_rows >= chunk_size:
+                await flush(chunk)
+                chunk = []
+                pending_rows = 0
+        if pending_rows:
+            await flush(chunk)
+    except Exception:
+        progress["status"] = "failed"
+        await asyncio.to_thread(_set_upload_progress, upload_id, dict(progress))
+        raise
+
+    progress["status"] = "completed"
+    await asyncio.to_thread(_set_upload_progress, upload_id, dict(progress))
+    logger.info(f"Streaming upload {upload_id} finished: {progress}")
+
+    response = {
+        "message": "Prospects Added successfully",
+        "uploadId": upload_id,
+        "inserted": progress["inserted"],
+        "updated": progress["updated"],
+        "skipped": progress["skipped"],
+        "rows_per_second": progress["rowsPerSecond"],
+    }
+    if progress["skipped"]:
+        response["skipped_prospects"] = {
+            "count": progress["skipped"],
+            "details": skipped_prospects,
+            "truncated": progress["skipped"] > len(skipped_prospects),
+        }
+    return response
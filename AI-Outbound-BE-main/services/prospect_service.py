@@ -1,480 +1,253 @@
 from config.database import get_prospects_collection
+from config.async_database import get_async_prospects_collection
 from models.prospect import ProspectIn
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
 from datetime import datetime, timedelta
 import logging
 from models.token_model import TokenStore
 from bson import ObjectId
 from utils.timezone import get_brisbane_now
+from utils.transcript_classifier import classify_appointment_type
+from services.prospect_ingest_service import ingest_prospects
+from services.audit_log_service import audit_log_entry, record_audit_logs_async
+from services.retry_policy import next_attempt_expression
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 def upload_prospects_service(prospects: List[ProspectIn], scheduled_call_date: str, campaign_name: str, campaign_id: str = None,scheduled_call_time: str = None):
-    prospects_collection = get_prospects_collection()
-    current_time = get_brisbane_now().isoformat() + "Z"
-    
-    # Set defaults for empty values
-    if not campaign_name:
-        campaign_name = "Default Campaign"
-    
-    # Ensure scheduled_call_date is properly formatted or None
-    if not scheduled_call_date:
-        scheduled_call_date = None
-    
-    logger.info(f"Uploading {len(prospects)} prospects to campaign '{campaign_name}' (ID: {campaign_id})")
-    
-    for prospect in prospects:
-        # Debug logging for each prospect
-        prospect_name = prospect.name or "Unknown"
-        logger.info(f"Processing prospect: {prospect_name}, phone: {prospect.phoneNumber}, " +
-                   f"campaign: {prospect.campaignName or campaign_name}, " +
-                   f"campaignId: {prospect.campaignId or campaign_id}, " +
-                   f"owner: {prospect.ownerName}")
-        
-        # Use prospect's campaign name/id if available, otherwise use the parameter
-        prospect_campaign = prospect.campaignName if prospect.campaignName else campaign_name
-        prospect_campaign_id = prospect.campaignId if prospect.campaignId else campaign_id
-    
-        existing_prospect = prospects_collection.find_one({"phoneNumber": prospect.phoneNumber,"campaignName": prospect.campaignName})
-        
-        if existing_prospect:
-            logger.info(f"Updating existing prospect {prospect.phoneNumber} with campaign: {prospect.campaignName} (ID: {prospect.campaignId})")
-            prospects_collection.update_one(
-                {"phoneNumber": prospect.phoneNumber, "campaignName": prospect.campaignName},
-                {
-                        "$set": {
-                            "campaignName": prospect_campaign,
-                            "campaignId": prospect_campaign_id,
-                            "businessName": prospect.businessName,
-                            "scheduledCallDate": scheduled_call_date,
-                            "scheduledCallTime": scheduled_call_time,
-                            "ownerName": prospect.ownerName,
-                            "status": "new",
-                            "retryCount": 0,
-                            "callBackCount": 0,
-                            "isCallBack": None,
-                            "callBackDate": None,
-                            "isEbook": None,
-                            "updatedAt": {"$date": current_time},
-                            "appointment": {
-                                "appointmentInterest": None,
-                                "appointmentDateTime": None,
-                            },
-                        }
-                    }
-                )
-            continue
-            # else:
-            #     # If the phone number exists but with a different campaign, log this but we'll try to handle it differently
-            #     logger.info(f"Prospect with phone {prospect.phoneNumber} exists but in a different campaign. Current prospect's campaign: {prospect_campaign}, existing campaign: {existing_prospect.get('campaignName')}")
-            #     # We'll attempt to modify the document with campaign info below
-            #     try:
-            #         # Update the existing document with new campaign info
-            #         # This keeps the same prospect but changes their campaign
-            #         prospects_collection.update_one(
-            #             {"phoneNumber": prospect.phoneNumber},
-            #             {
-            #                 "$set": {
-            #                     "campaignName": prospect_campaign,
-            #                     "campaignId": prospect_campaign_id,
-            #                     "businessName": prospect.businessName,
-            #                     "scheduledCallDate": scheduled_call_date,
-            #                     "ownerName": prospect.ownerName,
-            #                     "status": "new",
-            #                     "retryCount": 0,
-            #                     "callBackCount": 0,
-            #                     "isCallBack": None,
-            #                     "callBackDate": None,
-            #                     "isEbook": None,
-            #                     "updatedAt": {"$date": current_time},
-            #                     "appointment": {
-            #                         "appointmentInterest": None,
-            #                         "appointmentDateTime": None,
-            #                     },
-            #                 }
-            #             }
-            #         )
-            #         continue
-            #     except Exception as e:
-            #         logger.error(f"Error updating prospect with new campaign: {str(e)}")
-            #         raise
+    """
+    Insert new prospects and reset existing ones for the campaign.
+
+    Prospects are written with chunked bulk upserts keyed on (phoneNumber, campaignId),
+    see services.prospect_ingest_service.ingest_prospects for the response shape.
+    """
+    return ingest_prospects(prospects, scheduled_call_date, campaign_name, campaign_id, scheduled_call_time)
+
+def detect_appointment_type(transcript: str, appointment_interest) -> str:
+    """Work out the requested appointment type ('selling' or 'advisory') from a call transcript"""
+    # Single pass over the transcript, see utils.transcript_classifier
+    return classify_appointment_type(transcript, appointment_interest)
 
-        else:
-            # Insert new prospect if no matching record exists
-            logger.info(f"Creating new prospect with phone: {prospect.phoneNumber}, campaign: {prospect_campaign}")
-            try:
-                result = prospects_collection.insert_one({
-                    "name": prospect.name,
-                    "phoneNumber": prospect.phoneNumber,
-                    "businessName": prospect.businessName,
-                    "ownerName": prospect.ownerName,
-                    "email": None,
-                    "status": "new",
-                    "retryCount": 0,
-                    "callBackCount": 0,
-                    "isCallBack": None,
-                    "callBackDate": None,
-                    "isEbook": None,
-                    "isNewsletterSent": None,
-                    "scheduledCallDate": scheduled_call_date,
-                    "scheduledCallTime": scheduled_call_time,
-                    "campaignName": prospect_campaign,
-                    "campaignId": prospect_campaign_id,
-                    "createdAt": {"$date": current_time},
-                    "updatedAt": {"$date": current_time},
-                    "appointment": {
-                        "appointmentInterest": None,
-                        "appointmentDateTime": None,
-                    },
-                    "calls": [],
-                    "auditLogs": [],
-                })
-                logger.info(f"Created new prospect with phone: {prospect.phoneNumber}, campaign: {prospect_campaign}")
-            except Exception as e:
-                logger.error(f"Error creating prospect: {str(e)}")
-                raise
-                
-    return {
-        "message": "Prospects Added successfully",
-    }
 
-async def update_prospect_call_info(webhook_data: Dict[Any, Any]):
-    """Update prospect information with call details from webhook - handles both individual and batch calls"""
+def _is_valid_date(value) -> bool:
+    """Whether value is a YYYY-MM-DD date string"""
+    if not value or not isinstance(value, str) or len(value) != 10:
+        return False
     try:
-        logger.info(f"Updating prospect call info for webhook data: {webhook_data}")
-        collection = get_prospects_collection()
-        call_data = webhook_data.get('call', {})
-        
-        # Extract required information from webhook data
-        call_status = call_data.get('call_status', 'unknown')
-        disconnection_reason = call_data.get('disconnection_reason')
-        
-        # Map call status to our internal status
-        if call_status == "error" and disconnection_reason:
-            mapped_status = disconnection_reason
-        else:
-            mapped_status = call_status
-            
-        call_info = {
-            "timestamp": datetime.fromtimestamp(call_data.get('start_timestamp', 0) / 1000).isoformat() + "Z",
-            "duration": call_data.get('duration_ms', 0) / 1000,
-            "status": mapped_status,
-            "recordingUrl": call_data.get('recording_url'),
-            "transcript": call_data.get('transcript'),
-            "callSummary": call_data.get('call_analysis', {}).get('custom_analysis_data', {}).get('call_summary_info')
-        }
+        datetime.strptime(value, '%Y-%m-%d')
+        return True
+    except ValueError:
+        return False
 
-        # Get the existing prospect data first
-        to_number = call_data.get('to_number', '')
-        call_id = call_data.get('call_id')
-        campaign_id = call_data.get('retell_llm_dynamic_variables', {}).get('campaign_id')
-        
-        # For batch calls, we need to find the prospect by phone number and campaign ID
-        # and look for a call entry with batchId (not callId)
-        existing_prospect = collection.find_one({
-            "phoneNumber": to_number,
-            "campaignId": campaign_id
-        })
-        
-        if not existing_prospect:
-            logger.warning(f"No prospect found for phone {to_number} in campaign {campaign_id}")
-            return {"message": "Prospect not found"}
-        
-        # Check if this is a batch call by looking for the most recent batch call entry
-        batch_call_entry = None
-        calls = existing_prospect.get('calls', [])
-        
-        # Find the most recent batch call entry (last one in the array)
-        for call_entry in reversed(calls):
-            if call_entry.get('batchId') and not call_entry.get('callId'):
-                batch_call_entry = call_entry
-                break
-        
-        if batch_call_entry:
-            # This is a batch call - we need to replace the batch entry with detailed call info
-            call_info.update({
-                "callId": call_id,
-                "batchId": batch_call_entry.get('batchId')
-            })
-            
-            logger.info(f"Found batch call entry: {batch_call_entry.get('batchId')} for prospect {to_number}")
-            
-            # Update the call entry by replacing the batch entry
-            update_result = collection.update_one(
-                {
-                    "phoneNumber": to_number,
-                    "campaignId": campaign_id,
-                    "calls.batchId": batch_call_entry.get('batchId')
-                },
-                {
-                    "$set": {"calls.$": call_info}
-                }
-            )
-            
-            if update_result.modified_count > 0:
-                logger.info(f"Successfully updated batch call entry for prospect {to_number} with call details")
-            else:
-                logger.warning(f"Failed to update batch call entry for prospect {to_number}")
-                # Fallback: try to add the call directly
-                collection.update_one(
-                    {"phoneNumber": to_number, "campaignId": campaign_id},
-                    {"$push": {"calls": call_info}}
-                )
-                logger.info(f"Added call directly to prospect {to_number}")
-        else:
-            # This is an individual call - find by callId
-            existing_prospect = collection.find_one({
-                "phoneNumber": to_number,
-                "campaignId": campaign_id,
-                "calls.callId": call_id
-            })
-            
-            if not existing_prospect:
-                logger.warning(f"No call found with callId {call_id} for prospect {to_number}")
-                return {"message": "Call not found"}
 
-        # Handle appointment info
-        new_appointment_interest = call_data.get('call_analysis', {}).get('custom_analysis_data', {}).get('appointment_interest')
-        new_appointment_datetime = call_data.get('call_analysis', {}).get('custom_analysis_data', {}).get('appointment_date_time')
-        
-        # Extract appointment type from transcript
-        transcript = call_data.get('transcript', '').lower()
-        appointment_type = None
-        
-        # Check for appointment type in transcript with more variations
-        if any(phrase in transcript for phrase in ['selling appointment', 'sales appointment', 'book selling', 'book a selling', 
-                                                 'selling meeting', 'sales meeting', 'selling consultation']):
-            appointment_type = 'selling'
-        elif any(phrase in transcript for phrase in ['advisory appointment', 'sales advisory appointment', 'book advisory', 
-                                                   'book an advisory', 'advisory meeting', 'advisory consultation']):
-            appointment_type = 'advisory'
-        
-        # Check for agent questions about appointment type preferences
-        if appointment_type is None and new_appointment_interest is True:
-            # If agent asks about type preference and user responds with a preference
-            if ('would you prefer selling' in transcript or 'would you like selling' in transcript or 
-                'selling or advisory' in transcript or 'sales or advisory' in transcript):
-                # Look for user's response after the question
-                if 'selling' in transcript.split('selling or advisory')[-1]:
-                    appointment_type = 'selling'
-                elif 'advisory' in transcript.split('selling or advisory')[-1]:
-                    appointment_type = 'advisory'
-                elif 'sales' in transcript.split('sales or advisory')[-1]:
-                    appointment_type = 'selling'
-                else:
-                    # Default to selling if there's appointment interest but type is unclear
-                    appointment_type = 'selling'
-        
-        # If appointment type couldn't be determined but there's appointment interest, default to 'selling'
-        if appointment_type is None and new_appointment_interest is True:
-            appointment_type = 'selling'
-        
-        # Get existing appointment info
-        existing_appointment = existing_prospect.get('appointment', {})
-            
-        appointment_info = {
-            "appointmentInterest": new_appointment_interest if (existing_appointment.get('appointmentInterest') is None or existing_appointment.get('appointmentInterest') is False) else existing_appointment.get('appointmentInterest'),
-            "appointmentDateTime": new_appointment_datetime if (existing_appointment.get('appointmentInterest') is None or existing_appointment.get('appointmentInterest') is False) else existing_appointment.get('appointmentDateTime'),
-            "appointmentType": appointment_type if (existing_appointment.get('appointmentType') is None) else existing_appointment.get('appointmentType'),
-            "meetingLink": existing_appointment.get('meetingLink') if (existing_appointment.get('meetingLink') is not None) else None
-        }
+def _is_unset(field: str) -> Dict[str, Any]:
+    """Pipeline expression: field is missing, null or False"""
+    return {"$in": [{"$ifNull": [field, None]}, [None, False]]}
 
-        # Handle callback date
-        call_back_request = call_data.get('call_analysis', {}).get('custom_analysis_data', {}).get('call_back_request')
-        new_call_back_date = None
-        
-        # Get the callback date from analysis
-        analysis_callback_date = call_data.get('call_analysis', {}).get('custom_analysis_data', {}).get('call_back_date', '')
-
-        if call_back_request is True and analysis_callback_date:
-            # Validate if the date is in YYYY-MM-DD format
-            try:
-                datetime.strptime(analysis_callback_date, '%Y-%m-%d')
-                new_call_back_date = analysis_callback_date
-            except ValueError:
-                # If date format is invalid, set to tomorrow
-                new_call_back_date = (datetime.today() + timedelta(days=1)).strftime('%Y-%m-%d')
-        elif call_back_request is None:
-            # If call not picked up, set to tomorrow
-            new_call_back_date  = (datetime.today() + timedelta(days=1)).strftime('%Y-%m-%d')
-        elif call_back_request is False:
-            # If user explicitly doesn't want a callback
-            new_call_back_date = None
-
-        if existing_prospect:
-            existing_is_callback = existing_prospect.get('isCallBack')
-            existing_callback_date = existing_prospect.get('callBackDate')
-            
-            # Only update if current values are None/False or if we have a new valid callback request
-            if (existing_is_callback is None or existing_is_callback is False) or call_back_request is True:
-                call_back_date = new_call_back_date
-                is_callback = call_back_request
-            else:
-                call_back_date = existing_callback_date
-                is_callback = existing_is_callback
-        else:
-            call_back_date = new_call_back_date
-            is_callback = call_back_request
-
-        # Handle ebook
-        new_ebook = call_data.get('call_analysis', {}).get('custom_analysis_data', {}).get('ebook')
-        if existing_prospect:
-            existing_ebook = existing_prospect.get('isEbook')
-            is_ebook = new_ebook if (existing_ebook is None or existing_ebook is False) else existing_ebook
-        else:
-            is_ebook = new_ebook
 
-        # determine if the prospect is subscribed to the newsletter
-        is_newsletter_sent = call_data.get('call_analysis', {}).get('custom_analysis_data', {}).get('is_subscribe_to_news_letter')
-        email = call_data.get('call_analysis', {}).get('custom_analysis_data', {}).get('email')
-        
-        # Create audit log entry
-        audit_log = {
-            "actionType": "Call Completed",
-            "performedBy": "AI Agent",
-            "timestamp": {"$date": get_brisbane_now().isoformat() + "Z"},
-            "details": {
-                "callId": call_id,
-                "status": call_info['status'],   
-            }
-        }
+def _is_blank(field: str) -> Dict[str, Any]:
+    """Pipeline expression: field is missing, null or an empty string"""
+    return {"$in": [{"$ifNull": [field, None]}, [None, ""]]}
 
-        # Map call status to prospect status
-        call_status = call_data.get('call_status', 'unknown')
-        if call_status == "ended":
-            prospect_status = "picked_up"
-        elif call_status in ["busy", "no_answer", "voicemail"]:
-            prospect_status = "contacted"
-        else:
-            prospect_status = "error"
-            
-        # Create update dictionary for prospect-level fields
-        prospect_update_dict = {
-            "scheduledCallDate": new_call_back_date,
-            "email": email,
-            "status": prospect_status,
-            "isCallBack": is_callback,
-            "callBackDate": call_back_date,
-            "appointment": appointment_info,
-            "updatedAt": {"$date": get_brisbane_now().isoformat() + "Z"},
-            "isEbook": is_ebook,
-            "isNewsletterSent": is_newsletter_sent
-        }
 
-        # Only add retryCount reset and increment callBackCount if call_back_date is in YYYY-MM-DD format
-        if analysis_callback_date and isinstance(analysis_callback_date, str) and len(analysis_callback_date) == 10:
-            try:
-                datetime.strptime(analysis_callback_date, '%Y-%m-%d')
-                prospect_update_dict["retryCount"] = 1
-            except ValueError:
-                pass
-
-        if batch_call_entry:
-            # For batch calls, update the prospect and the call entry separately
-            # First update the prospect-level fields
-            collection.update_one(
-                {
-                    "phoneNumber": to_number,
-                    "campaignId": campaign_id
-                },
-                {
-                    "$set": prospect_update_dict,
-                    "$push": {"auditLogs": audit_log}
-                }
-            )
-            
-            # Then update the call entry with detailed call info
-            collection.update_one(
-                {
-                    "phoneNumber": to_number,
-                    "campaignId": campaign_id,
-                    "calls.batchId": batch_call_entry.get('batchId')
-                },
-                {
-                    "$set": {
-                        "calls.$.timestamp": call_info['timestamp'],
-                        "calls.$.duration": call_info['duration'],
-                        "calls.$.status": call_info['status'],
-                        "calls.$.recordingUrl": call_info['recordingUrl'],
-                        "calls.$.callSummary": call_info['callSummary'],
-                        "calls.$.transcript": call_info['transcript'],
-                        "calls.$.callId": call_id
-                    }
-                }
-            )
-            
-            # Increment callBackCount if needed
-            if analysis_callback_date and isinstance(analysis_callback_date, str) and len(analysis_callback_date) == 10:
-                try:
-                    datetime.strptime(analysis_callback_date, '%Y-%m-%d')
-                    collection.update_one(
-                        {
-                            "phoneNumber": to_number,
-                            "campaignId": campaign_id
-                        },
-                        {
-                            "$inc": {"callBackCount": 1}
-                        }
-                    )
-                except ValueError:
-                    pass
-                    
-        else:
-            # For individual calls, use the original logic
-            call_update_dict = {
-                "calls.$.timestamp": call_info['timestamp'],
-                "calls.$.duration": call_info['duration'],
-                "calls.$.status": call_info['status'], 
-                "calls.$.recordingUrl": call_info['recordingUrl'],
-                "calls.$.callSummary": call_info['callSummary'],
-                "calls.$.transcript": call_info['transcript']
-            }
-            
-            # Combine prospect and call updates
-            update_dict = {**prospect_update_dict, **call_update_dict}
-            update_dict["auditLogs.$[log].details.status"] = audit_log["details"]["status"]
-            
-            # Update the specific call record in the calls array and add audit log
-            result = collection.update_one(
-                {
-                    "phoneNumber": to_number,
-                    "calls.callId": call_id,
-                    "campaignId": campaign_id
-                },
-                {
-                    "$set": update_dict,
-                    "$push": {"auditLogs": audit_log}
-                },
-                array_filters=[
-                    {"log.details.callId": call_id}
-                ]
-            )
-            
-            # Increment callBackCount if needed
-            if analysis_callback_date and isinstance(analysis_callback_date, str) and len(analysis_callback_date) == 10:
-                try:
-                    datetime.strptime(analysis_callback_date, '%Y-%m-%d')
-                    collection.update_one(
-                        {
-                            "phoneNumber": to_number,
-                            "calls.callId": call_id,
-                            "campaignId": campaign_id
-                        },
-                        {
-                            "$inc": {"callBackCount": 1}
-                        }
-                    )
-                except ValueError:
-                    pass
-
-        logger.info(f"Successfully updated prospect call information for phone number: {to_number}")
-        return {"message": "Prospect call information updated successfully"}
+def _mapped_call_status(call_data: Dict[str, Any]) -> str:
+    """Map call status to our internal status"""
+    call_status = call_data.get('call_status', 'unknown')
+    disconnection_reason = call_data.get('disconnection_reason')
+    return disconnection_reason if call_status == "error" and disconnection_reason else call_status
+
+
+def build_call_analyzed_update(call_data: Dict[str, Any], now_iso: str = None) -> List[Dict[str, Any]]:
+    """
+    Build the aggregation-pipeline update that applies a call_analyzed event to its prospect.
+
+    The call result goes into the prospect's calls entry with this callId or, failing
+    that, into the most recent batch entry without a callId. The merge rules run on the
+    server against the current document:
+      - an existing appointmentInterest (and its date) is kept
+      - an existing appointmentType is kept
+      - an existing isEbook is kept
+      - the callback fields are only replaced when a callback was requested or none is set
+      - callBackCount is incremented and retryCount reset when a callback date was given
+      - nextAttemptAt is set from the retry policy, see services.retry_policy
+
+    Args:
+        call_data (dict): The "call" object of the webhook payload
+        now_iso (str, optional): Timestamp for updatedAt
+
+    Returns:
+        list: Pipeline stages for update_one
+    """
+    now_iso = now_iso or get_brisbane_now().isoformat() + "Z"
+    analysis = (call_data.get('call_analysis') or {}).get('custom_analysis_data') or {}
+    call_id = call_data.get('call_id')
+
+    call_status = call_data.get('call_status', 'unknown')
+    mapped_status = _mapped_call_status(call_data)
+
+    call_fields = {
+        "timestamp": datetime.fromtimestamp(call_data.get('start_timestamp', 0) / 1000).isoformat() + "Z",
+        "duration": call_data.get('duration_ms', 0) / 1000,
+        "status": mapped_status,
+        "recordingUrl": call_data.get('recording_url'),
+        # The transcript itself lives in call_transcripts, see services.transcript_service
+        "hasTranscript": bool(call_data.get('transcript')),
+        "callSummary": analysis.get('call_summary_info'),
+        "callId": call_id,
+    }
+
+    # Appointment info
+    new_appointment_interest = analysis.get('appointment_interest')
+    new_appointment_datetime = analysis.get('appointment_date_time')
+    appointment_type = detect_appointment_type(call_data.get('transcript'), new_appointment_interest)
+
+    # Callback date from analysis
+    call_back_request = analysis.get('call_back_request')
+    analysis_callback_date = analysis.get('call_back_date', '')
+    new_call_back_date = None
+    if call_back_request is True and analysis_callback_date:
+        # If date format is invalid, set to tomorrow
+        new_call_back_date = analysis_callback_date if _is_valid_date(analysis_callback_date) else (datetime.today() + timedelta(days=1)).strftime('%Y-%m-%d')
+    elif call_back_request is None:
+        # If call not picked up, set to tomorrow
+        new_call_back_date = (datetime.today() + timedelta(days=1)).strftime('%Y-%m-%d')
+
+    # Map call status to prospect status
+    if call_status == "ended":
+        prospect_status = "picked_up"
+    elif call_status in ["busy", "no_answer", "voicemail"]:
+        prospect_status = "contacted"
+    else:
+        prospect_status = "error"
+
+    # Index of the calls entry to fill in: the entry with this callId, else the last batch-only entry
+    locate_call = {
+        "_callIndex": {"$indexOfArray": [
+            {"$map": {"input": {"$ifNull": ["$calls", []]}, "as": "call", "in": "$$call.callId"}},
+            call_id
+        ]},
+        "_batchIndex": {"$reduce": {
+            "input": {"$range": [0, {"$size": {"$ifNull": ["$calls", []]}}]},
+            "initialValue": -1,
+            "in": {"$let": {
+                "vars": {"call": {"$arrayElemAt": ["$calls", "$$this"]}},
+                "in": {"$cond": [
+                    {"$and": [{"$not": [_is_blank("$$call.batchId")]}, _is_blank("$$call.callId")]},
+                    "$$this",
+                    "$$value"
+                ]}
+            }}
+        }},
+    }
+    target_index = {"$cond": [{"$gte": ["$_callIndex", 0]}, "$_callIndex", "$_batchIndex"]}
+
+    keep_new_interest = _is_unset("$appointment.appointmentInterest")
+    prospect_fields = {
+        "calls": {"$map": {
+            "input": {"$range": [0, {"$size": "$calls"}]},
+            "as": "index",
+            "in": {"$cond": [
+                {"$eq": ["$$index", target_index]},
+                {"$mergeObjects": [{"$arrayElemAt": ["$calls", "$$index"]}, {"$literal": call_fields}]},
+                {"$arrayElemAt": ["$calls", "$$index"]}
+            ]}
+        }},
+        "appointment": {
+            "appointmentInterest": {"$cond": [keep_new_interest, {"$literal": new_appointment_interest}, "$appointment.appointmentInterest"]},
+            "appointmentDateTime": {"$cond": [keep_new_interest, {"$literal": new_appointment_datetime}, {"$ifNull": ["$appointment.appointmentDateTime", None]}]},
+            "appointmentType": {"$cond": [
+                {"$eq": [{"$ifNull": ["$appointment.appointmentType", None]}, None]},
+                {"$literal": appointment_type},
+                "$appointment.appointmentType"
+            ]},
+            "meetingLink": {"$ifNull": ["$appointment.meetingLink", None]},
+        },
+        "isEbook": {"$cond": [_is_unset("$isEbook"), {"$literal": analysis.get('ebook')}, "$isEbook"]},
+        "scheduledCallDate": {"$literal": new_call_back_date},
+        # Keep the UTC due time in step with the Brisbane date and time fields
+        "scheduledAt": {"$dateFromString": {
+            "dateString": {"$concat": [
+                {"$literal": new_call_back_date},
+                "T",
+                {"$cond": [_is_blank("$scheduledCallTime"), "00:00", "$scheduledCallTime"]}
+            ]},
+            "format": "%Y-%m-%dT%H:%M",
+            "timezone": "Australia/Brisbane",
+            "onError": None,
+            "onNull": None,
+        }},
+        "email": {"$literal": analysis.get('email')},
+        "status": {"$literal": prospect_status},
+        "isNewsletterSent": {"$literal": analysis.get('is_subscribe_to_news_letter')},
+        "updatedAt": {"$literal": {"$date": now_iso}},
+    }
+
+    # Only update the callback fields if they are unset or a new callback was requested
+    if call_back_request is True:
+        prospect_fields["isCallBack"] = {"$literal": call_back_request}
+        prospect_fields["callBackDate"] = {"$literal": new_call_back_date}
+    else:
+        replace_callback = _is_unset("$isCallBack")
+        prospect_fields["isCallBack"] = {"$cond": [replace_callback, {"$literal": call_back_request}, "$isCallBack"]}
+        prospect_fields["callBackDate"] = {"$cond": [replace_callback, {"$literal": new_call_back_date}, {"$ifNull": ["$callBackDate", None]}]}
+
+    # Only reset retryCount and increment callBackCount if call_back_date is in YYYY-MM-DD format
+    if _is_valid_date(analysis_callback_date):
+        prospect_fields["retryCount"] = {"$literal": 1}
+        prospect_fields["callBackCount"] = {"$add": [{"$ifNull": ["$callBackCount", 0]}, 1]}
+
+    # Reads the retryCount and callBackCount written by the previous stage
+    next_attempt = next_attempt_expression(
+        call_status,
+        (call_data.get('retell_llm_dynamic_variables') or {}).get('campaign_id'),
+        disconnection_reason=call_data.get('disconnection_reason'),
+        callback_date=new_call_back_date if call_back_request is True else None,
+    )
+
+    return [
+        {"$set": locate_call},
+        {"$set": prospect_fields},
+        {"$set": {"nextAttemptAt": next_attempt}},
+        {"$unset": ["_callIndex", "_batchIndex"]},
+    ]
+
+
+def call_analyzed_operation(webhook_data: Dict[Any, Any]) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """
+    Filter and pipeline update that apply a call_analyzed webhook to its prospect
+
+    Returns:
+        tuple: (filter, update) for update_one or a bulk_write UpdateOne
+    """
+    call_data = webhook_data.get('call', {})
+    call_id = call_data.get('call_id')
+    campaign_id = (call_data.get('retell_llm_dynamic_variables') or {}).get('campaign_id')
+    prospect_filter = {
+        "phoneNumber": call_data.get('to_number', ''),
+        "campaignId": campaign_id,
+        # Only prospects that have a calls entry for this call to fill in
+        "$or": [
+            {"calls.callId": call_id},
+            {"calls": {"$elemMatch": {"batchId": {"$nin": [None, ""]}, "callId": {"$in": [None, ""]}}}},
+        ],
+    }
+    return prospect_filter, build_call_analyzed_update(call_data)
+
+
+def call_analyzed_audit_log(webhook_data: Dict[Any, Any]) -> Dict[str, Any]:
+    """Audit entry for a call_analyzed webhook, see services.audit_log_service"""
+    call_data = webhook_data.get('call', {})
+    call_id = call_data.get('call_id')
+    return audit_log_entry(
+        "Call Completed", "AI Agent",
+        {"callId": call_id, "status": _mapped_call_status(call_data)},
+        call_data.get('to_number', ''),
+        (call_data.get('retell_llm_dynamic_variables') or {}).get('campaign_id'),
+        entry_id=f"{call_id}:call_completed"
+    )
 
-    except Exception as e:
-        logger.error(f"Error updating prospect call information: {str(e)}")
-        raise
 
 def get_prospect_details_by_phone_number_and_campaign_id(phone_number: str, campaign_id: str = None):
     collection = get_prospects_collection()
@@ -485,7 +258,7 @@ def get_prospect_details_by_phone_number_and_campaign_id(phone_number: str, camp
     else:
         return {"message": "Prospect not found"}
 
-def get_prospects_by_campaign(campaign_name: str = None, campaign_id: str = None):
+async def get_prospects_by_campaign(campaign_name: str = None, campaign_id: str = None):
     """
     Get all prospects that belong to a specific campaign
     
@@ -497,7 +270,7 @@ def get_prospects_by_campaign(campaign_name: str = None, campaign_id: str = None
         dict: List of prospects and total count
     """
     try:
-        collection = get_prospects_collection()
+        collection = get_async_prospects_collection()
         
         # Build the query based on available parameters
         query = {}
@@ -508,8 +281,8 @@ def get_prospects_by_campaign(campaign_name: str = None, campaign_id: str = None
         else:
             raise ValueError("Either campaign_name or campaign_id must be provided")
         
-        # Find all prospects that have this campaign
-        prospects = list(collection.find(query))
+        # Find all prospects that have this campaign, without call transcripts
+        prospects = await collection.find(query, {"calls.transcript": 0}).to_list(None)
         
         # Convert ObjectId to string for JSON serialization
         for prospect in prospects:
@@ -527,7 +300,7 @@ def get_prospects_by_campaign(campaign_name: str = None, campaign_id: str = None
         logger.error(f"Error fetching prospects for campaign (name: {campaign_name}, id: {campaign_id}): {str(e)}")
         raise
 
-def get_prospect_by_phone_number(phone_number, campaign_id=None):
+async def get_prospect_by_phone_number(phone_number, campaign_id=None):
     """
     Get a prospect by phone number
     
@@ -538,14 +311,14 @@ def get_prospect_by_phone_number(phone_number, campaign_id=None):
     Returns:
         dict: The prospect document or None if not found
     """
-    collection = get_prospects_collection()
+    collection = get_async_prospects_collection()
     
     # Find the prospect by phone number
-    prospect = collection.find_one({"phoneNumber": phone_number, "campaignId": campaign_id})
+    prospect = await collection.find_one({"phoneNumber": phone_number, "campaignId": campaign_id})
     
     return prospect
 
-def update_prospect_appointment(phone_number: str, appointment_interest: bool, appointment_date_time: str = None, meeting_link: str = None, campaign_id: str = None, appointment_type: str = None):
+async def update_prospect_appointment(phone_number: str, appointment_interest: bool, appointment_date_time: str = None, meeting_link: str = None, campaign_id: str = None, appointment_type: str = None):
     """
     Update a prospect's appointment information including Microsoft meeting webLink
     
@@ -562,12 +335,7 @@ def update_prospect_appointment(phone_number: str, appointment_interest: bool, a
     """
     try:
         print("web link in final call:", meeting_link)
-        collection = get_prospects_collection()
-        
-        # First check if the prospect exists
-        existing_prospect = collection.find_one({"phoneNumber": phone_number, "campaignId": campaign_id})
-        if not existing_prospect:
-            return {"status": "error", "message": f"Prospect with phone number {phone_number} not found"}
+        collection = get_async_prospects_collection()
         
         # Create appointment info object with webLink
         appointment_info = {
@@ -580,7 +348,7 @@ def update_prospect_appointment(phone_number: str, appointment_interest: bool, a
         print("appointment_info in final call:", appointment_info)
         
         # Update prospect
-        update_result = collection.update_one(
+        update_result = await collection.update_one(
             {"phoneNumber": phone_number, "campaignId": campaign_id},
             {
                 "$set": {
@@ -590,25 +358,21 @@ def update_prospect_appointment(phone_number: str, appointment_interest: bool, a
                 }
             }
         )
+        # The match count doubles as the existence check
+        if update_result.matched_count == 0:
+            return {"status": "error", "message": f"Prospect with phone number {phone_number} not found"}
         
-        # Create an audit log entry
-        audit_log = {
-            "actionType": "Appointment Updated",
-            "performedBy": "User",
-            "timestamp": {"$date": get_brisbane_now().isoformat() + "Z"},
-            "details": {
+        # Add an audit log entry
+        await record_audit_logs_async([audit_log_entry(
+            "Appointment Updated", "User",
+            {
                 "appointmentInterest": appointment_interest,
                 "appointmentDateTime": appointment_date_time,
                 "meetingLink": meeting_link,
                 "appointmentType": appointment_type
-            }
-        }
-        
-        # Add the audit log entry
-        collection.update_one(
-            {"phoneNumber": phone_number, "campaignId": campaign_id},
-            {"$push": {"auditLogs": audit_log}}
-        )
+            },
+            phone_number, campaign_id
+        )])
         
         if update_result.modified_count > 0:
             return {
@@ -0,0 +1,158 @@
+"""
+Retry and callback policy for unsuccessful calls.
+
+When a call result lands (call_analyzed webhook or batch reconciliation) the
+prospect gets a nextAttemptAt: the time its next call is due, or no field at
+all when it should not be called again. The retry sweep then only has to read
+the prospects whose nextAttemptAt has passed (sparse index).
+
+  - busy, no_answer, voicemail and error outcomes back off on their own
+    schedule; the n-th retry waits the n-th delay of the schedule (the last
+    delay repeats)
+  - a prospect is retried while retryCount (calls made so far) is at most the
+    campaign's maxRetry
+  - a callback the prospect asked for is due at CALLBACK_CALL_TIME on its date,
+    up to MAX_CALLBACKS callbacks
+
+The delays are computed here, but retryCount and callBackCount are read on the
+server by the update pipeline, so concurrent results cannot double count.
+"""
+from config.database import get_campaign_users_collection
+from bson import ObjectId
+from bson.errors import InvalidId
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from utils.timezone import scheduled_at_utc
+import logging
+import os
+import threading
+import time
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def _minutes(name: str, default: str) -> List[int]:
+    """Comma separated minutes from the environment, e.g. "15,60,240" """
+    return [int(value) for value in os.getenv(name, default).split(",") if value.strip()]
+
+
+# Backoff schedule (minutes) of each retryable outcome
+RETRY_BACKOFF_MINUTES = {
+    "busy": _minutes("RETRY_BACKOFF_BUSY", "15,60,240"),
+    "no_answer": _minutes("RETRY_BACKOFF_NO_ANSWER", "60,240,1440"),
+    "voicemail": _minutes("RETRY_BACKOFF_VOICEMAIL", "240,1440,2880"),
+    "error": _minutes("RETRY_BACKOFF_ERROR", "30,120,1440"),
+}
+# Used for campaigns without a maxRetry
+DEFAULT_MAX_RETRY = int(os.getenv("DEFAULT_MAX_RETRY", "3"))
+MAX_CALLBACKS = int(os.getenv("MAX_CALLBACKS", "3"))
+# Brisbane time a requested callback is placed on its date
+CALLBACK_CALL_TIME = os.getenv("CALLBACK_CALL_TIME", "10:00")
+# How long a campaign's maxRetry is cached
+RETRY_POLICY_CACHE_SECONDS = int(os.getenv("RETRY_POLICY_CACHE_SECONDS", "300"))
+
+# Retell call statuses and disconnection reasons -> retry outcome
+OUTCOMES = {
+    "busy": "busy",
+    "dial_busy": "busy",
+    "no_answer": "no_answer",
+    "dial_no_answer": "no_answer",
+    "voicemail": "voicemail",
+    "voicemail_reached": "voicemail",
+}
+# Statuses of calls that reached the prospect, these are never retried
+CONNECTED_STATUSES = {"ended", "registered", "ongoing"}
+
+_max_retry_cache: Dict[str, Tuple[float, int]] = {}
+_cache_lock = threading.Lock()
+
+
+def retry_outcome(call_status: Optional[str], disconnection_reason: Optional[str] = None) -> Optional[str]:
+    """busy, no_answer, voicemail or error for an unsuccessful call, None for a connected one"""
+    if disconnection_reason in OUTCOMES:
+        # e.g. an ended call that reached voicemail
+        return OUTCOMES[disconnection_reason]
+    if call_status in CONNECTED_STATUSES:
+        return None
+    return OUTCOMES.get(call_status, "error")
+
+
+def get_campaign_max_retry(campaign_id: Optional[str]) -> int:
+    """maxRetry of a campaign, cached for RETRY_POLICY_CACHE_SECONDS"""
+    if not campaign_id:
+        return DEFAULT_MAX_RETRY
+    now = time.monotonic()
+    with _cache_lock:
+        cached = _max_retry_cache.get(campaign_id)
+    if cached and now - cached[0] < RETRY_POLICY_CACHE_SECONDS:
+        return cached[1]
+
+    max_retry = DEFAULT_MAX_RETRY
+    try:
+        campaign = get_campaign_users_collection().find_one({"_id": ObjectId(campaign_id)}, {"maxRetry": 1})
+        if campaign and isinstance(campaign.get("maxRetry"), int):
+            max_retry = campaign["maxRetry"]
+    except InvalidId:
+        logger.warning(f"Invalid campaign id {campaign_id}, using maxRetry {DEFAULT_MAX_RETRY}")
+    with _cache_lock:
+        _max_retry_cache[campaign_id] = (now, max_retry)
+    return max_retry
+
+
+def forget_campaign_max_retry(campaign_id: str):
+    """Drop a cached maxRetry after the campaign settings changed"""
+    with _cache_lock:
+        _max_retry_cache.pop(campaign_id, None)
+
+
+def next_attempt_expression(
+    call_status: Optional[str],
+    campaign_id: Optional[str],
+    disconnection_reason: Optional[str] = None,
+    callback_date: Optional[str] = None,
+    now: datetime = None,
+) -> Any:
+    """
+    Pipeline expression for the prospect's nextAttemptAt after a call
+
+    Must run after retryCount and callBackCount have their new values (a later $set stage).
+
+    Args:
+        call_status (str): Retell call status
+        campaign_id (str): Campaign of the prospect, for its maxRetry
+        disconnection_reason (str, optional): Retell disconnection reason
+        callback_date (str, optional): YYYY-MM-DD date of a callback the prospect asked for
+        now (datetime, optional): When the result landed (UTC)
+
+    Returns:
+        An expression evaluating to a naive UTC datetime, or "$$REMOVE" for no further attempt
+    """
+    if callback_date:
+        callback_at = scheduled_at_utc(callback_date, CALLBACK_CALL_TIME)
+        if callback_at is None:
+            return "$$REMOVE"
+        return {"$cond": [
+            {"$lte": [{"$ifNull": ["$callBackCount", 0]}, MAX_CALLBACKS]},
+            {"$literal": callback_at},
+            "$$REMOVE"
+        ]}
+
+    outcome = retry_outcome(call_status, disconnection_reason)
+    if outcome is None:
+        return "$$REMOVE"
+    now = now or datetime.utcnow()
+    due_times = [now + timedelta(minutes=minutes) for minutes in RETRY_BACKOFF_MINUTES[outcome]]
+    if not due_times:
+        return "$$REMOVE"
+    attempts = {"$ifNull": ["$retryCount", 1]}
+    return {"$cond": [
+        {"$lte": [attempts, get_campaign_max_retry(campaign_id)]},
+        # The first retry waits the first delay, later ones move down the schedule
+        {"$arrayElemAt": [
+            {"$literal": due_times},
+            {"$min": [{"$max": [{"$subtract": [attempts, 1]}, 0]}, len(due_times) - 1]}
+        ]},
+        "$$REMOVE"
+    ]}
@@ -0,0 +1,63 @@
+"""
+Leader election for the scheduler process.
+
+Every scheduler process tries to hold the same scheduler_leases document. The
+holder renews it well before it expires; the others are hot standbys that keep
+trying and take over as soon as the lease of a holder that died has expired.
+"""
+from config.database import get_scheduler_leases_collection
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from datetime import datetime, timedelta
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def acquire_lease(name: str, owner: str, lease_seconds: int) -> bool:
+    """
+    Take or renew the lease called name
+
+    Args:
+        name (str): Lease name, one per singleton role (e.g. "scheduler")
+        owner (str): Process asking for the lease
+        lease_seconds (int): How long the lease holds without another renewal
+
+    Returns:
+        bool: True if owner holds the lease now
+    """
+    now = datetime.utcnow()
+    try:
+        lease = get_scheduler_leases_collection().find_one_and_update(
+            {
+                "_id": name,
+                "$or": [
+                    {"owner": owner},
+                    {"expiresAt": {"$lt": now}},
+                ],
+            },
+            {
+                "$set": {
+                    "owner": owner,
+                    "expiresAt": now + timedelta(seconds=lease_seconds),
+                    "renewedAt": now,
+                },
+                "$setOnInsert": {"createdAt": now},
+            },
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+    except DuplicateKeyError:
+        # The lease exists and another live process holds it
+        return False
+    return lease is not None and lease["owner"] == owner
+
+
+def release_lease(name: str, owner: str):
+    """Give the lease up so a standby does not have to wait for it to expire"""
+    get_scheduler_leases_collection().update_one(
+        {"_id": name, "owner": owner},
+        {"$set": {"expiresAt": datetime.utcnow()}}
+    )
@@ -1,125 +1,132 @@
 from bson import ObjectId
-from services.prospect_service import get_prospects_collection
 from datetime import datetime
-from config.database import get_users_collection
+from typing import Any, Dict, Tuple
+from config.async_database import get_async_prospects_collection, get_async_users_collection
+from services.transcript_service import CALL_LIST_FIELDS
+import asyncio
+import os
+import time
+
+# calls entries without their transcript
+CALL_LIST_PROJECTION = {f"calls.{field}": 1 for field in CALL_LIST_FIELDS}
+
+# How long dashboard metrics are served from memory before they are recomputed
+DASHBOARD_STATS_CACHE_SECONDS = int(os.getenv("DASHBOARD_STATS_CACHE_SECONDS", "30"))
+
+
+async def _first(cursor, default):
+    """First document of an aggregation cursor, or default"""
+    results = await cursor.to_list(1)
+    return results[0] if results else default
+
+def _calls_size(field: str = "$calls") -> Dict[str, Any]:
+    """Pipeline expression: number of entries in an array field that may be missing"""
+    return {"$size": {"$ifNull": [field, []]}}
+
+
+# One pass over the user's prospects computes every dashboard metric
+DASHBOARD_GROUP = {
+    "$group": {
+        "_id": None,
+        "total_calls": {"$sum": _calls_size()},
+        # Every call of a prospect with at least one ended call, as the connected calls card always counted
+        "total_connected_calls": {"$sum": {"$cond": [
+            {"$in": ["ended", {"$ifNull": ["$calls.status", []]}]}, _calls_size(), 0
+        ]}},
+        "total_appointments_booked": {"$sum": {"$cond": [{"$eq": ["$appointment.appointmentInterest", True]}, 1, 0]}},
+        "total_ebook_sent": {"$sum": {"$cond": [{"$eq": ["$isEbook", True]}, 1, 0]}},
+        "total_call_backs": {"$sum": {"$cond": [{"$ne": [{"$ifNull": ["$callBackDate", None]}, None]}, 1, 0]}},
+        "_duration_total": {"$sum": {"$sum": "$calls.duration"}},
+        "_duration_count": {"$sum": {"$size": {"$filter": {
+            "input": {"$ifNull": ["$calls.duration", []]},
+            "cond": {"$isNumber": "$$this"}
+        }}}},
+    }
+}
 
-def get_total_calls_made(userId: str):
-    """Calculate the total number of calls made."""
-    collection = get_prospects_collection()
-    users_collection = get_users_collection()
+_dashboard_cache: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+_dashboard_in_flight: Dict[str, asyncio.Task] = {}
 
-    # Check if user is a super_admin
-    user = users_collection.find_one({"name": userId})
-    is_super_admin = user and user.get("role") == "super_admin"
 
-    # Build match stage - count all calls regardless of status
-    match_stage = {}
-    if not is_super_admin:
-        match_stage["ownerName"] = userId
-
-    total_calls = collection.aggregate([
-        {"$match": match_stage},
-        {"$unwind": "$calls"},
-        {"$count": "totalCalls"}
-    ])
-    result = next(total_calls, {"totalCalls": 0})
-    return result["totalCalls"]
-
-def get_connected_calls(userId: str):
-    """Calculate the total number of calls with status 'ended'."""
-    collection = get_prospects_collection()
-    users_collection = get_users_collection()
+async def _compute_dashboard_stats(userId: str) -> Dict[str, Any]:
+    collection = get_async_prospects_collection()
+    users_collection = get_async_users_collection()
 
     # Check if user is a super_admin
-    user = users_collection.find_one({"name": userId})
+    user = await users_collection.find_one({"name": userId}, {"role": 1})
     is_super_admin = user and user.get("role") == "super_admin"
 
-    # Build match stage
-    match_stage = {"calls.status": "ended"} # Need to update it to status only - maybe picked_up 
+    match_stage = {} if is_super_admin else {"ownerName": userId}
+    totals = await _first(collection.aggregate([{"$match": match_stage}, DASHBOARD_GROUP]), {})
 
-    # Only add ownerName if not outbound and not a super_admin
-    if not is_super_admin:
-        match_stage["ownerName"] = userId
+    total_calls = totals.get("total_calls", 0)
+    duration_count = totals.pop("_duration_count", 0)
+    duration_total = totals.pop("_duration_total", 0)
+    if duration_count:
+        average_call_duration = duration_total / duration_count
+    else:
+        # No calls: 0, calls without a duration: None (what $avg returned)
+        average_call_duration = None if total_calls else 0
 
-    total_connected_calls = collection.aggregate([
-        {"$match": match_stage},
-        {"$unwind": "$calls"},
-        {"$count": "totalConnectedCalls"}
-    ])
-    result = next(total_connected_calls, {"totalConnectedCalls": 0})
-    return result["totalConnectedCalls"]
+    return {
+        "total_calls": total_calls,
+        "total_connected_calls": totals.get("total_connected_calls", 0),
+        "total_appointments_booked": totals.get("total_appointments_booked", 0),
+        "total_ebook_sent": totals.get("total_ebook_sent", 0),
+        "total_call_backs": totals.get("total_call_backs", 0),
+        "average_call_duration": average_call_duration,
+    }
 
-def get_appointments_booked(userId: str):
-    """Calculate the total number of appointments booked based on appointmentInterest."""
-    collection = get_prospects_collection()
-    users_collection = get_users_collection()
 
-    # Check if user is a super_admin
-    user = users_collection.find_one({"name": userId})
-    is_super_admin = user and user.get("role") == "super_admin"
+async def get_dashboard_stats(userId: str) -> Dict[str, Any]:
+    """
+    All dashboard metrics of a user with one role lookup and one aggregation
 
-    # Build match stage
-    match_stage = {"appointment.appointmentInterest": True}
+    Results are cached for DASHBOARD_STATS_CACHE_SECONDS, and concurrent requests for the
+    same user share one computation (the dashboard requests its cards in parallel).
 
-    # Only add ownerName if not outbound and not a super_admin
-    if not is_super_admin:
-        match_stage["ownerName"] = userId
+    Args:
+        userId (str): Name of the user; super admins see every prospect
 
- 
-    appointments_booked = collection.aggregate([
-        {"$match": match_stage},
-        {"$count": "totalAppointmentsBooked"}
-    ])
-    result = next(appointments_booked, {"totalAppointmentsBooked": 0})
-    return result["totalAppointmentsBooked"]
+    Returns:
+        dict: total_calls, total_connected_calls, total_appointments_booked,
+              total_ebook_sent, total_call_backs and average_call_duration
+    """
+    cached = _dashboard_cache.get(userId)
+    if cached and time.monotonic() - cached[0] < DASHBOARD_STATS_CACHE_SECONDS:
+        return cached[1]
 
-def get_number_of_ebooks_sent(userId: str):
-    """Calculate the total number of ebooks sent based on isEbook and user role."""
-    collection = get_prospects_collection()
-    users_collection = get_users_collection()
+    task = _dashboard_in_flight.get(userId)
+    if task is None:
+        task = asyncio.ensure_future(_compute_dashboard_stats(userId))
+        _dashboard_in_flight[userId] = task
+        task.add_done_callback(lambda _: _dashboard_in_flight.pop(userId, None))
+    stats = await asyncio.shield(task)
+    _dashboard_cache[userId] = (time.monotonic(), stats)
+    return stats
 
-    # Check if user is a super_admin
-    user = users_collection.find_one({"name": userId})
-    is_super_admin = user and user.get("role") == "super_admin"
 
-    # Build match stage
-    match_stage = {"isEbook": True}
+async def get_total_calls_made(userId: str):
+    """Calculate the total number of calls made."""
+    return (await get_dashboard_stats(userId))["total_calls"]
 
-    # Only add ownerName if not outbound and not a super_admin
-    if not is_super_admin:
-        match_stage["ownerName"] = userId
+async def get_connected_calls(userId: str):
+    """Calculate the total number of connected calls."""
+    return (await get_dashboard_stats(userId))["total_connected_calls"]
 
-    pipeline = [
-        {"$match": match_stage},
-        {"$count": "totalEbooksSent"}
-    ]
+async def get_appointments_booked(userId: str):
+    """Calculate the total number of appointments booked based on appointmentInterest."""
+    return (await get_dashboard_stats(userId))["total_appointments_booked"]
 
-    total_ebooks_sent = collection.aggregate(pipeline)
-    result = next(total_ebooks_sent, {"totalEbooksSent": 0})
-    return result["totalEbooksSent"]
+async def get_number_of_ebooks_sent(userId: str):
+    """Calculate the total number of ebooks sent based on isEbook and user role."""
+    return (await get_dashboard_stats(userId))["total_ebook_sent"]
 
-def get_average_call_duration(userId: str):
+async def get_average_call_duration(userId: str):
     """Calculate the average call duration."""
+    return (await get_dashboard_stats(userId))["average_call_duration"]
 
-    collection = get_prospects_collection()
-    users_collection = get_users_collection()
-
-    # Check if user is a super_admin
-    user = users_collection.find_one({"name": userId})
-    is_super_admin = user and user.get("role") == "super_admin"
-
-    pipeline = [
-        {"$match": {"ownerName": userId} if not is_super_admin else {}},
-        {"$unwind": "$calls"},
-        {"$group": {"_id": None, "averageCallDuration": {"$avg": "$calls.duration"}}}
-    ]
-
-    result = collection.aggregate(pipeline)
-    print("result", result)
-    result = next(result, {"averageCallDuration": 0})
-    return result["averageCallDuration"]
-
-def get_matrix_details(id: str, userName: str):
+async def get_matrix_details(id: str, userName: str):
     """
     Get detailed prospect data based on the metric ID.
     
@@ -130,11 +137,11 @@ def get_matrix_details(id: str, userName: str):
     Returns:
         list: Filtered prospect data based on the metric ID
     """
-    collection = get_prospects_collection()
-    users_collection = get_users_collection()
+    collection = get_async_prospects_collection()
+    users_collection = get_async_users_collection()
 
     # Check if user is a super_admin
-    user = users_collection.find_one({"name": userName})
+    user = await users_collection.find_one({"name": userName})
     is_super_admin = user and user.get("role") == "super_admin"
 
     # Base query - will be modified based on the metric ID
@@ -161,12 +168,12 @@ def get_matrix_details(id: str, userName: str):
     if id == "calls-made":
         # All calls made (prospects with calls array)
         base_query["calls"] = {"$exists": True, "$ne": []}
-        projection["calls"] = 1
+        projection.update(CALL_LIST_PROJECTION)
         
     elif id == "calls-connected":
         # Connected calls (calls with status "ended")
         base_query["calls.status"] = "ended"
-        projection["calls"] = 1
+        projection.update(CALL_LIST_PROJECTION)
         
     elif id == "appointments":
         # Appointments booked
@@ -189,7 +196,7 @@ def get_matrix_details(id: str, userName: str):
         projection["calls.duration"] = 1
     
     # Execute the query
-    prospects = list(collection.find(base_query, projection))
+    prospects = await collection.find(base_query, projection).to_list(None)
     
     # Transform the result for better frontend consumption
     result = []
@@ -238,36 +245,17 @@ def get_matrix_details(id: str, userName: str):
         "data": result
     }
 
-def get_call_back_schedule(userId: str):
-    """Schedule the call back for the prospect."""
-    collection = get_prospects_collection()
-    users_collection = get_users_collection()
-
-    # Check if user is a super_admin
-    user = users_collection.find_one({"name": userId})
-    is_super_admin = user and user.get("role") == "super_admin"
-
-    # Build match stage
-    match_stage = {"callBackDate": {"$ne": None}}
+async def get_call_back_schedule(userId: str):
+    """Calculate the total number of scheduled call backs."""
+    return (await get_dashboard_stats(userId))["total_call_backs"]
 
-    # Only add ownerName if not outbound and not a super_admin
-    if not is_super_admin:
-        match_stage["ownerName"] = userId
-    total_scheduled_callbacks = collection.aggregate([
-        {"$match": match_stage},
-        {"$count": "totalScheduledCallbacks"}
-    ])
-    print("total_scheduled_callbacks", total_scheduled_callbacks)
-    result = next(total_scheduled_callbacks, {"totalScheduledCallbacks": 0})
-    return result["totalScheduledCallbacks"]
-
-def get_prospects_summary(user_id=None):
+async def get_prospects_summary(user_id=None):
     """Retrieve a summary of prospects with phone number, name, status, and userId, filtered by user role."""
-    collection = get_prospects_collection()
-    users_collection = get_users_collection()
+    collection = get_async_prospects_collection()
+    users_collection = get_async_users_collection()
     query = {}
     if user_id:
-        user = users_collection.find_one({"_id": ObjectId(user_id)})
+        user = await users_collection.find_one({"_id": ObjectId(user_id)})
         if user and user.get("role") != "super_admin":
             # Filter by ownerName (user's name)
             query["ownerName"] = user["name"]
@@ -275,7 +263,7 @@ def get_prospects_summary(user_id=None):
     
     # prospects_summary = collection.find(query, {"phoneNumber": 1, "name": 1, "businessName": 1, "ownerName": 1, "status": 1, "userId": 1, "_id": 0, "scheduledCallDate": 1})
     print("query", query)
-    prospects_summary = list(collection.find(query, {
+    prospects_summary = await collection.find(query, {
     "phoneNumber": 1,
     "name": 1,
     "businessName": 1,
@@ -285,7 +273,7 @@ def get_prospects_summary(user_id=None):
     "campaignName": 1,
     "_id": 0,
     "scheduledCallDate": 1
-}))
+}).to_list(None)
     # If userId is not present in the document, set it to None
     result = []
     for prospect in prospects_summary:
@@ -294,7 +282,7 @@ def get_prospects_summary(user_id=None):
         result.append(prospect)
     return result
 
-def get_calendar_events(month=None, year=None, owner_name=None, user_role=None):
+async def get_calendar_events(month=None, year=None, owner_name=None, user_role=None):
     """Retrieve calendar events for all prospects with picked_up status and appointment data in a single query.
     
     Args:
@@ -311,10 +299,7 @@ def get_calendar_events(month=None, year=None, owner_name=None, user_role=None):
     print("month", month)
     print("year", year)
     print("user_role", user_role)
-    from services.prospect_service import get_prospects_collection
-    from datetime import datetime
-    
-    collection = get_prospects_collection()
+    collection = get_async_prospects_collection()
     
     # Create the base query for picked_up prospects with appointment data
     query = {
@@ -354,7 +339,8 @@ def get_calendar_events(month=None, year=None, owner_name=None, user_role=None):
             "name": 1,
             "businessName": 1,
             "appointment": 1,
-            "calls": 1,
+            # Only the summary is used for the event notes
+            "calls.callSummary": 1,
             "ownerName": 1,
             "_id": 0
         }
@@ -362,7 +348,7 @@ def get_calendar_events(month=None, year=None, owner_name=None, user_role=None):
     
     calendar_events = []
     
-    for prospect in picked_up_prospects:
+    async for prospect in picked_up_prospects:
         # Only include prospects with appointment data
         if prospect.get("appointment") and prospect["appointment"].get("appointmentDateTime"):
             # Format the appointment data into a calendar event
@@ -396,7 +382,7 @@ def get_calendar_events(month=None, year=None, owner_name=None, user_role=None):
     
     return calendar_events
 
-def get_monthly_stats(month: int, year: int):
+async def get_monthly_stats(month: int, year: int):
     """
     Get statistics for a specific month and year
     
@@ -407,7 +393,7 @@ def get_monthly_stats(month: int, year: int):
     Returns:
         dict: Monthly statistics
     """
-    collection = get_prospects_collection()
+    collection = get_async_prospects_collection()
     
     # Calculate start and end dates for the month
     start_date = f"{year}-{month:02d}-01"
@@ -425,7 +411,7 @@ def get_monthly_stats(month: int, year: int):
     }
 
     # Get total prospects created in the month
-    total_prospects = collection.count_documents(date_match)
+    total_prospects = await collection.count_documents(date_match)
 
     # Get total calls made in the month
     calls_pipeline = [
@@ -440,7 +426,7 @@ def get_monthly_stats(month: int, year: int):
         },
         {"$count": "total"}
     ]
-    total_calls = next(collection.aggregate(calls_pipeline), {"total": 0}).get("total", 0)
+    total_calls = (await _first(collection.aggregate(calls_pipeline), {"total": 0})).get("total", 0)
 
     # Get connected calls in the month
     connected_calls_pipeline = [
@@ -455,27 +441,27 @@ def get_monthly_stats(month: int, year: int):
         },
         {"$count": "total"}
     ]
-    connected_calls = next(collection.aggregate(connected_calls_pipeline), {"total": 0}).get("total", 0)
+    connected_calls = (await _first(collection.aggregate(connected_calls_pipeline), {"total": 0})).get("total", 0)
 
     # Get appointments booked in the month
     appointments_match = {
         **date_match,
         "appointment.appointmentInterest": True
     }
-    appointments_booked = collection.count_documents(appointments_match)
+    appointments_booked = await collection.count_documents(appointments_match)
 
     # Get ebooks sent in the month
     ebooks_match = {
         **date_match,
         "isEbook": True
     }
-    ebooks_sent = collection.count_documents(ebooks_match)
+    ebooks_sent = await collection.count_documents(ebooks_match)
 
     # Get callbacks scheduled in the month
     callbacks_match = {
         "callBackDate": {"$gte": start_date, "$lt": end_date}
     }
-    callbacks_scheduled = collection.count_documents(callbacks_match)
+    callbacks_scheduled = await collection.count_documents(callbacks_match)
 
     return {
         "status": "success",
@@ -0,0 +1,106 @@
+"""
+Call transcripts, stored outside the prospect document.
+
+Each transcript is a call_transcripts document keyed by callId holding the
+zlib-compressed text. Prospect calls entries only keep the summary and a
+hasTranscript flag; the text is fetched on demand through get_transcript.
+"""
+from config.database import get_call_transcripts_collection, get_prospects_collection
+from bson import Binary
+from datetime import datetime
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from typing import Any, Dict, List, Optional
+import logging
+import zlib
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# calls entry fields returned by list endpoints (everything except a legacy inline transcript)
+CALL_LIST_FIELDS = ["callId", "batchId", "timestamp", "duration", "status", "recordingUrl", "callSummary", "hasTranscript"]
+
+
+def compress_transcript(transcript: str) -> Binary:
+    return Binary(zlib.compress(transcript.encode("utf-8"), 6))
+
+
+def decompress_transcript(data) -> str:
+    return zlib.decompress(bytes(data)).decode("utf-8")
+
+
+def transcript_operation(call_id: str, transcript: str, phone_number: str = None, campaign_id: str = None) -> Optional[UpdateOne]:
+    """
+    Upsert for one transcript, or None if there is nothing to store
+
+    The first stored version wins, so replayed webhooks do not rewrite it.
+    """
+    if not call_id or not transcript:
+        return None
+    return UpdateOne(
+        {"_id": call_id},
+        {"$setOnInsert": {
+            "transcript": compress_transcript(transcript),
+            "size": len(transcript),
+            "phoneNumber": phone_number,
+            "campaignId": campaign_id,
+            "createdAt": datetime.utcnow(),
+        }},
+        upsert=True
+    )
+
+
+def call_transcript_operation(webhook_data: Dict[str, Any]) -> Optional[UpdateOne]:
+    """Transcript upsert for a call_analyzed webhook payload"""
+    call_data = webhook_data.get("call", {})
+    return transcript_operation(
+        call_data.get("call_id"),
+        call_data.get("transcript"),
+        call_data.get("to_number"),
+        (call_data.get("retell_llm_dynamic_variables") or {}).get("campaign_id"),
+    )
+
+
+def save_transcripts(operations: List[Optional[UpdateOne]]) -> int:
+    """
+    Write transcript upserts with one unordered bulk_write
+
+    Returns:
+        int: Number of transcripts written
+    """
+    operations = [operation for operation in operations if operation is not None]
+    if not operations:
+        return 0
+    try:
+        return get_call_transcripts_collection().bulk_write(operations, ordered=False).upserted_count
+    except BulkWriteError as bwe:
+        # Two writers racing on a callId is fine, the other one stored it
+        unexpected = [error for error in bwe.details.get("writeErrors", []) if error.get("code") != 11000]
+        if unexpected:
+            logger.error(f"Error saving transcripts: {unexpected}")
+        return bwe.details.get("nUpserted", 0)
+
+
+def get_transcript(call_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Get the transcript of a call
+
+    Falls back to the prospect's calls entry for calls stored before transcripts
+    moved out of the prospect document.
+
+    Returns:
+        dict: callId and transcript, or None if the call has no transcript
+    """
+    document = get_call_transcripts_collection().find_one({"_id": call_id})
+    if document:
+        return {"callId": call_id, "transcript": decompress_transcript(document["transcript"])}
+
+    prospect = get_prospects_collection().find_one(
+        {"calls.callId": call_id},
+        {"calls": {"$elemMatch": {"callId": call_id}}}
+    )
+    calls = (prospect or {}).get("calls") or []
+    if calls and calls[0].get("transcript"):
+        return {"callId": call_id, "transcript": calls[0]["transcript"]}
+    return None
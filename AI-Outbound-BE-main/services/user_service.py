@@ -1,12 +1,13 @@
-from config.database import get_users_collection as db_get_users_collection
+from config.async_database import get_async_users_collection
 from fastapi import HTTPException
 from bson import ObjectId
 from services.auth_service import get_password_hash
+import asyncio
 
-def get_users():
+async def get_users():
     try:
-        users_collection = db_get_users_collection()
-        users = list(users_collection.find())
+        users_collection = get_async_users_collection()
+        users = await users_collection.find().to_list(None)
         
         transformed_users = [{ 
             "id": str(user["_id"]),
@@ -25,10 +26,10 @@ def get_users():
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving users: {str(e)}")
 
-def get_user_by_id(user_id: str):
+async def get_user_by_id(user_id: str):
     try:
-        users_collection = db_get_users_collection()
-        user = users_collection.find_one({"_id": ObjectId(user_id)})
+        users_collection = get_async_users_collection()
+        user = await users_collection.find_one({"_id": ObjectId(user_id)})
         if not user:
             return None
         return {
@@ -42,12 +43,12 @@ def get_user_by_id(user_id: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving user: {str(e)}")
 
-def update_user(user_id: str, user_data: dict):
+async def update_user(user_id: str, user_data: dict):
     try:
-        users_collection = db_get_users_collection()
+        users_collection = get_async_users_collection()
         
         # Check if user exists
-        user = users_collection.find_one({"_id": ObjectId(user_id)})
+        user = await users_collection.find_one({"_id": ObjectId(user_id)})
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
         
@@ -59,7 +60,7 @@ def update_user(user_id: str, user_data: dict):
             update_data["name"] = user_data["name"]
         if "email" in user_data:
             # Check if email already exists for another user
-            existing_user = users_collection.find_one({"email": user_data["email"], "_id": {"$ne": ObjectId(user_id)}})
+            existing_user = await users_collection.find_one({"email": user_data["email"], "_id": {"$ne": ObjectId(user_id)}})
             if existing_user:
                 raise HTTPException(status_code=400, detail="Email already in use by another user")
             update_data["email"] = user_data["email"]
@@ -68,14 +69,14 @@ def update_user(user_id: str, user_data: dict):
         if "role" in user_data:
             update_data["role"] = user_data["role"]
         if "password" in user_data and user_data["password"]:
-            # Hash the new password
-            update_data["password"] = get_password_hash(user_data["password"])
+            # Hash the new password (bcrypt is CPU bound, keep it off the event loop)
+            update_data["password"] = await asyncio.to_thread(get_password_hash, user_data["password"])
         if "api_key" in user_data:
             update_data["api_key"] = user_data["api_key"]
         
         # Update the user
         if update_data:
-            users_collection.update_one(
+            await users_collection.update_one(
                 {"_id": ObjectId(user_id)},
                 {"$set": update_data}
             )
@@ -0,0 +1,380 @@
+"""
+Fast-ack Retell webhook processing.
+
+The webhook route stores each event that needs database work in the
+webhook_inbox collection, puts its id on an in-memory queue and returns.
+WEBHOOK_WORKERS asyncio workers drain the queue off the event loop.
+
+Each worker coalesces events: it waits up to WEBHOOK_BATCH_WINDOW_MS after the
+first one, or until WEBHOOK_BATCH_SIZE events are collected, then flushes them
+as one unordered bulk_write to the prospects collection. An event whose write
+fails (writeErrors index) is retried on its own without holding back the rest
+of its batch.
+
+Events are claimed with a lease before they are processed. Events that never
+made it onto the queue (full queue, restart) or whose worker died are picked up
+by process_pending_events, which the scheduler runs every minute. The sweep
+also fails events whose lease expired on their last attempt.
+
+Inbox documents are keyed by "<call_id>:<event>", so a webhook Retell delivers
+again is rejected by the insert itself (duplicate _id) and never reprocessed.
+Processed events expire after three days (TTL index on processedAt).
+"""
+from config.database import get_webhook_inbox_collection, get_prospects_collection
+from services.prospect_service import call_analyzed_operation, call_analyzed_audit_log
+from services.audit_log_service import record_audit_logs
+from services.transcript_service import call_transcript_operation, save_transcripts
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+import asyncio
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Batches flushed concurrently by this process
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "4"))
+# Events held in memory; the rest wait in the inbox for the sweep
+WEBHOOK_QUEUE_MAX = int(os.getenv("WEBHOOK_QUEUE_MAX", "10000"))
+# A batch is flushed when it is full or this long after its first event
+WEBHOOK_BATCH_SIZE = int(os.getenv("WEBHOOK_BATCH_SIZE", "50"))
+WEBHOOK_BATCH_WINDOW_MS = int(os.getenv("WEBHOOK_BATCH_WINDOW_MS", "20"))
+# A processing event whose worker has not finished by then is retried
+WEBHOOK_LEASE_SECONDS = int(os.getenv("WEBHOOK_LEASE_SECONDS", "60"))
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "5"))
+# Pending events younger than this are left to the queue workers
+WEBHOOK_SWEEP_AFTER_SECONDS = int(os.getenv("WEBHOOK_SWEEP_AFTER_SECONDS", "30"))
+
+# Events that change the database, with the function building their (filter, update)
+EVENT_OPERATIONS = {
+    "call_analyzed": call_analyzed_operation,
+}
+# Audit entry written for each applied event
+EVENT_AUDIT_LOGS = {
+    "call_analyzed": call_analyzed_audit_log,
+}
+
+# Identifies this process as the owner of the events it claims
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+_queue: Optional[asyncio.Queue] = None
+_workers = []
+_metrics = {"received": 0, "duplicates": 0, "processed": 0, "unmatched": 0, "failed": 0, "retried": 0, "flushes": 0}
+# Recent flushes as (batch size, flush seconds)
+_recent_flushes = deque(maxlen=1000)
+_metrics_lock = threading.Lock()
+
+
+def _count(metric: str, amount=1):
+    with _metrics_lock:
+        _metrics[metric] += amount
+
+
+def webhook_event_key(data: Dict[str, Any]) -> str:
+    """Inbox id of a webhook event, one per call and event type"""
+    return f"{data['call']['call_id']}:{data['event']}"
+
+
+def store_webhook_event(data: Dict[str, Any]) -> Optional[str]:
+    """
+    Persist a webhook event in the inbox unless it was already received
+
+    Returns:
+        str: The inbox id, or None for a duplicate delivery
+    """
+    now = datetime.utcnow()
+    event_key = webhook_event_key(data)
+    try:
+        get_webhook_inbox_collection().insert_one({
+            "_id": event_key,
+            "event": data["event"],
+            "callId": data["call"]["call_id"],
+            "payload": data,
+            "status": "pending",
+            "attempts": 0,
+            "owner": None,
+            "leaseExpiresAt": None,
+            "error": None,
+            "receivedAt": now,
+            "processedAt": None,
+        })
+    except DuplicateKeyError:
+        _count("duplicates")
+        logger.info(f"Ignoring duplicate webhook {event_key}")
+        return None
+    _count("received")
+    return event_key
+
+
+def _claim_events(event_ids: List[str]) -> List[Dict[str, Any]]:
+    """Lease every claimable event of event_ids with a token unique to this flush"""
+    collection = get_webhook_inbox_collection()
+    now = datetime.utcnow()
+    owner = f"{WORKER_ID}:{uuid.uuid4().hex[:8]}"
+    collection.update_many(
+        {
+            "_id": {"$in": event_ids},
+            "attempts": {"$lt": WEBHOOK_MAX_ATTEMPTS},
+            "$or": [
+                {"status": "pending"},
+                {"status": "processing", "leaseExpiresAt": {"$lt": now}},
+            ],
+        },
+        {
+            "$set": {
+                "status": "processing",
+                "owner": owner,
+                "leaseExpiresAt": now + timedelta(seconds=WEBHOOK_LEASE_SECONDS),
+            },
+            "$inc": {"attempts": 1},
+        }
+    )
+    return list(collection.find({"_id": {"$in": event_ids}, "owner": owner}))
+
+
+def _release_failed(collection, event: Dict[str, Any], error: str):
+    exhausted = event["attempts"] >= WEBHOOK_MAX_ATTEMPTS
+    collection.update_one(
+        {"_id": event["_id"], "owner": event["owner"]},
+        {"$set": {
+            "status": "failed" if exhausted else "pending",
+            "owner": None,
+            "leaseExpiresAt": None,
+            "error": error,
+        }}
+    )
+    _count("failed" if exhausted else "retried")
+    logger.error(f"Error processing {event['event']} for call {event['callId']} (attempt {event['attempts']}): {error}")
+
+
+def process_webhook_batch(event_ids: List[str]) -> int:
+    """
+    Apply a batch of inbox events with one unordered bulk_write
+
+    Returns:
+        int: Number of events applied
+    """
+    if not event_ids:
+        return 0
+    started = time.perf_counter()
+    inbox = get_webhook_inbox_collection()
+    events = _claim_events(event_ids)
+    if not events:
+        return 0
+
+    operations = []
+    batched_events = []
+    for event in events:
+        try:
+            prospect_filter, update = EVENT_OPERATIONS[event["event"]](event["payload"])
+        except Exception as e:
+            _release_failed(inbox, event, str(e))
+            continue
+        operations.append(UpdateOne(prospect_filter, update))
+        batched_events.append(event)
+
+    failed_indexes = {}
+    matched = len(operations)
+    if operations:
+        # Transcripts first, so a prospect never points at a transcript that is not stored
+        save_transcripts([
+            call_transcript_operation(event["payload"])
+            for event in batched_events if event["event"] == "call_analyzed"
+        ])
+        try:
+            matched = get_prospects_collection().bulk_write(operations, ordered=False).matched_count
+        except BulkWriteError as bwe:
+            # Unordered: every other operation was still applied
+            matched = bwe.details.get("nMatched", 0)
+            failed_indexes = {error["index"]: error.get("errmsg", "Write error") for error in bwe.details.get("writeErrors", [])}
+        except Exception as e:
+            # Nothing is known to be written, the whole batch is retried
+            failed_indexes = {index: str(e) for index in range(len(operations))}
+
+    for index, error in failed_indexes.items():
+        _release_failed(inbox, batched_events[index], error)
+
+    applied = [event for index, event in enumerate(batched_events) if index not in failed_indexes]
+    if applied:
+        # Audit entries have deterministic ids, so a batch that is retried does not repeat them
+        record_audit_logs([
+            EVENT_AUDIT_LOGS[event["event"]](event["payload"])
+            for event in applied if event["event"] in EVENT_AUDIT_LOGS
+        ])
+        # One owner token per flush, so a single update_many marks the batch done
+        inbox.update_many(
+            {"_id": {"$in": [event["_id"] for event in applied]}, "owner": applied[0]["owner"]},
+            {"$set": {
+                "status": "done",
+                "owner": None,
+                "leaseExpiresAt": None,
+                "processedAt": datetime.utcnow(),
+            }, "$unset": {"payload": ""}}
+        )
+
+    unmatched = max(len(applied) - matched, 0)
+    if unmatched:
+        logger.warning(f"{unmatched} webhook events had no prospect with a pending call entry")
+    flush_seconds = time.perf_counter() - started
+    with _metrics_lock:
+        _metrics["processed"] += len(applied)
+        _metrics["unmatched"] += unmatched
+        _metrics["flushes"] += 1
+        _recent_flushes.append((len(events), flush_seconds))
+    logger.info(f"Flushed {len(events)} webhook events in {flush_seconds * 1000:.1f}ms ({len(failed_indexes)} failed)")
+    return len(applied)
+
+
+def fail_exhausted_events() -> int:
+    """Mark events whose lease expired on their last attempt as failed, returns the number marked"""
+    result = get_webhook_inbox_collection().update_many(
+        {
+            "status": "processing",
+            "leaseExpiresAt": {"$lt": datetime.utcnow()},
+            "attempts": {"$gte": WEBHOOK_MAX_ATTEMPTS},
+        },
+        {"$set": {
+            "status": "failed",
+            "owner": None,
+            "leaseExpiresAt": None,
+            "error": "Lease expired on the last attempt",
+        }}
+    )
+    if result.modified_count:
+        _count("failed", result.modified_count)
+        logger.error(f"{result.modified_count} webhook events failed: lease expired on the last attempt")
+    return result.modified_count
+
+
+def process_pending_events(limit: int = 500) -> int:
+    """Apply events that were never queued or whose worker stopped, returns the number applied"""
+    now = datetime.utcnow()
+    try:
+        # Exhausted events are never claimed again, so they would stay processing forever
+        fail_exhausted_events()
+        events = get_webhook_inbox_collection().find(
+            {
+                "attempts": {"$lt": WEBHOOK_MAX_ATTEMPTS},
+                "$or": [
+                    {"status": "pending", "receivedAt": {"$lt": now - timedelta(seconds=WEBHOOK_SWEEP_AFTER_SECONDS)}},
+                    {"status": "processing", "leaseExpiresAt": {"$lt": now}},
+                ],
+            },
+            {"_id": 1}
+        ).sort("receivedAt", 1).limit(limit)
+        event_ids = [event["_id"] for event in events]
+        applied = sum(
+            process_webhook_batch(event_ids[start:start + WEBHOOK_BATCH_SIZE])
+            for start in range(0, len(event_ids), WEBHOOK_BATCH_SIZE)
+        )
+        if applied:
+            logger.info(f"Webhook sweep applied {applied} events")
+        return applied
+    except Exception as e:
+        logger.error(f"Error in process_pending_events: {str(e)}")
+        return 0
+
+
+async def enqueue_webhook_event(data: Dict[str, Any]) -> bool:
+    """
+    Store an event and hand it to the worker pool
+
+    Returns:
+        bool: True if the event needs processing and was stored, False for other
+              events and duplicate deliveries
+    """
+    if data.get("event") not in EVENT_OPERATIONS:
+        return False
+    event_id = await asyncio.to_thread(store_webhook_event, data)
+    if event_id is None:
+        return False
+    if _queue is None:
+        # No workers in this process (e.g. startup did not run), the sweep applies it
+        return True
+    try:
+        _queue.put_nowait(event_id)
+    except asyncio.QueueFull:
+        logger.warning(f"Webhook queue is full, event {event_id} is left for the sweep")
+    return True
+
+
+async def _collect_batch() -> List[str]:
+    """Wait for an event, then gather more until the batch is full or the window closes"""
+    batch = [await _queue.get()]
+    deadline = time.monotonic() + WEBHOOK_BATCH_WINDOW_MS / 1000
+    while len(batch) < WEBHOOK_BATCH_SIZE:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            batch.append(await asyncio.wait_for(_queue.get(), remaining))
+        except asyncio.TimeoutError:
+            break
+    return batch
+
+
+async def _worker(worker_num: int):
+    while True:
+        batch = await _collect_batch()
+        try:
+            await asyncio.to_thread(process_webhook_batch, batch)
+        except Exception as e:
+            logger.error(f"Webhook worker {worker_num} failed on a batch of {len(batch)}: {str(e)}")
+        finally:
+            for _ in batch:
+                _queue.task_done()
+
+
+async def start_webhook_workers():
+    """Start the worker pool on the running event loop"""
+    global _queue
+    if _queue is not None:
+        return
+    _queue = asyncio.Queue(maxsize=WEBHOOK_QUEUE_MAX)
+    for worker_num in range(WEBHOOK_WORKERS):
+        _workers.append(asyncio.create_task(_worker(worker_num)))
+    logger.info(f"Started {WEBHOOK_WORKERS} webhook workers")
+
+
+async def stop_webhook_workers():
+    """Stop the workers; unfinished events stay in the inbox for the sweep"""
+    global _queue
+    for worker in _workers:
+        worker.cancel()
+    _workers.clear()
+    _queue = None
+
+
+def get_webhook_queue_stats() -> Dict[str, Any]:
+    """Queue depth, inbox backlog, batch sizes and flush latency of this process"""
+    collection = get_webhook_inbox_collection()
+    with _metrics_lock:
+        metrics = dict(_metrics)
+        flushes = list(_recent_flushes)
+    sizes = [size for size, _ in flushes]
+    latencies = sorted(seconds * 1000 for _, seconds in flushes)
+    return {
+        "workers": len(_workers),
+        "queueDepth": _queue.qsize() if _queue is not None else 0,
+        "inbox": {
+            status: collection.count_documents({"status": status})
+            for status in ("pending", "processing", "failed")
+        },
+        **metrics,
+        "recentFlushes": {
+            "count": len(flushes),
+            "avgBatchSize": round(sum(sizes) / len(sizes), 1) if sizes else None,
+            "maxBatchSize": max(sizes) if sizes else None,
+            "avgFlushMs": round(sum(latencies) / len(latencies), 1) if latencies else None,
+            "p95FlushMs": round(latencies[int(0.95 * (len(latencies) - 1))], 1) if latencies else None,
+        },
+    }
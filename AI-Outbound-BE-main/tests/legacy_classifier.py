@@ -0,0 +1,82 @@
+"""
+Reference for utils.transcript_classifier.
+
+The phrase scan the webhook handler used before the single pass classifier, and
+a generator of call-length transcripts. tests/test_transcript_classifier.py
+checks the two agree; loadtest/bench_transcript_classifier.py times them.
+"""
+import random
+
+FILLER = [
+    "Agent: Hi, this is Sarah calling from the business brokers, is this a good time?",
+    "User: Yeah, I've got a few minutes, what's it about?",
+    "Agent: We help owners work out what their business is worth and plan an exit.",
+    "User: We have been trading for about twelve years now, mostly wholesale.",
+    "Agent: That's great. Have you thought about what the next few years look like?",
+    "User: Not really, we have been flat out with orders since the new contract.",
+    "Agent: Understood. Many owners start with a short conversation with an advisor.",
+    "User: Okay, what would that involve, and is there a cost?",
+    "Agent: There's no cost, it's about thirty minutes and you can ask anything.",
+    "User: Sorry, can you repeat that? The line dropped for a second.",
+]
+SIGNALS = [
+    "Agent: Would that be a selling appointment or just a chat?",
+    "Agent: I can book a selling consultation for Tuesday.",
+    "Agent: I can book an advisory call with one of our partners.",
+    "Agent: Shall we lock in an advisory meeting?",
+    "Agent: Is this for selling or advisory?",
+    "User: Advisory, I think.",
+    "User: Selling, probably in the next year or two.",
+    "Agent: Would it be sales or advisory?",
+    "Agent: Would you prefer selling support or planning support?",
+]
+
+
+def legacy_detect_appointment_type(transcript: str, appointment_interest) -> str:
+    """The phrase scan the webhook handler used before utils.transcript_classifier, kept as the reference"""
+    transcript = (transcript or '').lower()
+    appointment_type = None
+    
+    # Check for appointment type in transcript with more variations
+    if any(phrase in transcript for phrase in ['selling appointment', 'sales appointment', 'book selling', 'book a selling', 
+                                             'selling meeting', 'sales meeting', 'selling consultation']):
+        appointment_type = 'selling'
+    elif any(phrase in transcript for phrase in ['advisory appointment', 'sales advisory appointment', 'book advisory', 
+                                               'book an advisory', 'advisory meeting', 'advisory consultation']):
+        appointment_type = 'advisory'
+    
+    # Check for agent questions about appointment type preferences
+    if appointment_type is None and appointment_interest is True:
+        # If agent asks about type preference and user responds with a preference
+        if ('would you prefer selling' in transcript or 'would you like selling' in transcript or 
+            'selling or advisory' in transcript or 'sales or advisory' in transcript):
+            # Look for user's response after the question
+            if 'selling' in transcript.split('selling or advisory')[-1]:
+                appointment_type = 'selling'
+            elif 'advisory' in transcript.split('selling or advisory')[-1]:
+                appointment_type = 'advisory'
+            elif 'sales' in transcript.split('sales or advisory')[-1]:
+                appointment_type = 'selling'
+            else:
+                # Default to selling if there's appointment interest but type is unclear
+                appointment_type = 'selling'
+    
+    # If appointment type couldn't be determined but there's appointment interest, default to 'selling'
+    if appointment_type is None and appointment_interest is True:
+        appointment_type = 'selling'
+    return appointment_type
+
+
+def generate_corpus(count: int, turns: int, seed: int):
+    """Call-length transcripts with appointment phrases scattered through them"""
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(count):
+        lines = [rng.choice(FILLER) for _ in range(rng.randint(turns // 2, turns))]
+        for _ in range(rng.randint(0, 3)):
+            lines.insert(rng.randrange(len(lines) + 1), rng.choice(SIGNALS))
+        transcript = "\n".join(lines)
+        if rng.random() < 0.3:
+            transcript = transcript.upper()
+        corpus.append((transcript, rng.choice([True, False, None])))
+    return corpus
@@ -0,0 +1,52 @@
+"""
+Pinned appointment type decisions of utils.transcript_classifier.
+
+Each case is what the webhook handler decides today; the phrase scan it replaced
+(kept in tests/legacy_classifier.py) must agree on every one, and on a
+generated corpus of call-length transcripts.
+"""
+import pytest
+from tests.legacy_classifier import generate_corpus, legacy_detect_appointment_type
+from utils.transcript_classifier import classify_appointment_type
+
+# (transcript, appointment_interest, expected type)
+PINNED_CASES = [
+    ("", None, None),
+    (None, True, 'selling'),
+    ("Agent: Hi there, is this the owner?\nUser: Not interested.", False, None),
+    ("Agent: Hi there.\nUser: Sounds good, book me in.", True, 'selling'),
+    ("User: Let's do a SELLING APPOINTMENT next week.", None, 'selling'),
+    ("User: I'd like to book an advisory session.", None, 'advisory'),
+    ("Agent: We could set up a sales advisory appointment.", None, 'advisory'),
+    ("Agent: A sales advisory appointment or a sales meeting?", None, 'selling'),
+    ("Agent: An advisory meeting, or book a selling slot?", None, 'selling'),
+    ("Agent: Is this for selling or advisory?\nUser: Advisory please.", True, 'advisory'),
+    ("Agent: Is this for selling or advisory?\nUser: Selling please.", True, 'selling'),
+    ("Agent: Is this for selling or advisory?\nUser: Advisory.\nAgent: Selling or advisory?\nUser: Hmm.", True, 'selling'),
+    # Deliberately pins a quirk of the phrase scan: "upselling" contains "selling",
+    # so the substring match picks selling over the advisory answer
+    ("Agent: Is this for selling or advisory?\nUser: Advisory, not upselling.", True, 'selling'),
+    ("Agent: Is this for selling or advisory?\nUser: Advisory please.", None, None),
+    ("Agent: Would it be sales or advisory?\nUser: Not sure yet.", True, 'advisory'),
+    ("Agent: Would it be sales or advisory?\nUser: I am selling next year.", True, 'selling'),
+    ("Agent: Would you prefer selling help?\nUser: Advisory.", True, 'selling'),
+    ("Agent: Would you like selling advice or advisory advice?", True, 'selling'),
+    ("Agent: We offer an advisory consultation.\nUser: Selling or advisory?", True, 'advisory'),
+    ("Agent: selling or advisorY\nuser: ADVISORY", True, 'advisory'),
+]
+
+
+@pytest.mark.parametrize("transcript, appointment_interest, expected", PINNED_CASES)
+def test_pinned_decisions(transcript, appointment_interest, expected):
+    assert classify_appointment_type(transcript, appointment_interest) == expected
+
+
+@pytest.mark.parametrize("transcript, appointment_interest, expected", PINNED_CASES)
+def test_legacy_scan_agrees_on_pinned_decisions(transcript, appointment_interest, expected):
+    assert legacy_detect_appointment_type(transcript, appointment_interest) == expected
+
+
+def test_matches_legacy_scan_on_generated_transcripts():
+    for transcript, appointment_interest in generate_corpus(300, 60, seed=7):
+        assert classify_appointment_type(transcript, appointment_interest) == \
+            legacy_detect_appointment_type(transcript, appointment_interest)
@@ -0,0 +1,63 @@
+"""
+Phone number helpers shared by the upload routes and the ingest service.
+"""
+import re
+
+def format_phone_number(phone_number: str) -> str:
+    """
+    Format phone number by adding '+' prefix if not present.
+    Removes any spaces, dashes, or parentheses before adding '+'.
+    
+    Args:
+        phone_number (str): Raw phone number from CSV
+        
+    Returns:
+        str: Formatted phone number with '+' prefix
+    """
+    if not phone_number:
+        return phone_number
+    
+    # Remove any spaces, dashes, parentheses, and other non-digit characters except +
+    cleaned = re.sub(r'[^\d+]', '', phone_number.strip())
+    
+    # If it doesn't start with +, add it
+    if not cleaned.startswith('+'):
+        cleaned = '+' + cleaned
+    
+    return cleaned
+
+
+# Timezone of the geographic area codes, keyed by E.164 prefix. Mobile and
+# non-geographic numbers have no entry: they may be anywhere in the country.
+PHONE_PREFIX_TIMEZONES = {
+    "+612": "Australia/Sydney",      # NSW / ACT
+    "+613": "Australia/Melbourne",   # VIC / TAS
+    "+617": "Australia/Brisbane",    # QLD
+    "+6186": "Australia/Perth",      # WA
+    "+6189": "Australia/Perth",      # WA
+    "+6187": "Australia/Adelaide",   # SA
+    "+6188": "Australia/Adelaide",   # SA
+    "+61889": "Australia/Darwin",    # NT
+    "+64": "Pacific/Auckland",       # New Zealand
+}
+# Prefix lengths to try, longest first, so "+61889" wins over "+6188"
+_PREFIX_LENGTHS = sorted({len(prefix) for prefix in PHONE_PREFIX_TIMEZONES}, reverse=True)
+
+
+def phone_timezone(phone_number: str):
+    """
+    Timezone of a formatted phone number from its area code
+
+    Args:
+        phone_number (str): Phone number in the format_phone_number format
+
+    Returns:
+        str: IANA timezone name, or None when the number's location is unknown (e.g. mobiles)
+    """
+    if not phone_number:
+        return None
+    for length in _PREFIX_LENGTHS:
+        timezone = PHONE_PREFIX_TIMEZONES.get(phone_number[:length])
+        if timezone:
+            return timezone
+    return None
@@ -2,7 +2,9 @@
 Timezone utility functions for Brisbane, Australia timezone handling.
 All functions use Australia/Brisbane timezone consistently across the application.
 """
-from datetime import datetime
+from datetime import datetime, time, timezone
+from functools import lru_cache
+from typing import Optional, Tuple
 from zoneinfo import ZoneInfo
 import logging
 
@@ -11,6 +13,11 @@ logger = logging.getLogger(__name__)
 
 # Brisbane timezone constant
 BRISBANE_TZ = ZoneInfo("Australia/Brisbane")
+# Calls are only placed between these hours (Brisbane time, or the prospect's local time)
+CALL_HOURS_START = 10
+CALL_HOURS_END = 19
+# Prospects whose timezone is unknown (e.g. mobiles) keep the Brisbane call hours
+UNKNOWN_LOCATION_TIMEZONE = "Australia/Brisbane"
 
 def get_brisbane_now():
     """Get current datetime in Brisbane timezone"""
@@ -28,12 +35,72 @@ def get_brisbane_datetime_iso():
     """Get current datetime in ISO format in Brisbane timezone"""
     return get_brisbane_now().isoformat()
 
+def brisbane_to_utc(dt: datetime) -> datetime:
+    """Naive UTC datetime (the way PyMongo stores dates) for a Brisbane wall clock time"""
+    return dt.replace(tzinfo=BRISBANE_TZ).astimezone(timezone.utc).replace(tzinfo=None)
+
+def get_brisbane_day_start_utc() -> datetime:
+    """Start of the current Brisbane day as a naive UTC datetime"""
+    return brisbane_to_utc(datetime.combine(get_brisbane_now().date(), time()))
+
+def scheduled_at_utc(scheduled_call_date, scheduled_call_time: str = None):
+    """
+    Combine a prospect's Brisbane scheduledCallDate and scheduledCallTime into scheduledAt
+
+    Args:
+        scheduled_call_date (str | datetime): "YYYY-MM-DD" (anything after the date is ignored)
+        scheduled_call_time (str, optional): "HH:MM"; without one the prospect is due from midnight
+
+    Returns:
+        datetime: Naive UTC datetime, or None if the date or time is missing or invalid
+    """
+    if isinstance(scheduled_call_date, datetime):
+        scheduled_call_date = scheduled_call_date.strftime("%Y-%m-%d")
+    if not scheduled_call_date or not isinstance(scheduled_call_date, str):
+        return None
+    try:
+        day = datetime.strptime(scheduled_call_date[:10], "%Y-%m-%d")
+        at = datetime.strptime(scheduled_call_time, "%H:%M").time() if scheduled_call_time else time()
+    except (TypeError, ValueError):
+        return None
+    return brisbane_to_utc(datetime.combine(day.date(), at))
+
 def is_within_call_hours():
     """Check if current time is within allowed call hours (10 AM to 7 PM) in Brisbane timezone"""
     current_time = get_brisbane_now()
     logger.info(f"Current Brisbane time: {current_time}")
     logger.info(f"Current hour: {current_time.hour}")
-    return 10 <= current_time.hour < 19
+    return CALL_HOURS_START <= current_time.hour < CALL_HOURS_END
+
+@lru_cache(maxsize=1024)
+def call_window_utc(scheduled_at: Optional[datetime], timezone_name: Optional[str] = None) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """
+    Call window of a prospect on its scheduled day
+
+    The window opens at the later of scheduled_at and the start of the prospect's local
+    call hours, and closes at the end of its local call hours, on the scheduled (Brisbane) date.
+
+    Args:
+        scheduled_at (datetime): The prospect's scheduledAt (naive UTC)
+        timezone_name (str, optional): The prospect's timezone, None if unknown (Brisbane call hours)
+
+    Returns:
+        tuple: (callWindowStart, callWindowEnd) as naive UTC datetimes, (None, None) without scheduled_at
+    """
+    if scheduled_at is None:
+        return None, None
+    day = scheduled_at.replace(tzinfo=timezone.utc).astimezone(BRISBANE_TZ).date()
+    zone = ZoneInfo(timezone_name or UNKNOWN_LOCATION_TIMEZONE)
+    start, end = (
+        datetime.combine(day, time(hour)).replace(tzinfo=zone).astimezone(timezone.utc).replace(tzinfo=None)
+        for hour in (CALL_HOURS_START, CALL_HOURS_END)
+    )
+    return max(scheduled_at, start), end
+
+def is_call_window_open(timezone_name: Optional[str], now: datetime = None) -> bool:
+    """Whether it is call hours for a prospect in timezone_name (None: unknown location, Brisbane hours)"""
+    now = (now or datetime.utcnow()).replace(tzinfo=timezone.utc)
+    return CALL_HOURS_START <= now.astimezone(ZoneInfo(timezone_name or UNKNOWN_LOCATION_TIMEZONE)).hour < CALL_HOURS_END
 
 def format_brisbane_datetime(dt_string):
     """Convert datetime string to Brisbane timezone and format for display"""
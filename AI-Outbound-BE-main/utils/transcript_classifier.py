@@ -0,0 +1,105 @@
+"""
+Single pass phrase matching over call transcripts.
+
+PhraseMatcher finds every (possibly overlapping) occurrence of a fixed phrase
+list by scanning only for a few anchor words that every phrase contains, then
+checking the phrases around each hit. A transcript is lowercased once and
+read once per anchor instead of once per phrase. classify_appointment_type
+uses it to reproduce the appointment type rules of the webhook handler.
+
+CPython's str.find is much faster than re alternations or a pure Python
+automaton, which is why anchors are used instead of one combined regex
+(see loadtest/bench_transcript_classifier.py).
+"""
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+SELLING_PHRASES = ['selling appointment', 'sales appointment', 'book selling', 'book a selling',
+                   'selling meeting', 'sales meeting', 'selling consultation']
+ADVISORY_PHRASES = ['advisory appointment', 'sales advisory appointment', 'book advisory',
+                    'book an advisory', 'advisory meeting', 'advisory consultation']
+# Agent asking which type the prospect prefers
+TYPE_QUESTIONS = ['would you prefer selling', 'would you like selling', 'selling or advisory', 'sales or advisory']
+# The prospect's answer is looked for after the last time the agent offered both types
+TYPE_CHOICE = 'selling or advisory'
+
+
+class PhraseMatcher:
+    """Finds every occurrence of a fixed set of phrases, anchored on words they contain"""
+
+    def __init__(self, phrases: Iterable[str], anchors: Iterable[str]):
+        self.phrases = sorted(set(phrases))
+        self.anchors = list(anchors)
+        # anchor -> (phrase, offset of the anchor in the phrase); each phrase is listed under
+        # its leftmost anchor only, so every occurrence is reported once
+        self._candidates: Dict[str, List[Tuple[str, int]]] = {anchor: [] for anchor in self.anchors}
+        for phrase in self.phrases:
+            found = [(phrase.find(anchor), anchor) for anchor in self.anchors if anchor in phrase]
+            if not found:
+                raise ValueError(f"Phrase {phrase!r} contains none of the anchors {self.anchors}")
+            offset, anchor = min(found)
+            self._candidates[anchor].append((phrase, offset))
+
+    def finditer(self, text: str) -> Iterator[Tuple[int, str]]:
+        """Yield (position, phrase) for every occurrence of every phrase, grouped by anchor"""
+        for anchor, candidates in self._candidates.items():
+            if not candidates:
+                continue
+            hit = text.find(anchor)
+            while hit != -1:
+                for phrase, offset in candidates:
+                    position = hit - offset
+                    if position >= 0 and text.startswith(phrase, position):
+                        yield position, phrase
+                hit = text.find(anchor, hit + 1)
+
+
+_appointment_matcher = PhraseMatcher(
+    SELLING_PHRASES + ADVISORY_PHRASES + TYPE_QUESTIONS + ['selling', 'advisory'],
+    anchors=['selling', 'sales', 'advisory']
+)
+_selling_phrases = frozenset(SELLING_PHRASES)
+_advisory_phrases = frozenset(ADVISORY_PHRASES)
+_type_questions = frozenset(TYPE_QUESTIONS)
+
+
+def classify_appointment_type(transcript: Optional[str], appointment_interest) -> Optional[str]:
+    """
+    Work out the requested appointment type from a call transcript
+
+    Args:
+        transcript (str): Call transcript, any case
+        appointment_interest: appointment_interest from the call analysis
+
+    Returns:
+        str: 'selling', 'advisory' or None when there is no type and no interest
+    """
+    text = (transcript or '').lower()
+    has_selling = has_advisory = has_question = False
+    # Answer words after the last "selling or advisory" (the whole transcript if it never occurs)
+    choice_end = 0
+    last_selling = last_advisory = -1
+    for position, phrase in _appointment_matcher.finditer(text):
+        if phrase in _selling_phrases:
+            has_selling = True
+        elif phrase in _advisory_phrases:
+            has_advisory = True
+        if phrase in _type_questions:
+            has_question = True
+        if phrase == TYPE_CHOICE:
+            choice_end = max(choice_end, position + len(TYPE_CHOICE))
+        elif phrase == 'selling':
+            last_selling = max(last_selling, position)
+        elif phrase == 'advisory':
+            last_advisory = max(last_advisory, position)
+
+    if has_selling:
+        return 'selling'
+    if has_advisory:
+        return 'advisory'
+    if appointment_interest is not True:
+        return None
+    # With appointment interest the type defaults to selling, unless the agent asked and
+    # only advisory was mentioned afterwards
+    if has_question and last_selling < choice_end <= last_advisory:
+        return 'advisory'
+    return 'selling'
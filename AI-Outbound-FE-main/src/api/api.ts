@@ -142,6 +142,17 @@ export const userApi = {
       throw new Error("Failed to initiate call");
     }
   },
+  getTranscript: async (callId: string): Promise<{ callId: string; transcript: string }> => {
+    try {
+      const response = await Axios.get(`/api/transcripts/${encodeURIComponent(callId)}`);
+      return response.data;
+    } catch (error) {
+      if (axios.isAxiosError(error)) {
+        throw new Error(error.response?.data?.detail || "Failed to fetch transcript");
+      }
+      throw new Error("Failed to fetch transcript");
+    }
+  },
   updateAppointment: async (phoneNumber: string, appointmentInterest: boolean, appointmentDateTime?: string, meetingLink?: string) => {
     try {
       const response = await Axios.post('/api/update_appointment', {
@@ -199,6 +210,21 @@ export const userApi = {
 };
 
 export const statsApi = {
+  // Every dashboard metric in one request
+  getDashboardStats: async () => {
+    try {
+      let getUserId = localStorage.getItem("userName");
+      const response = await Axios.get(`/stats/dashboard?userId=${getUserId}`);
+      return response.data;
+    } catch (error) {
+      if (axios.isAxiosError(error)) {
+        console.log("error", error);
+        throw new Error(error.response?.data?.message || "Failed to fetch dashboard stats");
+      }
+      throw new Error("Failed to fetch dashboard stats");
+    }
+  },
+
   getTotalNoCalls: async () => {
     try {
       let getUserId = localStorage.getItem("userName");
@@ -0,0 +1,54 @@
+import React, { useState } from 'react';
+import { userApi } from '../api/api';
+
+interface CallTranscriptProps {
+  callId?: string;
+  // Transcript already on the call (calls stored before transcripts were split out)
+  transcript?: string;
+  hasTranscript?: boolean;
+  children: (transcript: string) => React.ReactNode;
+}
+
+// Loads a call transcript on demand instead of shipping it with every prospect list
+const CallTranscript: React.FC<CallTranscriptProps> = ({ callId, transcript, hasTranscript, children }) => {
+  const [loadedTranscript, setLoadedTranscript] = useState<string | undefined>(transcript);
+  const [isLoading, setIsLoading] = useState(false);
+  const [error, setError] = useState<string | null>(null);
+
+  if (loadedTranscript) {
+    return <>{children(loadedTranscript)}</>;
+  }
+
+  if (!callId || hasTranscript === false) {
+    return <span className="text-sm text-slate-700">No transcript available</span>;
+  }
+
+  const loadTranscript = async () => {
+    setIsLoading(true);
+    setError(null);
+    try {
+      const data = await userApi.getTranscript(callId);
+      setLoadedTranscript(data.transcript);
+    } catch (err) {
+      setError(err instanceof Error ? err.message : 'Failed to load transcript');
+    } finally {
+      setIsLoading(false);
+    }
+  };
+
+  return (
+    <div>
+      <button
+        type="button"
+        onClick={loadTranscript}
+        disabled={isLoading}
+        className="text-xs text-blue-600 hover:underline disabled:text-gray-400"
+      >
+        {isLoading ? 'Loading transcript...' : 'Show transcript'}
+      </button>
+      {error && <p className="text-xs text-red-500 mt-1">{error}</p>}
+    </div>
+  );
+};
+
+export default CallTranscript;
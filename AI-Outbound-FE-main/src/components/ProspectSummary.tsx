@@ -1,6 +1,7 @@
 import { useEffect, useState } from 'react';
 import { userApi, campaignApi } from '../api/api';
 import AddProspectModal from './AddProspectModal';
+import CallTranscript from './CallTranscript';
 import { useAuth } from '../contexts/AuthContext';
 import { Campaign } from '../types/campaign';
 
@@ -667,9 +668,10 @@ const ProspectSummary = () => {
                             <p className="text-sm font-medium text-slate-400">Call Outcome</p>
                             <p className="text-sm text-slate-700 mt-1">{call.callSummary || 'No summary available'}</p>
                             <p className="text-sm font-medium text-slate-400">Transcript</p>
+                                <CallTranscript callId={call.callId} transcript={call.transcript} hasTranscript={call.hasTranscript}>
+                                {(transcript) => (
                                 <p className="text-sm text-slate-700 mt-1">
-                                {call.transcript 
-                                ? call.transcript
+                                {transcript
                                 .replace(/(agent:)/gi, '<br /><strong>$1</strong>')
                                 .replace(/(user:)/gi, '<br /><strong>$1</strong>')
                                 .replace(/^<br \/>/, '') // Remove leading <br /> if any
@@ -679,9 +681,10 @@ const ProspectSummary = () => {
                                 {index > 0 && <br />}
                                 <span dangerouslySetInnerHTML={{ __html: line }} />
                                 </span>
-                                ))
-                                : 'No transcript available'}
+                                ))}
                                 </p>
+                                )}
+                                </CallTranscript>
                           {/* <p className="text-sm text-slate-700 mt-1">{call.transcript || 'No transcript available'}</p> */}
                           </div>
                         )}
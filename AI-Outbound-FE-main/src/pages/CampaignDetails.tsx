@@ -7,6 +7,7 @@ import { useMicrosoftGraph } from '../hooks/useMicrosoftGraph';
 // import MicrosoftAuthRequired from '../components/MicrosoftAuthRequired';
 import useAuthorization from '../hooks/useAuthorization';
 import AddProspectModal from '../components/AddProspectModal';
+import CallTranscript from '../components/CallTranscript';
 import Papa from 'papaparse';
 import { getBrisbaneDate } from '../utils/timezone';
 import { useAuth } from '../contexts/AuthContext';
@@ -42,6 +43,7 @@ interface Prospect {
     callTime: string;
     duration?: string;
     transcript?: string;
+    hasTranscript?: boolean;
     status?: string;
     timestamp?: string;
     callSummary?: string;
@@ -1342,12 +1344,14 @@ const CampaignDetails: React.FC = () => {
                             )}
                             
                             {/* Show transcript for individual calls and completed batch calls */}
-                            {(!call.batchId || (call.batchId && (call.status === 'ended' || call.status === 'completed' || call.status === 'busy' || call.status === 'no_answer' || call.status === 'voicemail'))) && call.transcript && (
+                            {(!call.batchId || (call.batchId && (call.status === 'ended' || call.status === 'completed' || call.status === 'busy' || call.status === 'no_answer' || call.status === 'voicemail'))) && (call.transcript || call.hasTranscript) && (
   <div className="mt-2">
     <div className="text-xs font-medium text-gray-500 mb-1">Transcript:</div>
+    <CallTranscript callId={call.callId} transcript={call.transcript} hasTranscript={call.hasTranscript}>
+    {(transcript) => (
     <div className="text-sm bg-white p-3 rounded border border-gray-200 max-h-64 overflow-y-auto space-y-3">
       {(() => {
-        const lines = call.transcript.split('\n').map(line => line.trim()).filter(Boolean);
+        const lines = transcript.split('\n').map(line => line.trim()).filter(Boolean);
         const groups = [];
         let currentSpeaker = null;
         let currentLines:any = [];
@@ -1383,6 +1387,8 @@ const CampaignDetails: React.FC = () => {
         ));
       })()}
     </div>
+    )}
+    </CallTranscript>
   </div>
 )}
 
@@ -31,34 +31,20 @@ const Home: React.FC = () => {
         setIsLoading(true);
         setError(null);
 
-        // Use Promise.all to fetch multiple stats in parallel
-        const [
-          callsResponse, 
-          connectedResponse, 
-          bookedResponse, 
-          ebooksResponse, 
-          callbackSchedulesResponse,
-          averageCallDurationResponse,
-        ] = await Promise.all([
-          statsApi.getTotalNoCalls(),
-          statsApi.getTotalCallsConnected(),
-          statsApi.getBookedAppointments(),
-          statsApi.getSentEbooks(),
-          statsApi.getCallBackShedules(),
-          statsApi.getAverageCallDuration(),
-        ]);
+        // All metrics come from a single aggregation on the server
+        const stats = await statsApi.getDashboardStats();
 
-        setTotalCalls(callsResponse.total_calls);
-        setTotalCallsConnected(connectedResponse.total_connected_calls);
-        setTotalBookedAppointments(bookedResponse.total_appointments_booked);
-        setTotalEbooksSent(ebooksResponse.total_ebook_sent);
-        setTotalCallbacksScheduled(callbackSchedulesResponse.total_call_backs);
+        setTotalCalls(stats.total_calls);
+        setTotalCallsConnected(stats.total_connected_calls);
+        setTotalBookedAppointments(stats.total_appointments_booked);
+        setTotalEbooksSent(stats.total_ebook_sent);
+        setTotalCallbacksScheduled(stats.total_call_backs);
         setConverstionRate({
-          A: (callbackSchedulesResponse.total_call_backs/connectedResponse.total_connected_calls)*100, 
-          B: (bookedResponse.total_appointments_booked/connectedResponse.total_connected_calls)*100, 
-          C: (ebooksResponse.total_ebook_sent/connectedResponse.total_connected_calls)*100, 
+          A: (stats.total_call_backs/stats.total_connected_calls)*100, 
+          B: (stats.total_appointments_booked/stats.total_connected_calls)*100, 
+          C: (stats.total_ebook_sent/stats.total_connected_calls)*100, 
         });
-        setTotalAverageCallDuration(averageCallDurationResponse.average_call_duration);
+        setTotalAverageCallDuration(stats.average_call_duration);
       } catch (err) {
         setError('Failed to fetch statistics');
         console.error('Error fetching statistics:', err);